@@ -1,19 +1,38 @@
 from django.contrib import admin
+from django.db import connection
 from .models import Project, Task
+from .search import get_index, parse_terms
+
+
+class SearchIndexAdminMixin:
+    """
+    Answers the changelist search box from the full-text index (see
+    api.search) instead of LIKE scans over search_fields, where the
+    database has one
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        index = get_index(connection)
+        terms = parse_terms(search_term)
+        if index is None or not terms:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=index.match_ids(self.search_kind, terms)), False
 
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'client_name', 'status', 'budget', 'start_date', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['title', 'client_name', 'description']
+    search_kind = 'project'
     date_hierarchy = 'created_at'
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(SearchIndexAdminMixin, admin.ModelAdmin):
     list_display = ['name', 'project', 'priority', 'completed', 'due_date', 'created_at']
     list_filter = ['priority', 'completed', 'created_at']
     search_fields = ['name', 'description', 'project__title']
+    search_kind = 'task'
     date_hierarchy = 'created_at'
-
@@ -0,0 +1,417 @@
+"""
+Endpoint benchmarks run through the Django test client.
+
+Each scenario issues one API request; for every scenario the suite records
+wall time (median and 95th percentile), database query count and peak
+Python memory. Results can be compared against a JSON baseline to catch
+performance regressions (see the `benchmark` management command).
+
+The load functions at the end issue many concurrent requests to compare the
+throughput of the sync (WSGI) and async (ASGI) views against a slow stub
+upstream (see the `benchmark_concurrency` management command).
+
+run_serializer_benchmark() measures the rows per second of the list
+serializers against their values_list() fast path (see the
+`benchmark_serializers` management command), run_renderer_benchmark() the
+encode time and payload size of large responses per renderer (see the
+`benchmark_renderers` management command).
+"""
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from . import renderers, response_cache
+from .fast_serializers import RowSerializer
+from .models import Project, Task
+from .serializers import ProjectListSerializer, ProjectSerializer, TaskSerializer
+
+
+class Scenario:
+    """A named request against the API"""
+
+    def __init__(self, name, path, clear_cache=True, settings=None):
+        self.name = name
+        # A path, or a callable building it from the benchmark context
+        self.path = path
+        # Start every run with an empty cache (measures the uncached path)
+        self.clear_cache = clear_cache
+        # Settings overridden while it runs
+        self.settings = settings or {}
+
+    def get_path(self, context):
+        return self.path(context) if callable(self.path) else self.path
+
+
+# The cached scenarios run in this process only, so the per-process default
+# cache (with which settings leave caching off) serves them fine
+RESPONSE_CACHING = {'API_RESPONSE_CACHE_TTL': 300}
+DASHBOARD_CACHING = {'DASHBOARD_CACHE_TTL': 30}
+
+SCENARIOS = [
+    Scenario('projects_list', '/api/projects/'),
+    Scenario('projects_list_filtered', '/api/projects/?status=in_progress&client=tech'),
+    Scenario('projects_list_cursor', '/api/projects/?pagination=cursor&page_size=50'),
+    Scenario('project_retrieve', lambda ctx: f'/api/projects/{ctx["project_id"]}/'),
+    Scenario('projects_list_cached', '/api/projects/', clear_cache=False, settings=RESPONSE_CACHING),
+    Scenario(
+        'project_retrieve_cached', lambda ctx: f'/api/projects/{ctx["project_id"]}/',
+        clear_cache=False, settings=RESPONSE_CACHING,
+    ),
+    Scenario('tasks_list', '/api/tasks/?page_size=100'),
+    Scenario('tasks_list_sparse', '/api/tasks/?page_size=100&fields=id,name,completed'),
+    Scenario('tasks_list_filtered', lambda ctx: f'/api/tasks/?project={ctx["project_id"]}&completed=false'),
+    Scenario('tasks_list_deep_page', lambda ctx: f'/api/tasks/?page={ctx["last_task_page"]}'),
+    Scenario('tasks_list_cursor', '/api/tasks/?pagination=cursor&page_size=100'),
+    Scenario('dashboard_stats', '/api/dashboard/'),
+    Scenario('dashboard_stats_cached', '/api/dashboard/', clear_cache=False, settings=DASHBOARD_CACHING),
+]
+
+# Metrics compared against the baseline within the relative threshold
+# (p95 is reported but too noisy to gate on)
+RELATIVE_METRICS = ('median_ms', 'peak_kb')
+# Metrics that may not grow at all
+EXACT_METRICS = ('queries',)
+# Absolute slack so sub-millisecond jitter doesn't count as a regression
+MIN_DELTA = {'median_ms': 1.0, 'peak_kb': 16.0}
+
+
+def build_context():
+    """Values the scenario paths depend on, taken from the seeded data"""
+    project = Project.objects.order_by('-stats__total_tasks').first()
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    return {
+        'project_id': project.pk if project else 0,
+        'last_task_page': max(-(-Task.objects.count() // page_size), 1),
+    }
+
+
+def clear_caches():
+    cache.clear()
+    response_cache.get_cache().clear()
+
+
+def run_scenario(client, scenario, context, iterations):
+    path = scenario.get_path(context)
+    timings = []
+    queries = None
+
+    # One warm-up request so the first run doesn't pay for imports
+    client.get(path)
+
+    for _ in range(iterations):
+        if scenario.clear_cache:
+            clear_caches()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f'{scenario.name}: GET {path} returned {response.status_code}')
+        queries = len(ctx.captured_queries)
+
+    # Memory is measured in a separate run since tracing slows everything down
+    if scenario.clear_cache:
+        clear_caches()
+    tracemalloc.start()
+    try:
+        client.get(path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    p95_index = min(len(timings) - 1, round(0.95 * (len(timings) - 1)))
+    return {
+        'path': path,
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[p95_index], 3),
+        'queries': queries,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_suite(iterations=10, names=None, progress=None):
+    """Run the scenarios (all, or those in `names`) against the current database"""
+    client = Client()
+    context = build_context()
+    results = {}
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        with override_settings(**scenario.settings):
+            results[scenario.name] = run_scenario(client, scenario, context, iterations)
+        if progress is not None:
+            progress(scenario.name, results[scenario.name])
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of human readable regressions of `results` against
+    `baseline`: median time and peak memory regress when they exceed the
+    baseline by more than `threshold` (e.g. 0.25 for 25%) and by more than
+    MIN_DELTA. Query counts may not grow.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get('results', {}).get(name)
+        if expected is None:
+            continue
+        for metric in RELATIVE_METRICS + EXACT_METRICS:
+            if metric not in expected:
+                continue
+            allowed = expected[metric]
+            if metric in RELATIVE_METRICS:
+                allowed = max(allowed * (1 + threshold), allowed + MIN_DELTA[metric])
+            if metrics[metric] > allowed:
+                regressions.append(
+                    f'{name}: {metric} {metrics[metric]} exceeds baseline '
+                    f'{expected[metric]} (allowed {allowed:.1f})'
+                )
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_results(path, results, **meta):
+    with open(path, 'w') as f:
+        json.dump({**meta, 'results': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+# name -> (queryset factory, serializer class) of the list endpoints
+SERIALIZER_TARGETS = {
+    'tasks': (lambda: Task.objects.all(), TaskSerializer),
+    'projects': (lambda: Project.objects.with_task_counts(), ProjectListSerializer),
+}
+
+
+def _rows_per_second(serialize, rows, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        serialize()
+        timings.append(time.perf_counter() - started)
+    return round(rows / statistics.median(timings), 1)
+
+
+def run_serializer_benchmark(rows=1000, iterations=10):
+    """
+    Rows per second fetched and serialized by each list serializer and by
+    its RowSerializer, for pages of `rows` rows. Raises RuntimeError if the
+    two disagree.
+    """
+    results = {}
+    for name, (get_queryset, serializer_class) in SERIALIZER_TARGETS.items():
+        row_serializer = RowSerializer.for_serializer(serializer_class())
+
+        def serialize_models():
+            return serializer_class(get_queryset()[:rows], many=True).data
+
+        def serialize_rows():
+            return row_serializer.serialize(row_serializer.values(get_queryset())[:rows])
+
+        if json.dumps(serialize_models()) != json.dumps(serialize_rows()):
+            raise RuntimeError(f'{name}: RowSerializer output differs from {serializer_class.__name__}')
+        count = len(serialize_rows())
+        results[name] = {
+            'rows': count,
+            'serializer_rows_per_s': _rows_per_second(serialize_models, count, iterations),
+            'fast_rows_per_s': _rows_per_second(serialize_rows, count, iterations),
+        }
+    return results
+
+
+def _tasks_list_payload(rows):
+    """A task list page of `rows` rows, as TaskViewSet.list returns it"""
+    return {
+        'count': Task.objects.count(),
+        'next': None,
+        'previous': None,
+        'results': TaskSerializer(Task.objects.all()[:rows], many=True).data,
+    }
+
+
+def _project_details_payload(rows):
+    """Project detail representations (with their tasks) totalling about `rows` tasks"""
+    projects = []
+    tasks = 0
+    queryset = Project.objects.with_task_counts().prefetch_related('tasks')
+    for project in queryset.iterator(chunk_size=100):
+        if tasks >= rows:
+            break
+        projects.append(ProjectSerializer(project).data)
+        tasks += len(project.tasks.all())
+    return projects
+
+
+# name -> payload factory taking the number of rows
+RENDERER_TARGETS = {
+    'tasks_list': _tasks_list_payload,
+    'project_details': _project_details_payload,
+}
+
+
+def get_renderers():
+    """name -> renderer compared by run_renderer_benchmark(), if installed"""
+    available = {'json': JSONRenderer()}
+    if renderers.orjson is not None:
+        available['orjson'] = renderers.FastJSONRenderer()
+    if renderers.msgpack is not None:
+        available['msgpack'] = renderers.MessagePackRenderer()
+    return available
+
+
+def run_renderer_benchmark(rows=1000, iterations=20):
+    """
+    Median encode time (ms) and payload size (bytes) of each renderer for
+    each large response. Raises RuntimeError if the orjson renderer's output
+    differs from DRF's JSONRenderer.
+    """
+    results = {}
+    available = get_renderers()
+    for name, get_payload in RENDERER_TARGETS.items():
+        data = get_payload(rows)
+        expected = available['json'].render(data)
+        results[name] = {}
+        for renderer_name, renderer in available.items():
+            body = renderer.render(data)
+            if renderer_name == 'orjson' and body != expected:
+                raise RuntimeError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                renderer.render(data)
+                timings.append(time.perf_counter() - started)
+            results[name][renderer_name] = {
+                'encode_ms': round(statistics.median(timings) * 1000, 3),
+                'bytes': len(body),
+            }
+    return results
+
+
+class StubAPIServer:
+    """
+    A local HTTP server standing in for the third-party APIs. `routes` maps
+    paths to (status, payload, delay in seconds), '*' matching any other
+    path; payloads are sent as JSON, or as they are when they are bytes.
+    Hits are counted per path.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                stub.hits[path] = stub.hits.get(path, 0) + 1
+                status, payload, delay = stub.routes.get(path, stub.routes.get('*', (404, {}, 0)))
+                time.sleep(delay)
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except ConnectionError:
+                    pass  # The client gave up (e.g. a hedged request that lost)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+            # Room for many concurrent connects (the default backlog is 5)
+            request_queue_size = 128
+
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def summarize_load(latencies, elapsed, failures):
+    latencies = sorted(latencies)
+    p95_index = min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))
+    return {
+        'requests': len(latencies),
+        'failures': failures,
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'median_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[p95_index] * 1000, 2),
+    }
+
+
+def run_sync_load(paths, workers):
+    """
+    Request `paths` through the WSGI handler from `workers` threads, like
+    a sync gunicorn deployment with that many workers.
+    """
+    local = threading.local()
+
+    def fetch(path):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        started = time.perf_counter()
+        response = local.client.get(path)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(fetch, paths))
+    elapsed = time.perf_counter() - started
+    return summarize_load(
+        [latency for latency, _ in outcomes], elapsed,
+        sum(1 for _, status_code in outcomes if status_code != 200),
+    )
+
+
+def run_async_load(paths, concurrency):
+    """
+    Request `paths` through the ASGI handler on one event loop, at most
+    `concurrency` at a time, like a single uvicorn worker.
+    """
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        client = AsyncClient()
+
+        async def fetch(path):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(fetch(path) for path in paths))
+        return outcomes, time.perf_counter() - started
+
+    outcomes, elapsed = asyncio.run(run())
+    return summarize_load(
+        [latency for latency, _ in outcomes], elapsed,
+        sum(1 for _, status_code in outcomes if status_code != 200),
+    )
@@ -0,0 +1,194 @@
+"""
+Incremental sync of the project and task lists: GET <prefix>/?updated_since=<cursor>.
+
+Every write of a project or task appends a ChangeLogEntry in the same
+transaction (see the receivers in api.signals, which also cover the bulk
+write paths); deletes, including the tasks a project delete cascades to,
+append tombstones. A project also gets an entry when its task count
+changes. The entries' auto-incremented ids are the cursor: a sync reads up
+to API_SYNC_BATCH_SIZE entries of one kind past the client's cursor through
+the (kind, id) index, then loads the current rows of the objects they name,
+so it costs as much as the changes, not the table. The response is
+
+    {"cursor": 42, "has_more": false, "resync": false, "changed": [<rows>], "deleted": [<ids>]}
+
+`changed` holds rows rendered like the list (?fields= / ?exclude= apply,
+the list filters don't), `deleted` the ids of the objects deleted since the
+cursor. Clients start from ?updated_since=0, then pass back `cursor`, right
+away while `has_more` is true.
+
+Bulk writes of more rows than a sync batch holds (seeding, large imports)
+don't log each row: they log a resync marker instead, an entry for object
+RESYNC_OBJECT_ID, and a sync reaching it answers `"resync": true`. The
+client then reloads the whole list before applying `changed` / `deleted`
+(the changes logged after the marker) and carrying on from `cursor`.
+
+Ids are assigned when rows are inserted, not when their transaction
+commits, so on databases running concurrent write transactions an entry may
+become visible after a later one. The cursor therefore only moves past
+entries older than API_SYNC_SETTLE_SECONDS (longer than any write
+transaction): newer entries are sent, but again by the next sync too, and
+applying a change twice is harmless. QuerySet.update() bypasses the model
+signals and isn't logged.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import ChangeLogEntry, Task
+
+# No row has this id: entries for it are resync markers
+RESYNC_OBJECT_ID = 0
+
+
+def log_changes(changes):
+    """
+    Append (kind, object_id, deleted) entries to the change log, in the
+    current transaction
+    """
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create(
+        [
+            ChangeLogEntry(kind=kind, object_id=object_id, deleted=deleted, created_at=now)
+            for kind, object_id, deleted in changes
+        ],
+        batch_size=settings.TASK_BULK_BATCH_SIZE,
+    )
+
+
+def log_bulk_changes(kind, object_ids, related=()):
+    """
+    log_changes() for a bulk write of `object_ids` of `kind`, which also
+    changed the `related` (kind, object_id) pairs. More changes than a sync
+    batch holds are logged as one resync marker per kind.
+    """
+    changes = [(kind, object_id, False) for object_id in object_ids]
+    changes.extend((related_kind, object_id, False) for related_kind, object_id in related)
+    if len(changes) > settings.API_SYNC_BATCH_SIZE:
+        kinds = dict.fromkeys(change_kind for change_kind, _, _ in changes)
+        changes = [(change_kind, RESYNC_OBJECT_ID, False) for change_kind in kinds]
+    log_changes(changes)
+
+
+def log_table_deleted(kind, model):
+    """
+    Tombstones for every row of `model`, for raw DELETEs of the whole table
+    (one INSERT ... SELECT, without loading the rows)
+    """
+    _log_deleted_rows(kind, model)
+
+
+def log_project_tasks_deleted(project_id):
+    """Tombstones for the tasks a project delete is about to cascade to"""
+    _log_deleted_rows('task', Task, 'project_id = %s', [project_id])
+
+
+def _log_deleted_rows(kind, model, where=None, params=()):
+    quote_name = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote_name(ChangeLogEntry._meta.db_table)} '
+        f'(kind, object_id, deleted, created_at) '
+        f'SELECT %s, {quote_name(model._meta.pk.column)}, %s, %s '
+        f'FROM {quote_name(model._meta.db_table)}'
+    )
+    if where:
+        sql += f' WHERE {where}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [kind, True, timezone.now(), *params])
+
+
+def compact_change_log():
+    """
+    Delete the entries superseded by a later entry for the same object.
+    Every cursor still gets the latest change of each object, so this is
+    safe at any time. Returns the number of entries deleted.
+    """
+    latest = (
+        ChangeLogEntry.objects.order_by()
+        .values('kind', 'object_id')
+        .annotate(latest_id=Max('id'))
+        .values('latest_id')
+    )
+    deleted, _ = ChangeLogEntry.objects.exclude(id__in=latest).delete()
+    return deleted
+
+
+class ChangeSyncMixin:
+    """
+    Answers list requests carrying ?updated_since= with the changes since
+    that cursor. The viewset's list() calls sync_list() when
+    get_sync_cursor() isn't None; expects FastListMixin.
+    """
+    sync_query_param = 'updated_since'
+    # ChangeLogEntry.kind of the viewset's model
+    change_kind = None
+
+    def get_sync_cursor(self):
+        """The client's cursor, or None when it isn't syncing"""
+        value = self.request.query_params.get(self.sync_query_param)
+        if value is None:
+            return None
+        try:
+            cursor = int(value)
+        except ValueError:
+            cursor = -1
+        if cursor < 0:
+            raise ValidationError({self.sync_query_param: 'Must be a non-negative integer.'})
+        return cursor
+
+    def sync_list(self, cursor):
+        entries = list(
+            ChangeLogEntry.objects
+            .filter(kind=self.change_kind, id__gt=cursor)
+            .order_by('id')
+            .values_list('id', 'object_id', 'deleted', 'created_at')[:settings.API_SYNC_BATCH_SIZE]
+        )
+
+        # A resync marker makes the client reload the list, which covers
+        # every entry up to it
+        resync = False
+        changes = entries
+        for index, (_, object_id, _, _) in enumerate(entries):
+            if object_id == RESYNC_OBJECT_ID:
+                resync = True
+                changes = entries[index + 1:]
+
+        # The latest entry of each object wins
+        latest = {}
+        for _, object_id, deleted, _ in changes:
+            latest.pop(object_id, None)
+            latest[object_id] = deleted
+
+        # The cursor stops before the first entry that may have committed
+        # after one that isn't visible yet
+        next_cursor = cursor
+        settled = timezone.now() - timedelta(seconds=settings.API_SYNC_SETTLE_SECONDS)
+        for entry_id, _, _, created_at in entries:
+            if created_at > settled:
+                break
+            next_cursor = entry_id
+
+        queryset = self.get_queryset().filter(
+            pk__in=[object_id for object_id, deleted in latest.items() if not deleted]
+        ).order_by('pk')
+        self.row_serializer = self.get_row_serializer()
+        if self.row_serializer is not None:
+            queryset = self.row_serializer.values(queryset)
+        objects = list(queryset)
+        found = {obj.pk for obj in objects}
+        return Response({
+            'cursor': next_cursor,
+            # Another batch is waiting, unless this one is too recent to
+            # move the cursor at all
+            'has_more': len(entries) == settings.API_SYNC_BATCH_SIZE and next_cursor > cursor,
+            'resync': resync,
+            'changed': self.serialize_list(objects),
+            # Objects whose latest entry is a tombstone, or deleted by a
+            # write past this batch
+            'deleted': [object_id for object_id, deleted in latest.items() if deleted or object_id not in found],
+        })
@@ -0,0 +1,203 @@
+"""
+Compression of API responses (gzip, and brotli / zstd when their packages
+are installed).
+
+CompressionMiddleware picks the best encoding the client accepts (by its
+q-values, then zstd > br > gzip) for responses under
+API_COMPRESSION_PATH_PREFIX. Bodies shorter than API_COMPRESSION_MIN_SIZE
+are sent as they are; streaming responses (e.g. the exports) are compressed
+chunk by chunk, each chunk flushed so clients still receive rows as they
+are produced.
+
+Responses served from or stored in the response cache (api.response_cache)
+carry their cache key: their compressed bodies are cached next to the entry,
+under the same version tokens, so cache hits aren't compressed again.
+"""
+import gzip
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from . import response_cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+class GzipCodec:
+    name = 'gzip'
+    level = 6
+
+    def compress(self, data):
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def compressor(self):
+        """(compress a chunk and flush it, finish the stream) functions"""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+
+class BrotliCodec:
+    name = 'br'
+    # Brotli's default quality (11) is meant for static files; 5 compresses
+    # better than gzip at a comparable speed
+    quality = 5
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def compressor(self):
+        compressor = brotli.Compressor(quality=self.quality)
+        return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+
+
+class ZstdCodec:
+    name = 'zstd'
+    level = 3
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def compressor(self):
+        compressor = zstandard.ZstdCompressor(level=self.level).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+
+# Available codecs, preferred first when the client accepts several equally
+CODECS = {
+    codec.name: codec
+    for codec in (
+        ZstdCodec() if zstandard is not None else None,
+        BrotliCodec() if brotli is not None else None,
+        GzipCodec(),
+    )
+    if codec is not None
+}
+
+_accept_encoding_re = re.compile(r'([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def choose_encoding(accept_encoding):
+    """
+    The available encoding the client prefers according to its
+    Accept-Encoding header, or None
+    """
+    weights = {}
+    for name, q in _accept_encoding_re.findall((accept_encoding or '').lower()):
+        try:
+            weights[name] = float(q) if q else 1.0
+        except ValueError:
+            continue
+    wildcard = weights.get('*', 0.0)
+    best, best_weight = None, 0.0
+    for name in CODECS:
+        weight = weights.get(name, wildcard)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def compress_stream(codec, chunks):
+    compress, finish = codec.compressor()
+    for chunk in chunks:
+        if chunk:
+            yield compress(chunk)
+    yield finish()
+
+
+async def acompress_stream(codec, chunks):
+    compress, finish = codec.compressor()
+    async for chunk in chunks:
+        if chunk:
+            yield compress(chunk)
+    yield finish()
+
+
+def compressed_cache_key(key, encoding):
+    return f'{key}:{encoding}'
+
+
+class CompressionMiddleware:
+    """Content-Encoding negotiation for API responses"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if not settings.API_COMPRESSION_ENABLED or not request.path.startswith(settings.API_COMPRESSION_PATH_PREFIX):
+            return response
+        if response.has_header('Content-Encoding') or response.status_code in (204, 304):
+            return response
+        # The body depends on Accept-Encoding even when it isn't compressed
+        # (e.g. too short), as other clients may get it compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        codec = CODECS[encoding]
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(codec, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(codec, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < settings.API_COMPRESSION_MIN_SIZE:
+                return response
+            compressed = self.compress(response, codec)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different sequence of bytes with the same
+        # meaning, so a strong ETag becomes weak (as Django's GZipMiddleware does)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def compress(self, response, codec):
+        """The compressed body, reused from the response cache when it has one"""
+        key = getattr(response, 'response_cache_key', None)
+        if key is None:
+            return codec.compress(response.content)
+        cache = response_cache.get_cache()
+        key = compressed_cache_key(key, codec.name)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = codec.compress(response.content)
+            cache.set(key, compressed, settings.API_RESPONSE_CACHE_TTL)
+        return compressed
@@ -0,0 +1,92 @@
+"""
+HTTP conditional requests (ETag / Last-Modified) for the API viewsets.
+
+Views load their rows as usual, derive a "version" of what the response
+would contain from them (ids, update timestamps, counts) and call
+check_preconditions() before serializing anything. Clients sending back a
+matching If-None-Match / If-Modified-Since get a bodiless 304 Not Modified,
+which skips serialization, rendering and the transfer of the body.
+
+Lists only get an ETag: the latest update among their rows doesn't move
+when a row is deleted or shifts onto the page, so a Last-Modified would let
+If-Modified-Since revalidate stale lists.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def request_variant(request):
+    """
+    What shapes a response body besides the data: the absolute URL (paginated
+    responses embed links built from it) with the query parameters in a
+    canonical order, as DRF sorts them when it builds those links, and the
+    negotiated media type
+    """
+    return (
+        request.build_absolute_uri(request.path),
+        sorted(request.query_params.lists()),
+        request.accepted_media_type,
+    )
+
+
+def latest(*values):
+    """The most recent of the given datetimes, ignoring None"""
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag (and, for single objects, Last-Modified) headers to the
+    responses of views that call check_preconditions(), and answers 304 when
+    the client's copy is current.
+    """
+
+    def get_object_version(self, obj):
+        """(version, last modified) of one object's representation"""
+        return (obj.pk, obj.updated_at), obj.updated_at
+
+    def check_list_preconditions(self, page):
+        """
+        check_preconditions() for a page of objects: the ETag covers every
+        row on the page and the paginator's own state (e.g. the total
+        count). There is no Last-Modified (see the module docstring).
+        """
+        return self.check_preconditions((
+            self.paginator.get_page_version(),
+            [self.get_object_version(obj)[0] for obj in page],
+        ))
+
+    def check_preconditions(self, version, last_modified=None):
+        """
+        Return a 304 response if the request's validators match `version`
+        (any repr()-able value that changes whenever the response would) and
+        `last_modified` (a datetime), else None.
+
+        The ETag also covers the request's URL and negotiated media type, as
+        both change the body (see request_variant()).
+        """
+        key = repr((request_variant(self.request), version))
+        etag = '"%s"' % hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return self.check_validators(etag, timestamp)
+
+    def check_validators(self, etag, timestamp):
+        """
+        check_preconditions() for validators computed earlier, e.g. stored
+        with a cached response
+        """
+        self.conditional_validators = (etag, timestamp)
+        return get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'conditional_validators', None)
+        if validators is not None and response.status_code in (200, 304):
+            etag, timestamp = validators
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
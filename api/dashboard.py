@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from .models import GlobalStats, Project, Task, TaskCounters
+from .replicas import pin_to_primary
+
+
+DASHBOARD_CACHE_KEY = 'api:dashboard_stats'
+
+
+def dashboard_querysets():
+    """The querysets behind the dashboard, shared by the sync and async paths"""
+    thirty_days_ago = timezone.now().date() - timedelta(days=30)
+    return {
+        # Overall statistics, including recent projects (last 30 days)
+        'overview': dict(
+            total_projects=Count('id'),
+            total_budget=Sum('budget'),
+            average_budget=Avg('budget'),
+            recent_projects=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+        ),
+        'status_rows': Project.objects.order_by().values('status').annotate(count=Count('id')),
+        # Projects by client
+        'top_clients': Project.objects.values('client_name').annotate(
+            project_count=Count('id'),
+            total_budget=Sum('budget')
+        ).order_by('-project_count')[:5],
+    }
+
+
+def build_dashboard_stats(overview, status_rows, task_stats, top_clients):
+    # Status breakdown (choices with no projects report 0)
+    status_breakdown = dict.fromkeys(
+        (choice for choice, _ in Project._meta.get_field('status').choices), 0
+    )
+    for row in status_rows:
+        status_breakdown[row['status']] = row['count']
+
+    # Tasks statistics, read from the incrementally maintained rollup
+    total_tasks = task_stats.total_tasks
+    completed_tasks = task_stats.completed_tasks
+    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+
+    # Task priority breakdown
+    priority_breakdown = {
+        choice: getattr(task_stats, TaskCounters.priority_field(choice))
+        for choice, _ in Task._meta.get_field('priority').choices
+    }
+
+    return {
+        'overview': {
+            'total_projects': overview['total_projects'],
+            'total_budget': float(overview['total_budget'] or 0),
+            'average_budget': float(overview['average_budget'] or 0),
+            'recent_projects_30_days': overview['recent_projects'],
+        },
+        'project_status': status_breakdown,
+        'tasks': {
+            'total_tasks': total_tasks,
+            'completed_tasks': completed_tasks,
+            'pending_tasks': total_tasks - completed_tasks,
+            'completion_rate': round(completion_rate, 2),
+        },
+        'priority_distribution': priority_breakdown,
+        'top_clients': list(top_clients),
+    }
+
+
+def compute_dashboard_stats():
+    """
+    Build the dashboard payload with a handful of queries: one aggregate
+    for the project overview, one grouped by status, one for the top
+    clients, and a single-row lookup of the GlobalStats task counters.
+    """
+    querysets = dashboard_querysets()
+    return build_dashboard_stats(
+        overview=Project.objects.aggregate(**querysets['overview']),
+        status_rows=querysets['status_rows'],
+        task_stats=GlobalStats.load(),
+        top_clients=querysets['top_clients'],
+    )
+
+
+async def acompute_dashboard_stats():
+    """compute_dashboard_stats() through the async ORM"""
+    querysets = dashboard_querysets()
+    task_stats = await GlobalStats.aload()
+    return build_dashboard_stats(
+        overview=await Project.objects.aaggregate(**querysets['overview']),
+        status_rows=[row async for row in querysets['status_rows']],
+        task_stats=task_stats,
+        top_clients=[row async for row in querysets['top_clients']],
+    )
+
+
+def cache_miss():
+    """
+    The payload about to be cached must not lag behind the write that
+    dropped the previous one: read it from the primary, not a replica
+    """
+    if settings.DASHBOARD_CACHE_TTL:
+        pin_to_primary()
+
+
+def get_dashboard_stats():
+    """
+    Return the dashboard payload, served from the cache when possible.
+    The cache entry lives for DASHBOARD_CACHE_TTL seconds and is dropped
+    whenever a project or task changes.
+    """
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        cache_miss()
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_CACHE_KEY, stats, settings.DASHBOARD_CACHE_TTL)
+    return stats
+
+
+async def aget_dashboard_stats():
+    """get_dashboard_stats() for the async views"""
+    stats = await cache.aget(DASHBOARD_CACHE_KEY)
+    if stats is None:
+        cache_miss()
+        stats = await acompute_dashboard_stats()
+        await cache.aset(DASHBOARD_CACHE_KEY, stats, settings.DASHBOARD_CACHE_TTL)
+    return stats
+
+
+def invalidate_dashboard_stats():
+    """Drop the cached dashboard payload"""
+    cache.delete(DASHBOARD_CACHE_KEY)
@@ -0,0 +1,287 @@
+"""
+Server-sent events about task, project and dashboard changes: GET /api/events/.
+
+Project and task writes publish events (see the receivers in api.signals)
+to an in-process broker once their transaction commits; every open stream
+subscribed to the project gets them:
+
+    task.created / task.updated / task.completed / task.deleted
+    project.created / project.updated / project.status_changed / project.deleted
+    tasks.changed      tasks of a project were written in bulk
+    dashboard          the /api/dashboard/ payload, recomputed once per
+                       API_EVENTS_DASHBOARD_INTERVAL however many writes
+                       happened, for every stream of the event loop
+    resync             events were dropped, reload what the client shows
+                       (e.g. with ?updated_since=, see api.changelog)
+
+Streams are async generators, so they need an ASGI server, and the broker
+only sees the writes of its own process: deploy a single ASGI process, or
+run the write traffic through it. Nothing is built while no stream is open.
+
+Each stream buffers up to API_EVENTS_QUEUE_SIZE events. A client reading
+slower than events arrive (the server's send waits on the socket, so the
+buffer fills) gets its backlog replaced by a single resync event instead of
+holding memory for it, and API_EVENTS_MAX_SUBSCRIBERS caps the number of
+streams per process.
+"""
+import asyncio
+import contextvars
+import itertools
+import logging
+import threading
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .dashboard import get_dashboard_stats
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+RESYNC = 'resync'
+DASHBOARD = 'dashboard'
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Event:
+    """
+    An event for the streams subscribed to any of `project_ids` (every
+    stream when it is None)
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, event_type, data, project_ids=None):
+        self.id = next(self._ids)
+        self.type = event_type
+        self.data = data
+        self.project_ids = project_ids
+
+    def encode(self):
+        return f'id: {self.id}\nevent: {self.type}\ndata: '.encode() + dumps(self.data) + b'\n\n'
+
+
+class Subscription:
+    """The buffered events of one stream"""
+
+    def __init__(self, project_ids=None, dashboard=True):
+        self.project_ids = project_ids
+        self.dashboard = dashboard
+        self.queue = asyncio.Queue(settings.API_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event):
+        if event.type == DASHBOARD:
+            return self.dashboard
+        return (
+            event.project_ids is None or self.project_ids is None
+            or not self.project_ids.isdisjoint(event.project_ids)
+        )
+
+    def put(self, event):
+        """
+        Buffer the event; once the buffer is full, the backlog is dropped for
+        a resync event and nothing else is buffered until the client reads it
+        """
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(Event(RESYNC, {}))
+
+    async def get(self):
+        event = await self.queue.get()
+        if event.type == RESYNC:
+            self.overflowed = False
+        return event
+
+
+class EventBroker:
+    """
+    Fans events out to the subscriptions of every event loop. Events may be
+    published from any thread; subscriptions are only touched in their loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Event loop -> its subscriptions
+        self._subscriptions = {}
+        # Event loop -> its scheduled dashboard refresh (a reference keeps
+        # the task from being garbage collected)
+        self._dashboard_refreshes = {}
+
+    def has_subscribers(self):
+        return bool(self._subscriptions)
+
+    def subscribe(self, project_ids=None, dashboard=True):
+        """Subscribe from a coroutine (of the loop that will read the events)"""
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(project_ids, dashboard)
+        with self._lock:
+            if sum(map(len, self._subscriptions.values())) >= settings.API_EVENTS_MAX_SUBSCRIBERS:
+                raise TooManySubscribers
+            self._subscriptions.setdefault(loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for loop, subscriptions in list(self._subscriptions.items()):
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[loop]
+
+    def publish(self, events):
+        with self._lock:
+            loops = list(self._subscriptions)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._deliver, loop, events)
+            except RuntimeError:
+                # The loop was closed under its streams
+                with self._lock:
+                    self._subscriptions.pop(loop, None)
+
+    def publish_on_commit(self, events):
+        """Publish the events once the current transaction commits"""
+        transaction.on_commit(partial(self.publish, events))
+
+    def _deliver(self, loop, events):
+        subscriptions = list(self._subscriptions.get(loop, ()))
+        for event in events:
+            for subscription in subscriptions:
+                if subscription.wants(event):
+                    subscription.put(event)
+        if loop not in self._dashboard_refreshes and any(s.dashboard for s in subscriptions):
+            # A context of its own, not the one of the request that happened
+            # to publish (e.g. its database routing)
+            self._dashboard_refreshes[loop] = loop.create_task(
+                self._refresh_dashboard(loop), context=contextvars.Context()
+            )
+
+    async def _refresh_dashboard(self, loop):
+        """Send the dashboard once the writes of the interval are in"""
+        try:
+            await asyncio.sleep(settings.API_EVENTS_DASHBOARD_INTERVAL)
+        finally:
+            # Writes from now on schedule another refresh
+            self._dashboard_refreshes.pop(loop, None)
+        try:
+            stats = await sync_to_async(dashboard_stats)()
+        except Exception:
+            logger.exception('Could not compute the dashboard for the event streams')
+            return
+        event = Event(DASHBOARD, stats)
+        for subscription in list(self._subscriptions.get(loop, ())):
+            if subscription.wants(event):
+                subscription.put(event)
+
+
+broker = EventBroker()
+
+
+def dashboard_stats():
+    """
+    get_dashboard_stats() outside of any request: the thread's connection is
+    checked (and recycled when too old) as at the start of one
+    """
+    close_old_connections()
+    return get_dashboard_stats()
+
+
+async def stream_events(subscription, resync=False):
+    """
+    The subscription's events in the text/event-stream format, with a
+    comment every API_EVENTS_HEARTBEAT_SECONDS to keep idle connections open
+    """
+    try:
+        if resync:
+            # A reconnecting client missed whatever happened meanwhile
+            yield Event(RESYNC, {}).encode()
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), settings.API_EVENTS_HEARTBEAT_SECONDS)
+            except TimeoutError:
+                yield b': keep-alive\n\n'
+                continue
+            yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class EventStream:
+    """
+    The body of an event stream response. The stream unsubscribes when it
+    ends, but an async generator that never started doesn't run its finally
+    clause: Django calls close() with the response, which unsubscribes even
+    when the body was never read (e.g. the client left before it was sent).
+    """
+
+    def __init__(self, subscription, resync=False):
+        self.subscription = subscription
+        self.events = stream_events(subscription, resync)
+
+    def __aiter__(self):
+        return self.events
+
+    def close(self):
+        broker.unsubscribe(self.subscription)
+
+
+def task_events(task, created=False, deleted=False, previous=None):
+    """
+    The events of a task write; `previous` is the stats snapshot of the row
+    before it (project_id, priority, completed)
+    """
+    project_ids = {task.project_id}
+    if previous:
+        # Streams of the project it moved away from learn about it too
+        project_ids.add(previous[0])
+    if deleted:
+        return [Event('task.deleted', {'id': task.pk, 'project': task.project_id}, project_ids)]
+    if created:
+        event_type = 'task.created'
+    elif task.completed and previous and not previous[2]:
+        event_type = 'task.completed'
+    else:
+        event_type = 'task.updated'
+    data = {
+        'id': task.pk, 'project': task.project_id, 'name': task.name, 'priority': task.priority,
+        'completed': task.completed, 'due_date': task.due_date, 'updated_at': task.updated_at,
+    }
+    return [Event(event_type, data, project_ids)]
+
+
+def project_events(project, created=False, deleted=False):
+    """
+    The events of a project write; the status it was loaded with tells
+    status changes apart
+    """
+    if deleted:
+        return [Event('project.deleted', {'id': project.pk}, {project.pk})]
+    data = {
+        'id': project.pk, 'title': project.title, 'client_name': project.client_name,
+        'status': project.status, 'updated_at': project.updated_at,
+    }
+    previous_status = getattr(project, '_loaded_status', None)
+    if created:
+        event_type = 'project.created'
+    elif previous_status is not None and previous_status != project.status:
+        event_type = 'project.status_changed'
+        data['previous_status'] = previous_status
+    else:
+        event_type = 'project.updated'
+    return [Event(event_type, data, {project.pk})]
+
+
+def bulk_task_events(project_ids):
+    """One tasks.changed event per project of a bulk task write"""
+    return [Event('tasks.changed', {'project': project_id}, {project_id}) for project_id in project_ids]
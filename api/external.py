@@ -0,0 +1,534 @@
+"""
+Outbound calls to the third-party APIs behind /api/external/.
+
+All calls share one pooled requests.Session, and their results are kept in
+in-process caches: fresh entries are served directly, expired ones are
+served stale while a background refresh runs, and concurrent misses for the
+same key wait for a single upstream call instead of each making their own.
+Each provider sits behind a circuit breaker, so one that keeps failing is
+skipped without waiting on its timeout.
+
+The a-prefixed functions are the asyncio counterparts used by the async
+views; they share the caches and breakers but call out through a pooled
+httpx.AsyncClient per event loop.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger('api.external')
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """The process-wide session, whose connections are kept alive and reused"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.EXTERNAL_API_POOL_SIZE,
+                    pool_maxsize=settings.EXTERNAL_API_POOL_SIZE,
+                )
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+# Event loop -> {verify: AsyncClient}
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(verify=True):
+    """The pooled async client of the running event loop"""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if verify not in clients:
+        pool_size = settings.EXTERNAL_API_POOL_SIZE
+        clients[verify] = httpx.AsyncClient(
+            verify=verify,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+    return clients[verify]
+
+
+def _retrieve_exception(future):
+    # Failures of loads nobody waits for are expected; don't log them as
+    # "never retrieved"
+    if not future.cancelled():
+        future.exception()
+
+
+class RefreshingCache:
+    """
+    A TTL cache with stale-while-revalidate and request coalescing.
+
+    get(key, loader, ttl, stale_ttl) returns the cached value while it is
+    younger than `ttl` seconds. For another `stale_ttl` seconds the old
+    value is still returned, and `loader()` is run in the background to
+    replace it. Past that the caller waits for `loader()`; concurrent
+    callers for the same key share one call and its result or exception.
+    Failed loads are not cached.
+
+    aget() does the same for a coroutine function `loader` without blocking
+    the event loop.
+    """
+
+    def __init__(self, max_entries=256, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        # key -> (value, fetched_at), least recently used first
+        self._entries = OrderedDict()
+        # key -> Future of the load in progress
+        self._inflight = {}
+        # (event loop, key) -> asyncio.Future of the load in progress
+        self._ainflight = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, key, loader, ttl, stale_ttl=0):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = self.clock() - fetched_at
+                if age < ttl + stale_ttl:
+                    self._entries.move_to_end(key)
+                    if age >= ttl and key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        self._background().submit(self._load, key, loader, future)
+                    return value
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if leader:
+            self._load(key, loader, future)
+        return future.result()
+
+    async def aget(self, key, loader, ttl, stale_ttl=0):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = self.clock() - fetched_at
+                if age < ttl + stale_ttl:
+                    self._entries.move_to_end(key)
+                    if age >= ttl and (loop, key) not in self._ainflight:
+                        self._start_aload(loop, key, loader)
+                    return value
+            future = self._ainflight.get((loop, key))
+            if future is None:
+                future = self._start_aload(loop, key, loader)
+
+        # The load runs in its own task, so a cancelled caller doesn't
+        # cancel it for the others waiting on it
+        return await asyncio.shield(future)
+
+    def pending(self, key):
+        """The Future of the load in progress for `key`, if any"""
+        with self._lock:
+            return self._inflight.get(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, key, loader, future):
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            return
+        with self._lock:
+            self._store(key, value)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _start_aload(self, loop, key, loader):
+        # Called with the lock held
+        future = self._ainflight[loop, key] = loop.create_future()
+        future.add_done_callback(_retrieve_exception)
+        task = loop.create_task(self._aload(loop, key, loader, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return future
+
+    async def _aload(self, loop, key, loader, future):
+        try:
+            value = await loader()
+        except BaseException as exc:
+            with self._lock:
+                self._ainflight.pop((loop, key), None)
+            future.set_exception(exc)
+            return
+        with self._lock:
+            self._store(key, value)
+            self._ainflight.pop((loop, key), None)
+        future.set_result(value)
+
+    def _store(self, key, value):
+        self._entries[key] = (value, self.clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _background(self):
+        # Created lazily so forked worker processes start their own threads
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='external-refresh')
+        return self._executor
+
+
+quote_cache = RefreshingCache()
+weather_cache = RefreshingCache()
+
+
+class UnexpectedResponse(Exception):
+    """An upstream API answered with an error status or an unknown payload"""
+
+
+class ClientError(UnexpectedResponse):
+    """
+    An upstream API rejected the request itself (HTTP 4xx, e.g. an unknown
+    city): the provider is up
+    """
+
+
+class CircuitOpen(UnexpectedResponse):
+    """The provider's circuit breaker is refusing calls"""
+
+
+# Errors counted as provider failures
+PROVIDER_ERRORS = (
+    requests.exceptions.RequestException,
+    httpx.HTTPError,
+    UnexpectedResponse,
+    ValueError,
+    KeyError,
+    IndexError,
+)
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of calls to one provider over a sliding window of
+    CIRCUIT_BREAKER_WINDOW seconds. Once at least CIRCUIT_BREAKER_MIN_CALLS
+    calls were made and the share of failures reaches
+    CIRCUIT_BREAKER_FAILURE_RATE, the circuit opens and calls fail
+    immediately with CircuitOpen. After CIRCUIT_BREAKER_RESET_TIMEOUT
+    seconds it turns half-open: a single trial call goes through, closing
+    the circuit on success and opening it again on failure.
+
+    Calls raising one of `ignored_errors` got an answer from the provider,
+    and count as successes.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, clock=time.monotonic, ignored_errors=()):
+        self.name = name
+        self.clock = clock
+        self.ignored_errors = ignored_errors
+        self.state = self.CLOSED
+        self.opened_at = None
+        # (timestamp, succeeded) of the calls in the window
+        self._calls = deque()
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def call(self, func):
+        self._before_call()
+        try:
+            result = func()
+        except BaseException as exc:
+            self._failed(exc)
+            raise
+        self._record(True)
+        return result
+
+    async def acall(self, func):
+        """call() for a coroutine function"""
+        self._before_call()
+        try:
+            result = await func()
+        except BaseException as exc:
+            self._failed(exc)
+            raise
+        self._record(True)
+        return result
+
+    def _failed(self, exc):
+        if isinstance(exc, self.ignored_errors):
+            self._record(True)
+            return
+        self._record(False)
+        if isinstance(exc, PROVIDER_ERRORS):
+            logger.warning('%s call failed: %s', self.name, str(exc) or type(exc).__name__)
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if self.clock() - self.opened_at < settings.CIRCUIT_BREAKER_RESET_TIMEOUT:
+                    raise CircuitOpen(f'{self.name} circuit is open')
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpen(f'{self.name} circuit is half-open')
+                self._trial_running = True
+
+    def _record(self, succeeded):
+        with self._lock:
+            now = self.clock()
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                if succeeded:
+                    logger.info('%s circuit closed', self.name)
+                    self.state = self.CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+
+            self._calls.append((now, succeeded))
+            while self._calls and now - self._calls[0][0] > settings.CIRCUIT_BREAKER_WINDOW:
+                self._calls.popleft()
+            failures = sum(1 for _, ok in self._calls if not ok)
+            if (
+                self.state == self.CLOSED
+                and len(self._calls) >= settings.CIRCUIT_BREAKER_MIN_CALLS
+                and failures / len(self._calls) >= settings.CIRCUIT_BREAKER_FAILURE_RATE
+            ):
+                self._open(now)
+
+    def _open(self, now):
+        logger.warning('%s circuit opened', self.name)
+        self.state = self.OPEN
+        self.opened_at = now
+        self._calls.clear()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.opened_at = None
+            self._calls.clear()
+            self._trial_running = False
+
+
+breakers = {
+    'quotable': CircuitBreaker('quotable'),
+    'quotes_rest': CircuitBreaker('quotes_rest'),
+    # wttr.in is called with whatever city the client asked for, so an
+    # unknown one must not take the weather down for everybody else
+    'wttr': CircuitBreaker('wttr', ignored_errors=(ClientError,)),
+}
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def hedge_executor():
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=settings.EXTERNAL_API_POOL_SIZE, thread_name_prefix='external-hedge'
+                )
+    return _hedge_executor
+
+
+def check_status(url, status_code):
+    if status_code == 200:
+        return
+    message = f'{url} returned HTTP {status_code}'
+    # Timeouts and rate limiting are about the provider, not the request
+    if 400 <= status_code < 500 and status_code not in (408, 429):
+        raise ClientError(message)
+    raise UnexpectedResponse(message)
+
+
+def get_json(url, **kwargs):
+    response = get_session().get(url, timeout=settings.EXTERNAL_API_TIMEOUT, **kwargs)
+    check_status(url, response.status_code)
+    return response.json()
+
+
+async def aget_json(url, verify=True):
+    response = await get_async_client(verify).get(url, timeout=settings.EXTERNAL_API_TIMEOUT)
+    check_status(url, response.status_code)
+    try:
+        return response.json()
+    except ValueError as exc:
+        # requests' JSONDecodeError is a RequestException, httpx's isn't an HTTPError
+        raise UnexpectedResponse(f'{url} returned invalid JSON: {exc}')
+
+
+def parse_quote(quote_data):
+    """Normalize the payload of either quote API to (source, data)"""
+    if 'content' in quote_data:  # Quotable API format
+        return 'Quotable API', {
+            'quote': quote_data.get('content'),
+            'author': quote_data.get('author'),
+            'tags': quote_data.get('tags', []),
+        }
+    if 'contents' in quote_data:  # Quote of the Day API format
+        quote = quote_data['contents']['quotes'][0]
+        return 'Quote of the Day API', {
+            'quote': quote.get('quote'),
+            'author': quote.get('author'),
+            'tags': quote.get('tags', []),
+        }
+    raise UnexpectedResponse('Unrecognized quote payload')
+
+
+def quote_providers():
+    """(name, url) of the quote APIs, in order of preference"""
+    return [
+        ('quotable', settings.QUOTABLE_API_URL),
+        ('quotes_rest', settings.QUOTES_REST_API_URL),
+    ]
+
+
+def get_provider_quote(name, url):
+    """A provider's quote, from the cache or through its circuit breaker"""
+    def load():
+        # Skip SSL verification for demo
+        return breakers[name].call(lambda: parse_quote(get_json(url, verify=False)))
+
+    return quote_cache.get(name, load, settings.QUOTES_CACHE_TTL, settings.EXTERNAL_API_STALE_TTL)
+
+
+def fetch_quote():
+    """
+    Return (source, data) from the first quote API that answers, or None
+    when none does. Each provider's last answer is cached for
+    QUOTES_CACHE_TTL seconds. With QUOTES_HEDGED the providers are asked
+    concurrently and the first valid answer wins; otherwise they are tried
+    in order of preference.
+    """
+    if settings.QUOTES_HEDGED:
+        return fetch_quote_hedged()
+    for name, url in quote_providers():
+        try:
+            return get_provider_quote(name, url)
+        except PROVIDER_ERRORS:
+            continue  # Try next API
+    return None
+
+
+def fetch_quote_hedged():
+    # The slower calls keep running after the first answer and refresh
+    # their provider's cache entry
+    pending = {
+        hedge_executor().submit(get_provider_quote, name, url)
+        for name, url in quote_providers()
+    }
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+    return None
+
+
+async def aget_provider_quote(name, url):
+    async def load():
+        return parse_quote(await aget_json(url, verify=False))
+
+    return await quote_cache.aget(
+        name, lambda: breakers[name].acall(load), settings.QUOTES_CACHE_TTL, settings.EXTERNAL_API_STALE_TTL
+    )
+
+
+async def afetch_quote():
+    """fetch_quote() for the async views"""
+    if settings.QUOTES_HEDGED:
+        return await afetch_quote_hedged()
+    for name, url in quote_providers():
+        try:
+            return await aget_provider_quote(name, url)
+        except PROVIDER_ERRORS:
+            continue  # Try next API
+    return None
+
+
+async def afetch_quote_hedged():
+    pending = {
+        asyncio.ensure_future(aget_provider_quote(name, url))
+        for name, url in quote_providers()
+    }
+    for task in pending:
+        task.add_done_callback(_retrieve_exception)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task.result()
+    return None
+
+
+def parse_weather(weather_data):
+    current = weather_data.get('current_condition', [{}])[0]
+    return {
+        'temperature': current.get('temp_C', 'N/A') + '°C',
+        'condition': current.get('weatherDesc', [{}])[0].get('value', 'N/A'),
+        'humidity': current.get('humidity', 'N/A') + '%',
+        'wind_speed': current.get('windspeedKmph', 'N/A') + ' km/h',
+        'feels_like': current.get('FeelsLikeC', 'N/A') + '°C',
+    }
+
+
+def fetch_weather(city):
+    """
+    Return the current conditions for `city` from wttr.in, cached per city
+    for WEATHER_CACHE_TTL seconds. Raises requests.RequestException or
+    UnexpectedResponse (CircuitOpen while wttr.in is considered down) when
+    the API can't be reached or fails.
+    """
+    def load():
+        return parse_weather(get_json(settings.WEATHER_API_URL.format(city=quote(city))))
+
+    return weather_cache.get(
+        city.strip().lower(),
+        lambda: breakers['wttr'].call(load),
+        settings.WEATHER_CACHE_TTL,
+        settings.EXTERNAL_API_STALE_TTL,
+    )
+
+
+async def afetch_weather(city):
+    """
+    fetch_weather() for the async views; raises httpx.HTTPError instead of
+    requests.RequestException
+    """
+    async def load():
+        return parse_weather(await aget_json(settings.WEATHER_API_URL.format(city=quote(city))))
+
+    return await weather_cache.aget(
+        city.strip().lower(),
+        lambda: breakers['wttr'].acall(load),
+        settings.WEATHER_CACHE_TTL,
+        settings.EXTERNAL_API_STALE_TTL,
+    )
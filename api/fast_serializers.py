@@ -0,0 +1,174 @@
+"""
+Fast read path for the hot list endpoints.
+
+ModelSerializer builds a model instance per row, then runs get_attribute()
+and to_representation() for every field of it. RowSerializer reads the
+rendered columns with values_list() instead and turns each row into a dict
+with converters precomputed from the serializer's fields. For the field
+types it knows the data is the same as the serializer's, so the rendered
+JSON is byte-identical; serializers using any other field fall back to the
+regular path.
+"""
+import decimal
+
+from django.conf import settings
+from rest_framework import fields, relations
+from rest_framework.settings import api_settings
+
+
+# Fields whose representation of a database value is the value itself
+IDENTITY_FIELDS = (
+    fields.BooleanField, fields.CharField, fields.ChoiceField, fields.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+class UnsupportedField(Exception):
+    pass
+
+
+def _output_format(field, default):
+    output_format = getattr(field, 'format', default)
+    if not isinstance(output_format, str) or output_format.lower() != fields.ISO_8601:
+        raise UnsupportedField(field)
+
+
+def datetime_converter(field):
+    """DateTimeField.to_representation() with the ISO 8601 output format"""
+    _output_format(field, api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        raise UnsupportedField(field)
+
+    def convert(value):
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def date_converter(field):
+    """DateField.to_representation() with the ISO 8601 output format"""
+    _output_format(field, api_settings.DATE_FORMAT)
+    return lambda value: value.isoformat()
+
+
+def decimal_converter(field):
+    """DecimalField.to_representation() for string output"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        raise UnsupportedField(field)
+    quantum = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(quantum, rounding=rounding, context=context):f}'
+    return convert
+
+
+def field_converter(field):
+    """The converter for one serializer field (None for the identity)"""
+    if isinstance(field, fields.DateTimeField):
+        return datetime_converter(field)
+    if isinstance(field, fields.DateField):
+        return date_converter(field)
+    if isinstance(field, fields.DecimalField):
+        return decimal_converter(field)
+    if isinstance(field, fields.MultipleChoiceField):
+        raise UnsupportedField(field)
+    if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is not None:
+        raise UnsupportedField(field)
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    raise UnsupportedField(field)
+
+
+class RowSerializer:
+    """
+    Renders rows fetched by values() the way `serializer` renders instances.
+
+    Serializers may list SerializerMethodFields whose value is a queryset
+    annotation of the same name in `fast_annotation_fields`.
+    """
+
+    def __init__(self, plan, extra_columns=()):
+        # (name, column, converter) per rendered field
+        self.plan = plan
+        self.columns = list(dict.fromkeys([column for _, column, _ in plan] + list(extra_columns)))
+        self.getters = [(name, self.columns.index(column), convert) for name, column, convert in plan]
+
+    @classmethod
+    def for_serializer(cls, serializer, extra_columns=()):
+        """
+        A RowSerializer rendering like `serializer` (also fetching
+        `extra_columns`), or None if one of its fields isn't supported
+        """
+        annotations = getattr(serializer, 'fast_annotation_fields', ())
+        plan = []
+        try:
+            for name, field in serializer.fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, fields.SerializerMethodField):
+                    if name not in annotations:
+                        raise UnsupportedField(field)
+                    plan.append((name, name, None))
+                    continue
+                if not field.source_attrs or len(field.source_attrs) != 1:
+                    raise UnsupportedField(field)
+                plan.append((name, field.source, field_converter(field)))
+        except UnsupportedField:
+            return None
+        return cls(plan, extra_columns)
+
+    def values(self, queryset):
+        """
+        `queryset` as named rows, which also offer the columns as
+        attributes (e.g. to the pagination cursors)
+        """
+        return queryset.values_list(*self.columns, named=True)
+
+    def to_representation(self, row):
+        data = {}
+        for name, index, convert in self.getters:
+            value = row[index]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def serialize(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+class FastListMixin:
+    """
+    Serializes list pages with a RowSerializer when API_FAST_SERIALIZATION
+    is on and the list serializer only uses supported fields.
+    """
+    # Columns fetched besides the rendered ones: the keyset cursors and the
+    # response validators read them
+    row_extra_columns = ('pk', 'created_at', 'updated_at')
+
+    def get_row_serializer(self):
+        if not settings.API_FAST_SERIALIZATION:
+            return None
+        return RowSerializer.for_serializer(self.get_serializer(), self.row_extra_columns)
+
+    def get_list_queryset(self):
+        """The filtered queryset, as rows when the fast path applies"""
+        queryset = self.filter_queryset(self.get_queryset())
+        self.row_serializer = self.get_row_serializer()
+        if self.row_serializer is not None:
+            queryset = self.row_serializer.values(queryset)
+        return queryset
+
+    def serialize_list(self, objects):
+        if self.row_serializer is not None:
+            return self.row_serializer.serialize(objects)
+        return self.get_serializer(objects, many=True).data
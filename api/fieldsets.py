@@ -0,0 +1,78 @@
+"""
+Sparse fieldsets for the API viewsets: ?fields= and ?exclude=.
+
+Clients name the fields they want (?fields=id,status) or don't want
+(?exclude=description) in list, detail and export responses. The serializer
+drops the other fields and the queryset only loads the model columns that
+are still rendered, so large text columns are not even read from the
+database.
+"""
+from rest_framework.exceptions import ValidationError
+
+
+class SparseFieldsetMixin:
+    """
+    Trims the serializer fields and the loaded columns of the list,
+    retrieve and export actions. The serializer must accept a `fields`
+    argument (see DynamicFieldsModelSerializer).
+    """
+    fields_query_param = 'fields'
+    exclude_query_param = 'exclude'
+    sparse_actions = ('list', 'retrieve', 'export')
+    # Columns loaded whatever the client asked for: the response validators
+    # and the keyset cursors read them
+    projection_required_fields = ('created_at', 'updated_at')
+
+    def get_sparse_fields(self):
+        """
+        The serializer fields to render, in their declared order, or None
+        for all of them
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+
+    def _parse_sparse_fields(self):
+        if self.action not in self.sparse_actions:
+            return None
+        available = list(self.get_serializer_class().Meta.fields)
+        fields = self._parse_field_list(self.fields_query_param, available)
+        excluded = self._parse_field_list(self.exclude_query_param, available)
+        if fields is None and excluded is None:
+            return None
+        return [
+            name for name in available
+            if (fields is None or name in fields) and name not in (excluded or ())
+        ]
+
+    def _parse_field_list(self, param, available):
+        value = self.request.query_params.get(param)
+        if not value:
+            return None
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = names - set(available)
+        if unknown:
+            raise ValidationError({param: f'Unknown fields: {", ".join(sorted(unknown))}'})
+        return names
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def get_queryset(self):
+        """
+        Load only the columns behind the rendered fields (every field of the
+        action's serializer when the client didn't choose)
+        """
+        queryset = super().get_queryset()
+        if self.action not in self.sparse_actions:
+            return queryset
+        fields = self.get_sparse_fields()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(
+            *self.projection_required_fields, *(name for name in fields if name in columns)
+        )
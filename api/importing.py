@@ -0,0 +1,269 @@
+"""
+Streaming bulk import of projects and tasks from CSV or NDJSON.
+
+Rows are read one at a time, validated with the API serializers' field
+rules (ProjectSerializer / TaskSerializer) and inserted with bulk_create,
+one transaction per chunk. Tasks reference their project by id (`project`)
+or by title (`project_title`), resolved with one query per chunk. Invalid
+rows are rejected and reported without stopping the import.
+
+With a checkpoint key, the number of rows consumed is stored in the same
+transaction as each chunk (ImportCheckpoint), so running the same import
+again skips exactly the rows already committed. Used by the `import_data`
+management command and the /api/<projects|tasks>/import/ endpoints.
+"""
+import codecs
+import csv
+import json
+import time
+from pathlib import PurePath
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import ImportCheckpoint, Project, Task
+from .serializers import ProjectSerializer, TaskSerializer
+from .signals import projects_bulk_created, tasks_bulk_saved
+
+
+FORMATS = ('csv', 'ndjson')
+# File extensions and content types recognized for each format
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+FORMAT_CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+def read_csv(lines):
+    """
+    Rows of a CSV document with a header line. Empty cells are left out, so
+    optional fields take their defaults.
+    """
+    for row in csv.DictReader(lines):
+        yield {name: value for name, value in row.items() if name is not None and value not in ('', None)}
+
+
+def read_ndjson(lines):
+    """One row per non-blank line; lines that aren't JSON are rejected"""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield ValidationError({'non_field_errors': [f'Invalid JSON: {exc}']})
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+def read_rows(lines, input_format):
+    """
+    The rows of `lines` (an iterable of str or bytes lines, e.g. an open
+    file, an upload or a request body) in the given format
+    """
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return iter(())
+    if isinstance(first, bytes):
+        lines = codecs.iterdecode(_chain(first, lines), 'utf-8-sig')
+    else:
+        lines = _chain(first.lstrip('\ufeff'), lines)
+    return READERS[input_format](lines)
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def guess_format(name='', content_type=''):
+    """The format named by a file extension or content type, or None"""
+    content_type = content_type.split(';')[0].strip().lower()
+    return FORMAT_EXTENSIONS.get(PurePath(name).suffix.lower()) or FORMAT_CONTENT_TYPES.get(content_type)
+
+
+class Importer:
+    """
+    Imports rows of one kind ('projects' or 'tasks'). `on_chunk(report)`
+    is called after each committed chunk and `on_reject(rejection)` for
+    every rejected row ({'row': number, 'errors': ..., 'data': ...}).
+    """
+    serializer_classes = {'projects': ProjectSerializer, 'tasks': TaskSerializer}
+
+    def __init__(self, kind, checkpoint=None, chunk_size=None, on_chunk=None, on_reject=None):
+        if kind not in self.serializer_classes:
+            raise ValueError(f'Unknown import kind: {kind}')
+        self.kind = kind
+        self.checkpoint_key = checkpoint
+        self.chunk_size = chunk_size or settings.API_IMPORT_CHUNK_SIZE
+        self.on_chunk = on_chunk
+        self.on_reject = on_reject
+
+    def run(self, rows):
+        """
+        Import `rows` (dicts, or ValidationErrors for rows that couldn't be
+        parsed) and return a report of this run: rows skipped thanks to the
+        checkpoint, rows processed, inserted and rejected, and rows per second
+        """
+        checkpoint = None
+        if self.checkpoint_key:
+            checkpoint, _ = ImportCheckpoint.objects.get_or_create(key=self.checkpoint_key)
+        skip = checkpoint.position if checkpoint else 0
+        self.report = {'skipped': 0, 'processed': 0, 'inserted': 0, 'rejected': 0, 'rows_per_s': 0.0}
+        self.started = time.perf_counter()
+
+        chunk = []
+        for number, data in enumerate(rows, start=1):
+            if number <= skip:
+                self.report['skipped'] += 1
+                continue
+            chunk.append((number, data))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk, checkpoint)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk, checkpoint)
+        return self.report
+
+    def import_chunk(self, chunk, checkpoint):
+        context = self.get_validation_context(chunk)
+        serializer = self.serializer_classes[self.kind](context=context)
+        instances, rejections = [], []
+        for number, data in chunk:
+            try:
+                if isinstance(data, ValidationError):
+                    raise data
+                self.resolve_references(data, context)
+                attrs = serializer.run_validation(data)
+            except ValidationError as exc:
+                rejections.append({'row': number, 'errors': exc.detail, 'data': data})
+                continue
+            instances.append(serializer.Meta.model(**attrs))
+
+        with transaction.atomic():
+            self.save(instances)
+            if checkpoint is not None:
+                checkpoint.position = chunk[-1][0]
+                checkpoint.inserted += len(instances)
+                checkpoint.rejected += len(rejections)
+                checkpoint.save()
+
+        self.report['processed'] += len(chunk)
+        self.report['inserted'] += len(instances)
+        self.report['rejected'] += len(rejections)
+        elapsed = time.perf_counter() - self.started
+        self.report['rows_per_s'] = round(self.report['processed'] / elapsed, 1) if elapsed else 0.0
+        if self.on_reject is not None:
+            for rejection in rejections:
+                self.on_reject(rejection)
+        if self.on_chunk is not None:
+            self.on_chunk(self.report)
+
+    def get_validation_context(self, chunk):
+        """
+        Task rows resolve their projects against one lookup per chunk:
+        ids through TaskProjectField's `project_cache`, titles through
+        `projects_by_title`
+        """
+        if self.kind != 'tasks':
+            return {}
+        ids, titles = set(), set()
+        for _, data in chunk:
+            if not isinstance(data, dict):
+                continue
+            if data.get('project') is not None:
+                try:
+                    ids.add(int(data['project']))
+                except (TypeError, ValueError):
+                    pass
+            elif isinstance(data.get('project_title'), str):
+                titles.add(data['project_title'])
+
+        projects_by_title = {}
+        for project in Project.objects.filter(title__in=titles).only('pk', 'title'):
+            projects_by_title.setdefault(project.title, []).append(project)
+        project_cache = Project.objects.only('pk').in_bulk(ids)
+        for projects in projects_by_title.values():
+            project_cache.update((project.pk, project) for project in projects)
+        return {'project_cache': project_cache, 'projects_by_title': projects_by_title}
+
+    def resolve_references(self, data, context):
+        """Replace a task's `project_title` with the id of that project"""
+        if self.kind != 'tasks' or not isinstance(data, dict):
+            return
+        title = data.get('project_title')
+        if data.get('project') is not None or title is None:
+            return
+        matches = context['projects_by_title'].get(title, [])
+        if len(matches) != 1:
+            message = (
+                f'No project is titled "{title}".' if not matches
+                else f'{len(matches)} projects are titled "{title}"; use the project id.'
+            )
+            raise ValidationError({'project_title': [message]})
+        data['project'] = matches[0].pk
+
+    def save(self, instances):
+        if not instances:
+            return
+        if self.kind == 'projects':
+            Project.objects.bulk_create(instances)
+            projects_bulk_created.send(sender=Project, projects=instances)
+        else:
+            Task.objects.bulk_create(instances)
+            tasks_bulk_saved.send(
+                sender=Task,
+                tasks=instances,
+                created=True,
+                project_ids={task.project_id for task in instances},
+            )
+
+
+class ImportMixin:
+    """
+    Adds an `import` action (POST <prefix>/import/) loading CSV or NDJSON
+    rows, sent as the request body or as a multipart `file`, into the
+    viewset's model. ?checkpoint=<key> makes the import resumable.
+    """
+    import_kind = None
+    # Rejected rows listed in the response (all of them are counted)
+    reported_rejections = 100
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_rows(self, request):
+        """Bulk import rows, reporting the rejected ones"""
+        upload = request.FILES.get('file') if request.content_type.startswith('multipart/') else None
+        if upload is not None:
+            input_format = guess_format(upload.name, upload.content_type)
+            lines = upload
+        else:
+            input_format = guess_format(content_type=request.content_type)
+            # The body is read line by line instead of all at once
+            lines = request.stream or ()
+        input_format = request.query_params.get('input_format', input_format)
+        if input_format not in FORMATS:
+            return Response(
+                {'error': f'Send CSV (text/csv) or NDJSON (application/x-ndjson), or set '
+                          f'input_format to one of: {", ".join(FORMATS)}'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+
+        rejections = []
+
+        def on_reject(rejection):
+            if len(rejections) < self.reported_rejections:
+                rejections.append({'row': rejection['row'], 'errors': rejection['errors']})
+
+        importer = Importer(
+            self.import_kind, checkpoint=request.query_params.get('checkpoint'), on_reject=on_reject,
+        )
+        report = importer.run(read_rows(lines, input_format))
+        return Response({**report, 'rejections': rejections})
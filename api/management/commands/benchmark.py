@@ -0,0 +1,106 @@
+import platform
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api import benchmarks
+from api.seeding import seed_data
+
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and benchmarks the API endpoints '
+        '(wall time, query count, peak memory), optionally against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2000,
+                            help='Synthetic projects to seed (default: 2000)')
+        parser.add_argument('--tasks-per-project', type=int, default=10,
+                            help='Average tasks per project (default: 10)')
+        parser.add_argument('--seed', type=int, default=42,
+                            help='Random seed for the synthetic data (default: 42)')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per scenario (default: 20)')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run this scenario (repeatable)')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help='Baseline JSON file (default: benchmarks/baseline.json)')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed relative slowdown before failing (default: 0.25)')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write the results to the baseline file instead of comparing')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        known = {scenario.name for scenario in benchmarks.SCENARIOS}
+        unknown = set(options['scenarios'] or []) - known
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(
+                f'Seeding {options["projects"]} projects with '
+                f'~{options["tasks_per_project"]} tasks each...'
+            )
+            seed_data(options['projects'], options['tasks_per_project'], seed=options['seed'])
+            results = benchmarks.run_suite(
+                iterations=options['iterations'],
+                names=options['scenarios'],
+                progress=self.report,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        meta = {
+            'dataset': {
+                'projects': options['projects'],
+                'tasks_per_project': options['tasks_per_project'],
+                'seed': options['seed'],
+            },
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'iterations': options['iterations'],
+        }
+        if options['output']:
+            benchmarks.write_results(options['output'], results, **meta)
+
+        if options['update_baseline']:
+            benchmarks.write_results(options['baseline'], results, **meta)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+
+        try:
+            baseline = benchmarks.load_baseline(options['baseline'])
+        except FileNotFoundError:
+            self.stdout.write(self.style.WARNING(
+                f'No baseline at {options["baseline"]}; run with --update-baseline to create one'
+            ))
+            return
+        if baseline.get('dataset') != meta['dataset']:
+            self.stdout.write(self.style.WARNING(
+                'Baseline was recorded with a different dataset; comparison may be meaningless'
+            ))
+
+        regressions = benchmarks.compare(results, baseline, options['threshold'])
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'  {regression}'))
+            raise CommandError(f'{len(regressions)} performance regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def report(self, name, metrics):
+        self.stdout.write(
+            f'  {name:<26} median {metrics["median_ms"]:8.2f} ms  '
+            f'p95 {metrics["p95_ms"]:8.2f} ms  '
+            f'{metrics["queries"]:3d} queries  '
+            f'peak {metrics["peak_kb"]:9.1f} KiB'
+        )
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from api import benchmarks, external
+from api.seeding import seed_data
+
+
+WEATHER_PAYLOAD = {'current_condition': [{
+    'temp_C': '12', 'weatherDesc': [{'value': 'Cloudy'}], 'humidity': '80',
+    'windspeedKmph': '10', 'FeelsLikeC': '10',
+}]}
+QUOTE_PAYLOAD = {'content': 'Stay hungry.', 'author': 'Someone', 'tags': []}
+
+# endpoint -> (sync path, async path); {i} is the request number
+ENDPOINTS = {
+    'weather': ('/api/external/weather/?city=city{i}', '/api/async/external/weather/?city=city{i}'),
+    'quotes': ('/api/external/quotes/', '/api/async/external/quotes/'),
+    'dashboard': ('/api/dashboard/', '/api/async/dashboard/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the concurrent throughput of the sync views (WSGI, a fixed '
+        'number of workers) with their async counterparts (ASGI, one event '
+        'loop) against a local stub upstream with a fixed latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), action='append', dest='endpoints',
+                            help='Endpoint to load (repeatable; default: all)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per endpoint and mode (default: 200)')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Requests in flight on the async path (default: 50)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent requests on the sync path, like sync '
+                                 'gunicorn workers (default: 4)')
+        parser.add_argument('--upstream-latency', type=float, default=0.2,
+                            help='Seconds the stub upstream takes to answer (default: 0.2)')
+        parser.add_argument('--projects', type=int, default=200,
+                            help='Synthetic projects seeded for the dashboard (default: 200)')
+
+    def handle(self, *args, **options):
+        latency = options['upstream_latency']
+        routes = {'*': (200, WEATHER_PAYLOAD, latency), '/quotable': (200, QUOTE_PAYLOAD, latency)}
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_data(options['projects'], 10, seed=0)
+            with benchmarks.StubAPIServer(routes) as stub, override_settings(
+                QUOTABLE_API_URL=f'{stub.url}/quotable',
+                WEATHER_API_URL=stub.url + '/weather/{city}',
+                # Every request goes upstream / to the database
+                QUOTES_CACHE_TTL=0,
+                WEATHER_CACHE_TTL=0,
+                EXTERNAL_API_STALE_TTL=0,
+                DASHBOARD_CACHE_TTL=0,
+                EXTERNAL_API_POOL_SIZE=max(options['concurrency'], options['workers']),
+                API_LATENCY_BUDGET_MS=0,
+            ):
+                for endpoint in options['endpoints'] or sorted(ENDPOINTS):
+                    self.run_endpoint(endpoint, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_endpoint(self, endpoint, options):
+        sync_path, async_path = ENDPOINTS[endpoint]
+        count = options['requests']
+        self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+
+        external.quote_cache.clear()
+        external.weather_cache.clear()
+        sync = benchmarks.run_sync_load(
+            [sync_path.format(i=i) for i in range(count)], options['workers'],
+        )
+        self.report(f'sync ({options["workers"]} workers)', sync)
+
+        external.quote_cache.clear()
+        external.weather_cache.clear()
+        async_ = benchmarks.run_async_load(
+            [async_path.format(i=i) for i in range(count)], options['concurrency'],
+        )
+        self.report(f'async ({options["concurrency"]} in flight)', async_)
+
+        speedup = async_['requests_per_s'] / sync['requests_per_s'] if sync['requests_per_s'] else 0
+        self.stdout.write(f'  async throughput: {speedup:.1f}x sync')
+
+    def report(self, label, metrics):
+        self.stdout.write(
+            f'  {label:<24} {metrics["requests_per_s"]:8.1f} req/s  '
+            f'median {metrics["median_ms"]:8.2f} ms  p95 {metrics["p95_ms"]:8.2f} ms'
+            + (f'  {metrics["failures"]} failed' if metrics['failures'] else '')
+        )
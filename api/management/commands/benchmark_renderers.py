@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api import benchmarks
+from api.seeding import seed_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and compares the encode time and '
+        'payload size of large responses with each installed renderer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2000,
+                            help='Synthetic projects to seed (default: 2000)')
+        parser.add_argument('--tasks-per-project', type=int, default=10,
+                            help='Average tasks per project (default: 10)')
+        parser.add_argument('--rows', type=int, default=5000,
+                            help='Tasks rendered per response (default: 5000)')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed runs per renderer (default: 20)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_data(options['projects'], options['tasks_per_project'], seed=0)
+            results = benchmarks.run_renderer_benchmark(options['rows'], options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, by_renderer in results.items():
+            self.stdout.write(name)
+            reference = by_renderer['json']
+            for renderer_name, metrics in by_renderer.items():
+                speedup = reference['encode_ms'] / metrics['encode_ms'] if metrics['encode_ms'] else 0
+                size = metrics['bytes'] / reference['bytes']
+                self.stdout.write(
+                    f'  {renderer_name:<8} {metrics["encode_ms"]:9.3f} ms ({speedup:4.1f}x)  '
+                    f'{metrics["bytes"]:10d} bytes ({size:.0%})'
+                )
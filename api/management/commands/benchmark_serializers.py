@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api import benchmarks
+from api.seeding import seed_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and compares the rows per second of '
+        'the list serializers with their values_list() fast path'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=2000,
+                            help='Synthetic projects to seed (default: 2000)')
+        parser.add_argument('--tasks-per-project', type=int, default=10,
+                            help='Average tasks per project (default: 10)')
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Rows fetched and serialized per run (default: 1000)')
+        parser.add_argument('--iterations', type=int, default=10,
+                            help='Timed runs per serializer (default: 10)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            seed_data(options['projects'], options['tasks_per_project'], seed=0)
+            results = benchmarks.run_serializer_benchmark(options['rows'], options['iterations'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for name, metrics in results.items():
+            speedup = metrics['fast_rows_per_s'] / metrics['serializer_rows_per_s']
+            self.stdout.write(
+                f'  {name:<10} {metrics["rows"]:6d} rows  '
+                f'serializer {metrics["serializer_rows_per_s"]:10.1f} rows/s  '
+                f'fast path {metrics["fast_rows_per_s"]:10.1f} rows/s  ({speedup:.1f}x)'
+            )
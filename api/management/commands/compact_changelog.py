@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.changelog import compact_change_log
+
+
+class Command(BaseCommand):
+    help = 'Deletes the change log entries superseded by a later change of the same object'
+
+    def handle(self, *args, **options):
+        deleted = compact_change_log()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} superseded change log entries'))
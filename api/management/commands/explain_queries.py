@@ -0,0 +1,142 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Project, Task
+from api.seeding import seed_data
+
+
+# Indexes added for the API's access paths (see api/migrations/0003)
+QUERY_INDEXES = [
+    (Project, 'project_status_created_idx'),
+    (Project, 'project_created_id_idx'),
+    (Project, 'project_client_idx'),
+    (Task, 'task_project_completed_idx'),
+    (Task, 'task_created_id_idx'),
+]
+POSTGRES_INDEXES = [(Project, 'project_client_trgm_idx')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Shows query plans and timings for the filters and orderings used by '
+        'the API, with and without the access-path indexes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed-projects',
+            type=int,
+            default=0,
+            help='Insert this many synthetic projects first (rolled back unless --keep)',
+        )
+        parser.add_argument(
+            '--tasks-per-project',
+            type=int,
+            default=20,
+            help='Synthetic tasks inserted per seeded project (default: 20)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per query; the best time is reported (default: 5)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Commit the seeded rows instead of rolling them back',
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+
+        with transaction.atomic():
+            if options['seed_projects']:
+                self.seed(options['seed_projects'], options['tasks_per_project'])
+            self.analyze()
+
+            self.stdout.write(self.style.MIGRATE_HEADING('With indexes'))
+            with_indexes = self.run_queries()
+
+            # Drop the indexes inside a savepoint so they come back afterwards
+            savepoint = transaction.savepoint()
+            self.drop_indexes()
+            self.analyze()
+            self.stdout.write(self.style.MIGRATE_HEADING('Without indexes'))
+            without_indexes = self.run_queries()
+            transaction.savepoint_rollback(savepoint)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Summary (best of %d runs)' % self.repeat))
+            for label, elapsed in with_indexes.items():
+                before = without_indexes[label]
+                speedup = before / elapsed if elapsed else float('inf')
+                self.stdout.write(
+                    f'  {label:<40} {before * 1000:9.2f} ms -> {elapsed * 1000:9.2f} ms'
+                    f'  ({speedup:.1f}x)'
+                )
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def access_paths(self):
+        """The querysets issued by the list views and the dashboard"""
+        project_id = Project.objects.values_list('pk', flat=True).first()
+        thirty_days_ago = timezone.now().date() - timedelta(days=30)
+        return {
+            'projects ?status=': Project.objects.with_task_counts()
+                .filter(status='in_progress')[:10],
+            'projects ?client= (icontains)': Project.objects.with_task_counts()
+                .filter(client_name__icontains='mart')[:10],
+            'projects keyset page': Project.objects.order_by('-created_at', 'id')[:10],
+            'tasks ?project=&completed=': Task.objects
+                .filter(project_id=project_id, completed=False)[:10],
+            'tasks keyset page': Task.objects.order_by('-created_at', 'id')[:10],
+            'dashboard recent projects': Project.objects
+                .filter(created_at__gte=thirty_days_ago).order_by().values('pk'),
+        }
+
+    def run_queries(self):
+        timings = {}
+        for label, queryset in self.access_paths().items():
+            self.stdout.write(self.style.SQL_KEYWORD(label))
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+            best = None
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = best
+        return timings
+
+    def drop_indexes(self):
+        indexes = list(QUERY_INDEXES)
+        if connection.vendor == 'postgresql':
+            indexes += POSTGRES_INDEXES
+        sql_delete_index = connection.SchemaEditorClass.sql_delete_index
+        quote_name = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model, name in indexes:
+                cursor.execute(sql_delete_index % {
+                    'table': quote_name(model._meta.db_table),
+                    'name': quote_name(name),
+                })
+
+    def analyze(self):
+        """Refresh planner statistics so the plans reflect the data"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('ANALYZE api_project, api_task')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def seed(self, project_count, tasks_per_project):
+        self.stdout.write(
+            f'Seeding {project_count} projects with ~{tasks_per_project} tasks each...'
+        )
+        seed_data(project_count, tasks_per_project, seed=0)
@@ -0,0 +1,84 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.utils import encoders
+
+from api.importing import FORMATS, Importer, guess_format, read_rows
+from api.models import ImportCheckpoint
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports projects or tasks from a CSV or NDJSON file, validating rows '
+        'with the API field rules and inserting them in chunks'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(Importer.serializer_classes),
+                            help='What the file contains')
+        parser.add_argument('path', help='CSV (with a header line) or NDJSON file')
+        parser.add_argument('--format', choices=FORMATS, dest='input_format',
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int,
+                            help='Rows inserted per transaction (default: API_IMPORT_CHUNK_SIZE)')
+        parser.add_argument('--checkpoint',
+                            help='Checkpoint key (default: derived from the kind and path)')
+        parser.add_argument('--no-checkpoint', action='store_true',
+                            help='Don\'t record progress; a rerun imports everything again')
+        parser.add_argument('--restart', action='store_true',
+                            help='Forget the recorded progress and start from the first row')
+        parser.add_argument('--rejects',
+                            help='Write the rejected rows and their errors to this NDJSON file')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or guess_format(path)
+        if input_format is None:
+            raise CommandError('Unknown file type; pass --format csv or --format ndjson')
+        if options['chunk_size'] is not None and options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be > 0')
+
+        checkpoint = None
+        if not options['no_checkpoint']:
+            checkpoint = options['checkpoint'] or f'{options["kind"]}:{os.path.abspath(path)}'
+            if options['restart']:
+                ImportCheckpoint.objects.filter(key=checkpoint).delete()
+
+        rejects = open(options['rejects'], 'w') if options['rejects'] else None
+        shown = []
+
+        def on_reject(rejection):
+            if rejects is not None:
+                rejects.write(json.dumps(rejection, cls=encoders.JSONEncoder) + '\n')
+            if len(shown) < 10:
+                shown.append(rejection)
+
+        def on_chunk(report):
+            self.stdout.write(
+                f'  {report["processed"]} rows, {report["inserted"]} imported, '
+                f'{report["rejected"]} rejected ({report["rows_per_s"]:,.0f} rows/s)'
+            )
+
+        importer = Importer(
+            options['kind'], checkpoint=checkpoint, chunk_size=options['chunk_size'],
+            on_chunk=on_chunk, on_reject=on_reject,
+        )
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                report = importer.run(read_rows(f, input_format))
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+        if report['skipped']:
+            self.stdout.write(f'Skipped {report["skipped"]} rows imported by an earlier run')
+        for rejection in shown:
+            self.stderr.write(f'  row {rejection["row"]}: {json.dumps(rejection["errors"], cls=encoders.JSONEncoder)}')
+        if report['rejected'] > len(shown):
+            self.stderr.write(f'  ... and {report["rejected"] - len(shown)} more rejected rows')
+        style = self.style.WARNING if report['rejected'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Imported {report["inserted"]} {options["kind"]}, rejected {report["rejected"]} '
+            f'({report["rows_per_s"]:,.0f} rows/s)'
+        ))
@@ -1,19 +1,58 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from api.models import Project, Task
+from api.seeding import clear_data, seed_data
+from api.signals import tasks_bulk_saved
 from decimal import Decimal
+import time
 
 
 class Command(BaseCommand):
-    help = 'Populates the database with sample data for demonstration'
+    help = (
+        'Populates the database with sample data for demonstration, or with '
+        'synthetic data at scale when --projects is given'
+    )
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--projects',
+            type=int,
+            help='Generate this many synthetic projects instead of the sample data',
+        )
+        parser.add_argument(
+            '--tasks-per-project',
+            type=int,
+            default=10,
+            help='Average number of tasks per synthetic project (default: 10)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed, for reproducible synthetic data',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Projects inserted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--append',
+            action='store_true',
+            help='Keep the existing data instead of clearing it first',
+        )
+
+    def handle(self, *args, **options):
+        if options['projects'] is not None:
+            return self.generate(options)
+        
         self.stdout.write('Creating sample data...')
         
         # Clear existing data
-        Project.objects.all().delete()
-        Task.objects.all().delete()
+        if not options['append']:
+            clear_data()
         
         # Create sample projects
         projects_data = [
@@ -64,10 +103,10 @@ class Command(BaseCommand):
             },
         ]
         
-        created_projects = []
-        for proj_data in projects_data:
-            project = Project.objects.create(**proj_data)
-            created_projects.append(project)
+        created_projects = Project.objects.bulk_create(
+            [Project(**proj_data) for proj_data in projects_data]
+        )
+        for project in created_projects:
             self.stdout.write(f'  Created project: {project.title}')
         
         # Create tasks for each project
@@ -100,8 +139,51 @@ class Command(BaseCommand):
             {'project': created_projects[4], 'name': 'Data pipeline setup', 'description': 'Set up automated data pipeline', 'priority': 'medium', 'completed': False, 'due_date': timezone.now().date() + timedelta(days=50)},
         ]
         
-        for task_data in tasks_data:
-            task = Task.objects.create(**task_data)
+        with transaction.atomic():
+            tasks = Task.objects.bulk_create([Task(**task_data) for task_data in tasks_data])
+            tasks_bulk_saved.send(
+                sender=Task,
+                tasks=tasks,
+                created=True,
+                project_ids={project.pk for project in created_projects},
+            )
         
         self.stdout.write(f'  Created {len(tasks_data)} tasks')
         self.stdout.write(self.style.SUCCESS(f'\nSuccessfully created {len(created_projects)} projects and {len(tasks_data)} tasks'))
+    
+    def generate(self, options):
+        """Insert synthetic projects and tasks in batches"""
+        projects = options['projects']
+        tasks_per_project = options['tasks_per_project']
+        if projects < 0 or tasks_per_project < 0 or options['batch_size'] <= 0:
+            raise CommandError('--projects and --tasks-per-project must be >= 0, --batch-size > 0')
+        
+        if not options['append']:
+            self.stdout.write('Clearing existing data...')
+            clear_data()
+        
+        self.stdout.write(
+            f'Generating {projects} projects with ~{tasks_per_project} tasks each...'
+        )
+        started = time.perf_counter()
+        
+        def progress(projects_done, tasks_done):
+            elapsed = time.perf_counter() - started
+            rate = (projects_done + tasks_done) / elapsed if elapsed else 0
+            self.stdout.write(
+                f'  {projects_done}/{projects} projects, {tasks_done} tasks '
+                f'({rate:,.0f} rows/s)'
+            )
+        
+        projects_done, tasks_done = seed_data(
+            projects,
+            tasks_per_project,
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\nSuccessfully created {projects_done} projects and {tasks_done} tasks '
+            f'in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.search import get_index
+
+
+class Command(BaseCommand):
+    help = 'Reindexes every project and task in the full-text search index'
+
+    def handle(self, *args, **options):
+        index = get_index(connection)
+        if index is None:
+            raise CommandError(f'Full-text search is not supported on {connection.vendor}')
+        self.stdout.write('Rebuilding the search index...')
+        with transaction.atomic():
+            index.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the search index'))
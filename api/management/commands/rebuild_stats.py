@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+from api.stats import rebuild_all_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-project and global task statistics from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of projects recomputed per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding task statistics...')
+        processed = rebuild_all_stats(batch_size=options['batch_size'])
+        # The cached project responses show the old counters
+        response_cache.invalidate_all()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {processed} projects'))
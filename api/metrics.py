@@ -0,0 +1,168 @@
+"""
+In-process request metrics, exposed in the Prometheus text format.
+
+Values live in the memory of each worker process, so every process serves
+its own metrics (scrape each worker, or run a single worker per container).
+"""
+import bisect
+import threading
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """A Prometheus-style histogram with one series per label set"""
+
+    def __init__(self, name, documentation, buckets, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels + [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """A Prometheus-style counter with one series per label set"""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            return self._series.get(key, 0)
+
+    def collect(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        with self._lock:
+            series = dict(self._series)
+        for key, value in sorted(series.items()):
+            labels = _format_labels(list(zip(self.label_names, key)))
+            lines.append(f'{self.name}_total{labels} {_format_value(value)}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Registry:
+    """Holds the metrics rendered by the /api/metrics/ endpoint"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+REQUEST_LABELS = ('view', 'method', 'status')
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'api_request_duration_seconds',
+    'Total time spent handling API requests.',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    label_names=REQUEST_LABELS,
+))
+REQUEST_DB_DURATION = REGISTRY.register(Histogram(
+    'api_request_db_duration_seconds',
+    'Time spent in database queries per API request.',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    label_names=REQUEST_LABELS,
+))
+REQUEST_DB_QUERIES = REGISTRY.register(Histogram(
+    'api_request_db_queries',
+    'Number of database queries per API request.',
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 500),
+    label_names=REQUEST_LABELS,
+))
+REQUEST_ENCODE_DURATION = REGISTRY.register(Histogram(
+    'api_request_encode_duration_seconds',
+    'Time spent encoding API response bodies (the renderer, after the view).',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+    label_names=REQUEST_LABELS,
+))
+RESPONSE_CACHE_REQUESTS = REGISTRY.register(Counter(
+    'api_response_cache_requests',
+    'Lookups in the project response cache, by result (hit or miss).',
+    label_names=('view', 'result'),
+))
+DB_READS = REGISTRY.register(Counter(
+    'api_db_reads',
+    'Reads of replica-enabled requests, by the database serving them (primary or replica).',
+    label_names=('target',),
+))
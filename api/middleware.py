@@ -0,0 +1,247 @@
+"""
+Request instrumentation for the API.
+
+RequestMetricsMiddleware measures, for every request under /api/, the
+number of SQL queries and the time spent running them, the time the
+renderer spends encoding the response body and the total latency. The figures are
+reported in a Server-Timing header, recorded in the in-process histograms
+served by /api/metrics/, and requests over the configured budgets are
+logged together with the SQL statements they ran most.
+
+Both middleware classes here work in sync (WSGI) and async (ASGI) mode, so
+async views don't get pushed back onto a thread by the middleware stack.
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metrics import (
+    REQUEST_DB_DURATION,
+    REQUEST_DB_QUERIES,
+    REQUEST_DURATION,
+    REQUEST_ENCODE_DURATION,
+)
+
+
+logger = logging.getLogger('api.performance')
+
+# Statements listed in the log line of an over-budget request
+LOGGED_FINGERPRINTS = 5
+
+_whitespace_re = re.compile(r'\s+')
+_string_literal_re = re.compile(r"'(?:[^']|'')*'")
+_number_literal_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+_placeholder_list_re = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_values_list_re = re.compile(r'(VALUES\s*\([^()]*\))(?:\s*,\s*\([^()]*\))+', re.IGNORECASE)
+
+
+def fingerprint(sql):
+    """
+    Normalize a statement so queries that differ only in their parameters
+    (including the length of IN lists and multi-row VALUES) compare equal.
+    """
+    sql = _whitespace_re.sub(' ', sql).strip()
+    sql = _string_literal_re.sub('?', sql)
+    sql = _number_literal_re.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _placeholder_list_re.sub('(...)', sql)
+    return _values_list_re.sub(r'\1', sql)
+
+
+# The QueryCollector of the request being handled. A context variable rather
+# than a per-connection execute_wrapper() block, since under ASGI queries run
+# on other threads (with their own connections) than the middleware.
+_current_collector = ContextVar('api_query_collector', default=None)
+
+
+def collect_queries(execute, sql, params, many, context):
+    """Execute wrapper reporting to the current request's collector, if any"""
+    collector = _current_collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    return collector(execute, sql, params, many, context)
+
+
+def install_query_collector(connection):
+    """Add collect_queries() to a connection's execute wrappers, once"""
+    if collect_queries not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks still pop their own wrapper
+        connection.execute_wrappers.insert(0, collect_queries)
+
+
+class QueryCollector:
+    """
+    Database execute wrapper counting queries and their duration, grouped
+    by statement text.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            stats = self.statements.setdefault(sql, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+
+    def fingerprints(self):
+        """[(fingerprint, count, duration)], most frequent first"""
+        grouped = {}
+        for sql, (count, duration) in self.statements.items():
+            stats = grouped.setdefault(fingerprint(sql), [0, 0.0])
+            stats[0] += count
+            stats[1] += duration
+        return sorted(
+            ((sql, count, duration) for sql, (count, duration) in grouped.items()),
+            key=lambda item: (-item[1], -item[2]),
+        )
+
+
+class RequestMetricsMiddleware:
+    """Query, encoding and latency metrics for API requests"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.instrumented(request):
+            return self.get_response(request)
+
+        # Connections opened later get the wrapper from the
+        # connection_created receiver in api.signals
+        for connection in connections.all(initialized_only=True):
+            install_query_collector(connection)
+        collector, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_collector.reset(token)
+        self.record(request, response, collector, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.instrumented(request):
+            return await self.get_response(request)
+
+        collector, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_collector.reset(token)
+        self.record(request, response, collector, time.perf_counter() - started)
+        return response
+
+    def instrumented(self, request):
+        return settings.API_METRICS_ENABLED and request.path.startswith(settings.API_METRICS_PATH_PREFIX)
+
+    def start(self, request):
+        collector = QueryCollector()
+        request._metrics_encode_time = 0.0
+        return collector, _current_collector.set(collector), time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """
+        Time the encoding of DRF responses by their renderer, which happens
+        after the view returns. Being first in MIDDLEWARE, this hook runs
+        last, right before the response is rendered. Serializing the data
+        (serializer.data) happens in the view and counts as app time.
+        """
+        if hasattr(request, '_metrics_encode_time'):
+            encode_started = time.perf_counter()
+
+            def record_encode_time(response):
+                request._metrics_encode_time += time.perf_counter() - encode_started
+
+            response.add_post_render_callback(record_encode_time)
+        return response
+
+    def record(self, request, response, collector, total):
+        encode = request._metrics_encode_time
+        app = max(total - collector.duration - encode, 0.0)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={collector.duration * 1000:.2f};desc="{collector.count} queries"',
+            f'encode;dur={encode * 1000:.2f}',
+            f'app;dur={app * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        match = request.resolver_match
+        labels = {
+            # Route names rather than paths keep the label set bounded
+            'view': match.view_name if match and match.view_name else 'unmatched',
+            'method': request.method,
+            'status': str(response.status_code),
+        }
+        REQUEST_DURATION.observe(total, **labels)
+        REQUEST_DB_DURATION.observe(collector.duration, **labels)
+        REQUEST_DB_QUERIES.observe(collector.count, **labels)
+        REQUEST_ENCODE_DURATION.observe(encode, **labels)
+
+        query_budget = settings.API_QUERY_BUDGET
+        latency_budget = settings.API_LATENCY_BUDGET_MS
+        over_queries = query_budget and collector.count > query_budget
+        over_latency = latency_budget and total * 1000 > latency_budget
+        if over_queries or over_latency:
+            lines = [
+                f'{request.method} {request.get_full_path()} exceeded its budget: '
+                f'{total * 1000:.1f} ms (budget {latency_budget or "-"} ms), '
+                f'{collector.count} queries (budget {query_budget or "-"}), '
+                f'{collector.duration * 1000:.1f} ms in SQL'
+            ]
+            for sql, count, duration in collector.fingerprints()[:LOGGED_FINGERPRINTS]:
+                lines.append(f'  {count:>4}x {duration * 1000:8.2f} ms  {sql}')
+            logger.warning('\n'.join(lines))
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, made async-capable. WhiteNoiseMiddleware is sync-only, which
+    would make Django run every async view under ASGI through a thread.
+    Finding a static file is an in-memory lookup (unless autorefresh is on),
+    so it is done inline.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_stats(apps, schema_editor):
+    """Compute the statistics for the data that already exists"""
+    Project = apps.get_model('api', 'Project')
+    Task = apps.get_model('api', 'Task')
+    ProjectStats = apps.get_model('api', 'ProjectStats')
+    GlobalStats = apps.get_model('api', 'GlobalStats')
+
+    annotations = {
+        'total_tasks': Count('id'),
+        'completed_tasks': Count('id', filter=Q(completed=True)),
+    }
+    for priority in ('low', 'medium', 'high'):
+        annotations[f'{priority}_priority_tasks'] = Count('id', filter=Q(priority=priority))
+
+    rows = Task.objects.order_by().values('project_id').annotate(**annotations)
+    counted = {row.pop('project_id'): row for row in rows}
+    ProjectStats.objects.bulk_create(
+        [
+            ProjectStats(project_id=project_id, **counted.get(project_id, {}))
+            for project_id in Project.objects.values_list('pk', flat=True)
+        ],
+        batch_size=1000,
+    )
+    GlobalStats.objects.create(pk=1, **Task.objects.aggregate(**annotations))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_tasks', models.IntegerField(default=0)),
+                ('completed_tasks', models.IntegerField(default=0)),
+                ('low_priority_tasks', models.IntegerField(default=0)),
+                ('medium_priority_tasks', models.IntegerField(default=0)),
+                ('high_priority_tasks', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'global stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('total_tasks', models.IntegerField(default=0)),
+                ('completed_tasks', models.IntegerField(default=0)),
+                ('low_priority_tasks', models.IntegerField(default=0)),
+                ('medium_priority_tasks', models.IntegerField(default=0)),
+                ('high_priority_tasks', models.IntegerField(default=0)),
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.project')),
+            ],
+            options={
+                'verbose_name_plural': 'project stats',
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# icontains on PostgreSQL compiles to UPPER("client_name"::text) LIKE UPPER(%s),
+# which a trigram index on the same expression can serve
+CLIENT_TRGM_INDEX = 'project_client_trgm_idx'
+
+
+def create_client_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {CLIENT_TRGM_INDEX} ON api_project '
+        'USING gin (UPPER(client_name::text) gin_trgm_ops)'
+    )
+
+
+def drop_client_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {CLIENT_TRGM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_project_stats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='project',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='api.project'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['status', '-created_at'], name='project_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-created_at', 'id'], name='project_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['client_name'], name='project_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'completed', '-created_at'], name='task_project_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-created_at', 'id'], name='task_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['priority'], name='task_priority_idx'),
+        ),
+        migrations.RunPython(create_client_trigram_index, drop_client_trigram_index),
+    ]
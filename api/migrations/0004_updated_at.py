@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:45
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_task_updated_at(apps, schema_editor):
+    """Without a record of later changes, existing tasks count as last modified when created"""
+    Task = apps.get_model('api', 'Task')
+    Task.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectstats',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_task_updated_at, migrations.RunPython.noop),
+    ]
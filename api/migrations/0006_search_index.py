@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from api.search import get_index
+
+
+# The index is raw SQL outside of Django's model state (see api.search):
+# generated tsvector columns with GIN indexes on PostgreSQL, FTS5 tables
+# filled by triggers on SQLite. Other databases get no index.
+
+
+def install_search_index(apps, schema_editor):
+    index = get_index(schema_editor.connection)
+    if index is not None:
+        index.install()
+
+
+def uninstall_search_index(apps, schema_editor):
+    index = get_index(schema_editor.connection)
+    if index is not None:
+        index.uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
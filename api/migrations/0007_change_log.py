@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def log_existing_rows(apps, schema_editor):
+    """
+    Existing projects and tasks get an entry, so a sync from cursor 0
+    downloads every row
+    """
+    ChangeLogEntry = apps.get_model('api', 'ChangeLogEntry')
+    db_alias = schema_editor.connection.alias
+    now = django.utils.timezone.now()
+    for kind, model_name in (('project', 'Project'), ('task', 'Task')):
+        ids = apps.get_model('api', model_name).objects.using(db_alias).order_by('pk').values_list('pk', flat=True)
+        ChangeLogEntry.objects.using(db_alias).bulk_create(
+            (ChangeLogEntry(kind=kind, object_id=pk, created_at=now) for pk in ids.iterator(chunk_size=2000)),
+            batch_size=2000,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('project', 'Project'), ('task', 'Task')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'change log entries',
+                'indexes': [models.Index(fields=['kind', 'id'], name='changelog_kind_id_idx'), models.Index(fields=['kind', 'object_id', 'id'], name='changelog_object_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
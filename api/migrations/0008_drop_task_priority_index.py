@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:50
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_priority_idx',
+        ),
+    ]
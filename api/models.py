@@ -1,7 +1,26 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
+class ProjectQuerySet(models.QuerySet):
+    """Custom queryset helpers for Project"""
+
+    def with_task_counts(self):
+        """
+        Annotate each project with total_tasks and completed_tasks so
+        serializers don't need to run a COUNT query per row. The values
+        come from the ProjectStats row joined to each project, as does
+        stats_updated_at, when they last changed.
+        """
+        return self.annotate(
+            total_tasks=Coalesce('stats__total_tasks', Value(0)),
+            completed_tasks=Coalesce('stats__completed_tasks', Value(0)),
+            stats_updated_at=F('stats__updated_at'),
+        )
+
+
 class Project(models.Model):
     """
     Represents a project with basic information.
@@ -26,12 +45,30 @@ class Project(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # ?status= filter on the list, newest first
+            models.Index(fields=['status', '-created_at'], name='project_status_created_idx'),
+            # Default ordering, keyset pagination and the "recent" dashboard count
+            models.Index(fields=['-created_at', 'id'], name='project_created_id_idx'),
+            # Top clients grouping on the dashboard
+            models.Index(fields=['client_name'], name='project_client_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The status as loaded, so saves can tell status changes apart (see
+        # api.events); None when it was deferred
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
 
 class Task(models.Model):
     """
@@ -41,7 +78,9 @@ class Task(models.Model):
     project = models.ForeignKey(
         Project,
         on_delete=models.CASCADE,
-        related_name='tasks'
+        related_name='tasks',
+        # Covered by the leading column of task_project_completed_idx
+        db_index=False
     )
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -57,10 +96,177 @@ class Task(models.Model):
     completed = models.BooleanField(default=False)
     due_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # ?project=&completed= filters on the list, newest first
+            models.Index(
+                fields=['project', 'completed', '-created_at'],
+                name='task_project_completed_idx',
+            ),
+            # Default ordering and keyset pagination
+            models.Index(fields=['-created_at', 'id'], name='task_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.project.title})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this task contributed to the statistics when it was
+        # loaded, so deletes can remove it (see api.stats); saves take it
+        # again under a row lock
+        instance._stats_snapshot = instance.stats_contribution()
+        return instance
+
+    def stats_contribution(self):
+        """
+        Return (project_id, priority, completed) as counted by ProjectStats,
+        or None if one of these fields was deferred.
+        """
+        deferred = self.get_deferred_fields()
+        if deferred & {'project_id', 'priority', 'completed'}:
+            return None
+        return (self.project_id, self.priority, self.completed)
+
+    def save(self, *args, **kwargs):
+        # Keep the statistics update (post_save) in the same transaction
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            if not self._state.adding and self.pk is not None:
+                # The snapshot taken when the task was read may be stale by
+                # now: concurrent saves would each apply the same change.
+                # Take it again from the row, locked until this save commits.
+                self._stats_snapshot = (
+                    Task.objects.db_manager(using).select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('project_id', 'priority', 'completed')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class TaskCounters(models.Model):
+    """Denormalized task counters shared by the statistics tables"""
+    COUNTER_FIELDS = (
+        'total_tasks', 'completed_tasks',
+        'low_priority_tasks', 'medium_priority_tasks', 'high_priority_tasks',
+    )
+
+    total_tasks = models.IntegerField(default=0)
+    completed_tasks = models.IntegerField(default=0)
+    low_priority_tasks = models.IntegerField(default=0)
+    medium_priority_tasks = models.IntegerField(default=0)
+    high_priority_tasks = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @staticmethod
+    def priority_field(priority):
+        """Name of the counter holding tasks of the given priority"""
+        return f'{priority}_priority_tasks'
+
+
+class ProjectStats(TaskCounters):
+    """
+    Task statistics for a single project, maintained incrementally as tasks
+    are created, updated and deleted. Rebuild with `manage.py rebuild_stats`.
+    """
+    project = models.OneToOneField(
+        Project,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    # When the counters last changed; part of the project list's validators
+    # (see api.conditional)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'project stats'
+
+    def __str__(self):
+        return f"Stats for {self.project_id}"
+
+
+class GlobalStats(TaskCounters):
+    """
+    Rollup of ProjectStats across every project. There is a single row,
+    fetched with GlobalStats.load().
+    """
+    SINGLETON_ID = 1
+
+    class Meta:
+        verbose_name_plural = 'global stats'
+
+    def __str__(self):
+        return "Global stats"
+
+    @classmethod
+    def load(cls):
+        # A plain lookup first: get_or_create() reads from the primary
+        stats = cls.objects.filter(pk=cls.SINGLETON_ID).first()
+        if stats is None:
+            stats, _ = cls.objects.get_or_create(pk=cls.SINGLETON_ID)
+        return stats
+
+    @classmethod
+    async def aload(cls):
+        stats = await cls.objects.filter(pk=cls.SINGLETON_ID).afirst()
+        if stats is None:
+            stats, _ = await cls.objects.aget_or_create(pk=cls.SINGLETON_ID)
+        return stats
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Progress of a resumable import (see api.importing): how many rows of the
+    source have been consumed, committed in the same transaction as the rows
+    they inserted, so a restarted import picks up exactly where it stopped.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    position = models.PositiveBigIntegerField(default=0)
+    inserted = models.PositiveBigIntegerField(default=0)
+    rejected = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import {self.key} at row {self.position}"
+
+
+class ChangeLogEntry(models.Model):
+    """
+    A project or task was written (or deleted, for a tombstone). Appended in
+    the transaction of the write; the auto-incremented id is the cursor of
+    the incremental sync (see api.changelog).
+    """
+    KIND_CHOICES = [
+        ('project', 'Project'),
+        ('task', 'Task'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'change log entries'
+        indexes = [
+            # ?updated_since= reads one kind's entries past the cursor
+            models.Index(fields=['kind', 'id'], name='changelog_kind_id_idx'),
+            # Compaction keeps the latest entry of each object
+            models.Index(fields=['kind', 'object_id', 'id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'saved'
+        return f"{self.kind} {self.object_id} {action} (#{self.pk})"
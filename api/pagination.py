@@ -0,0 +1,139 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardPagination(PageNumberPagination):
+    """
+    Page-number pagination used by default for all list endpoints.
+    Clients may ask for larger pages with ?page_size= (up to max_page_size).
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_version(self):
+        """What the response depends on besides the rows: the total count"""
+        return self.page.paginator.count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination ordered on (-created_at, id).
+
+    Each page is fetched with a WHERE clause on the last row seen instead of
+    an OFFSET, and no COUNT(*) is issued, so deep pages cost the same as the
+    first one. Only forward navigation is supported.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    page_size = StandardPagination.page_size
+    page_size_query_param = StandardPagination.page_size_query_param
+    max_page_size = StandardPagination.max_page_size
+    ordering = ('-created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    @classmethod
+    def requested(cls, request):
+        """True when the client asked for cursor pagination"""
+        params = request.query_params
+        return (
+            cls.cursor_query_param in params
+            or params.get(cls.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+
+        # Fetch one extra row to find out whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            created_at, pk = decoded.rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, instance):
+        raw = f'{instance.created_at.isoformat()}|{instance.pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_page_version(self):
+        """What the response depends on besides the rows"""
+        return self.has_next
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginationModeMixin:
+    """
+    Lets list endpoints switch between page-number pagination (default)
+    and keyset pagination (?pagination=cursor or ?cursor=...).
+    """
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if KeysetPagination.requested(self.request):
+                self._paginator = KeysetPagination()
+            elif self.pagination_class is None:
+                self._paginator = None
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,125 @@
+"""
+Renderers and parsers for the API's content negotiation.
+
+FastJSONRenderer / FastJSONParser encode and decode JSON with orjson, which
+is several times faster than the stdlib json module DRF uses. The output is
+JSON equivalent to what DRF's JSONRenderer produces: values orjson would
+format differently (datetimes, Decimals, lazy strings...) go through DRF's
+encoder, and anything orjson can't handle (e.g. integers beyond 64 bits,
+indented output for the browsable API) falls back to JSONRenderer. Two
+differences remain: floats in exponent notation are written without the
+exponent's sign or padding (1e16, 1.5e-7 where DRF writes 1e+16, 1.5e-07),
+and NaN and infinities are written as null where DRF raises ValueError.
+Without orjson installed both classes behave exactly like DRF's.
+
+MessagePackRenderer / MessagePackParser serve and accept application/msgpack
+(?format=msgpack also selects it). They are enabled in settings when the
+msgpack package is installed.
+"""
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+# Values orjson formats differently from DRF's encoder (dates and times) are
+# passed to `default`; dict keys may be ints like with the json module
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+# DRF escapes these so the JSON can be embedded in JavaScript
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+# orjson decodes integers beyond 64 bits as floats; bodies with numbers this
+# long are decoded with the json module
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+_default = encoders.JSONEncoder().default
+
+
+def dumps(data):
+    """
+    `data` as compact UTF-8 JSON, like JSONRenderer with the default
+    settings renders it
+    """
+    if orjson is not None:
+        try:
+            encoded = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+        else:
+            for character, escaped in LINE_SEPARATORS:
+                if character in encoded:
+                    encoded = encoded.replace(character, escaped)
+            return encoded
+    return json.dumps(
+        data, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':'),
+    ).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson (NaN and infinities render as null)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding with orjson"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass  # The json module reports the error
+        try:
+            return json.loads(body.decode(encoding), parse_constant=json.strict_constant)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack rendering of the same data as the JSON responses (values
+    without a MessagePack type are converted like the JSON encoder does)
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (TypeError, ValueError) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
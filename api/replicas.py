@@ -0,0 +1,157 @@
+"""
+Read-replica routing with read-your-writes.
+
+The database aliases in API_DB_REPLICAS (see DB_REPLICAS in settings) serve
+the reads of views that opt in: the viewsets' list, retrieve and export
+actions (ReplicaReadsMixin) and the dashboard (@replica_reads). Everything
+else, including every write, uses the primary ("default").
+
+Replicas lag behind the primary, so once a request writes, the rest of it
+reads from the primary, and ReplicaMiddleware pins the client to the
+primary for API_REPLICA_PIN_SECONDS with a cookie: a client reading right
+after its own write sees it. Reads inside a transaction and the reads of
+responses about to be stored in the response cache also go to the primary.
+"""
+import functools
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .metrics import DB_READS
+
+
+class RoutingState:
+    """How the current request's reads are routed"""
+
+    def __init__(self, pinned=False):
+        # Reads may go to a replica (set by the views that opt in)
+        self.replica_reads = False
+        # Reads must go to the primary (the client or this request wrote)
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = ContextVar('api_db_routing', default=None)
+
+
+def allow_replica_reads():
+    """Let the current request read from a replica (unless it is pinned)"""
+    state = _state.get()
+    if state is not None:
+        state.replica_reads = True
+
+
+def pin_to_primary():
+    """Read from the primary for the rest of the current request"""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+def replica_reads(view):
+    """Decorator for function views (sync or async) reading from replicas"""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            allow_replica_reads()
+            return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allow_replica_reads()
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadsMixin:
+    """Reads of the viewset's replica_actions go to a replica"""
+    replica_actions = ('list', 'retrieve', 'export')
+
+    def initial(self, request, *args, **kwargs):
+        if self.action in self.replica_actions:
+            allow_replica_reads()
+        super().initial(request, *args, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of requests that allow it to one replica per request;
+    every other query goes to the default database
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.API_DB_REPLICAS
+        if state is None or not state.replica_reads or not replicas:
+            return None
+        if state.pinned or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            DB_READS.inc(target='primary')
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # One replica per request, so its reads are consistent with each other
+            state.replica = random.choice(replicas)
+        DB_READS.inc(target='replica')
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.API_DB_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Tracks the reads and writes of each request for ReplicaRouter and pins
+    clients that wrote to the primary for a while
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        state = RoutingState(pinned=settings.API_REPLICA_PIN_COOKIE in request.COOKIES)
+        return state, _state.set(state)
+
+    def finish(self, state, response):
+        if state.wrote and settings.API_DB_REPLICAS and settings.API_REPLICA_PIN_SECONDS:
+            response.set_cookie(
+                settings.API_REPLICA_PIN_COOKIE, '1',
+                max_age=settings.API_REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
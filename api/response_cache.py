@@ -0,0 +1,161 @@
+"""
+Server-side cache of the project list and detail responses.
+
+Entries hold the serialized data (and the ETag / Last-Modified validators)
+of a response, keyed by the endpoint, the request's URL with its query
+parameters in canonical order, and version tokens: one shared by every
+project list page, one per project for its detail response, and a
+generation covering everything. Writes never delete entries: the receivers
+in api.signals replace the tokens of the projects a change touched (and of
+the lists) once it is committed, so stale entries are no longer looked up
+and expire with their TTL.
+
+Responses going through the cache carry their key (response_cache_key),
+under which api.compression caches their compressed bodies too.
+
+Entries live in the CACHES alias named by API_RESPONSE_CACHE_ALIAS; point
+it at a shared backend (e.g. Redis) to share entries and invalidations
+between processes.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .conditional import request_variant
+from .metrics import RESPONSE_CACHE_REQUESTS
+from .replicas import pin_to_primary
+
+
+KEY_PREFIX = 'api:responses'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+PROJECT_LIST_KEY = f'{KEY_PREFIX}:projects:list'
+
+
+def get_cache():
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
+
+
+def project_version_key(project_id):
+    return f'{KEY_PREFIX}:projects:{project_id}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def get_versions(keys):
+    """The current tokens of the given version keys, creating missing ones"""
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps the token of a process that got there first
+            cache.add(key, _new_token(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate_projects(project_ids):
+    """Retire the cached lists and the detail responses of these projects"""
+    keys = [PROJECT_LIST_KEY] + [project_version_key(pk) for pk in set(project_ids) if pk is not None]
+    get_cache().set_many({key: _new_token() for key in keys}, None)
+
+
+_pending = threading.local()
+
+
+def invalidate_projects_on_commit(project_ids):
+    """
+    invalidate_projects() once the current transaction commits. The projects
+    of every call in one transaction are retired together, so bulk writes
+    cost a single cache write.
+    """
+    pending = getattr(_pending, 'project_ids', None)
+    if pending is None:
+        pending = _pending.project_ids = set()
+    pending.update(project_ids)
+    transaction.on_commit(_invalidate_pending)
+
+
+def _invalidate_pending():
+    # Projects left over from a rolled back transaction are retired too,
+    # which is harmless
+    project_ids = getattr(_pending, 'project_ids', None)
+    if project_ids:
+        _pending.project_ids = set()
+        invalidate_projects(project_ids)
+
+
+def invalidate_all():
+    """Retire every cached response, e.g. after writes that bypass signals"""
+    get_cache().set(GENERATION_KEY, _new_token(), None)
+
+
+class ResponseCacheMixin:
+    """
+    Serves the list and retrieve responses of a viewset from the response
+    cache. Handlers call get_cached_response() before touching the database
+    and pass their successful responses through cache_response().
+    """
+
+    def get_response_cache_versions(self):
+        """Version keys the current action's response depends on"""
+        if self.action == 'list':
+            return [GENERATION_KEY, PROJECT_LIST_KEY]
+        try:
+            project_id = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except (KeyError, ValueError):
+            return None
+        return [GENERATION_KEY, project_version_key(project_id)]
+
+    def get_response_cache_key(self):
+        keys = self.get_response_cache_versions()
+        if keys is None:
+            return None
+        # Tokens are read before the database, so a response built from data
+        # older than a concurrent commit is stored under the retired token
+        versions = get_versions(keys)
+        variant = hashlib.blake2b(repr(request_variant(self.request)).encode(), digest_size=16)
+        return f'{KEY_PREFIX}:{self.action}:{":".join(versions)}:{variant.hexdigest()}'
+
+    def get_cached_response(self):
+        """
+        The cached response for this request (or a 304 if the client's copy
+        is current), else None
+        """
+        self.response_cache_key = None
+        if not settings.API_RESPONSE_CACHE_TTL or self.request.method != 'GET':
+            return None
+        self.response_cache_key = key = self.get_response_cache_key()
+        if key is None:
+            return None
+        entry = get_cache().get(key)
+        RESPONSE_CACHE_REQUESTS.inc(
+            view=self.request.resolver_match.view_name, result='miss' if entry is None else 'hit',
+        )
+        if entry is None:
+            # The entry stored from this response must not lag behind the
+            # writes that retired the previous one
+            pin_to_primary()
+            return None
+        data, validators = entry
+        not_modified = self.check_validators(*validators)
+        if not_modified:
+            return not_modified
+        response = Response(data)
+        # Lets CompressionMiddleware reuse the compressed bodies cached with it
+        response.response_cache_key = key
+        return response
+
+    def cache_response(self, response):
+        """Store a successful response under the key get_cached_response() used"""
+        key = getattr(self, 'response_cache_key', None)
+        if key is not None and response.status_code == 200:
+            get_cache().set(key, (response.data, self.conditional_validators), settings.API_RESPONSE_CACHE_TTL)
+            response.response_cache_key = key
+        return response
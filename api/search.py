@@ -0,0 +1,287 @@
+"""
+Full-text search index over projects and tasks, behind GET /api/search/?q=.
+
+The index lives in the database and is maintained by the database itself,
+so every write path (saves, bulk inserts and updates, raw deletes) keeps it
+in sync:
+
+- on PostgreSQL, a generated `search_vector` tsvector column on each table
+  (title-like columns weighted highest) with a GIN index, ranked with
+  ts_rank();
+- on SQLite, an FTS5 external-content table per model (`<table>_search`,
+  porter stemming) filled by triggers, ranked with bm25().
+
+The tables are set up by migration 0006. Django's SQLite schema editor
+rebuilds a table to alter it, which drops its triggers: repair()
+restores them (and rebuilds the index) after every `migrate`, and
+`manage.py rebuild_search_index` rebuilds it on demand.
+"""
+import re
+from collections import namedtuple
+
+from django.db.models.expressions import RawSQL
+
+
+# Indexed tables: the column shown as a hit's title, the column linking to
+# the parent project (if any) and the indexed columns with their PostgreSQL
+# weight and bm25() weight
+SearchKind = namedtuple('SearchKind', 'table title parent columns')
+KINDS = {
+    'project': SearchKind(
+        'api_project', 'title', None,
+        (('title', 'A', 10.0), ('client_name', 'B', 5.0), ('description', 'C', 1.0)),
+    ),
+    'task': SearchKind(
+        'api_task', 'name', 'project_id',
+        (('name', 'A', 10.0), ('description', 'C', 1.0)),
+    ),
+}
+TS_CONFIG = 'english'
+# Words of ?q= used in the query; the others are ignored
+MAX_TERMS = 10
+
+
+def parse_terms(query):
+    """The words of a search query, lowercased. Every one must match."""
+    return [term.lower() for term in re.findall(r'\w+', query or '')][:MAX_TERMS]
+
+
+def get_index(connection):
+    """The search index of the connection's database, or None if unsupported"""
+    index_class = {'postgresql': PostgreSQLIndex, 'sqlite': SQLiteIndex}.get(connection.vendor)
+    return index_class(connection) if index_class is not None else None
+
+
+class SearchIndex:
+    """SQL to maintain and query the index of one database"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.quote_name = connection.ops.quote_name
+
+    def search_sql(self, kind):
+        """
+        SELECT of (kind, id, title, project_id, score) for the rows of `kind`
+        matching the one query parameter, best first when ordered by score
+        descending
+        """
+        raise NotImplementedError
+
+    def match_sql(self, kind):
+        """SELECT of the ids of the rows of `kind` matching the one parameter"""
+        raise NotImplementedError
+
+    def build_query(self, terms):
+        """The query parameter matching rows containing every term (as prefixes)"""
+        raise NotImplementedError
+
+    def search(self, terms, kinds=KINDS):
+        return SearchResults(self, terms, kinds)
+
+    def match_ids(self, kind, terms):
+        """A RawSQL filter value (pk__in=) for the rows of `kind` matching `terms`"""
+        return RawSQL(self.match_sql(kind), [self.build_query(terms)])
+
+
+class PostgreSQLIndex(SearchIndex):
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            for kind, spec in KINDS.items():
+                vector = ' || '.join(
+                    f"setweight(to_tsvector('{TS_CONFIG}', coalesce({self.quote_name(column)}, '')), '{weight}')"
+                    for column, weight, _ in spec.columns
+                )
+                cursor.execute(
+                    f'ALTER TABLE {spec.table} ADD COLUMN IF NOT EXISTS search_vector tsvector '
+                    f'GENERATED ALWAYS AS ({vector}) STORED'
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {kind}_search_idx ON {spec.table} USING gin (search_vector)'
+                )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            for kind, spec in KINDS.items():
+                cursor.execute(f'DROP INDEX IF EXISTS {kind}_search_idx')
+                cursor.execute(f'ALTER TABLE {spec.table} DROP COLUMN IF EXISTS search_vector')
+
+    def repair(self):
+        """Generated columns survive schema changes: nothing to repair"""
+        return False
+
+    def rebuild(self):
+        """Generated columns are always current: nothing to rebuild"""
+
+    def build_query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def search_sql(self, kind):
+        spec = KINDS[kind]
+        parent = spec.parent or 'NULL::bigint'
+        return (
+            f"SELECT '{kind}' AS kind, id, {spec.title} AS title, {parent} AS project_id, "
+            f"ts_rank(search_vector, query) AS score "
+            f"FROM {spec.table}, to_tsquery('{TS_CONFIG}', %s) AS query WHERE search_vector @@ query"
+        )
+
+    def match_sql(self, kind):
+        return (
+            f"SELECT id FROM {KINDS[kind].table} "
+            f"WHERE search_vector @@ to_tsquery('{TS_CONFIG}', %s)"
+        )
+
+
+class SQLiteIndex(SearchIndex):
+    # Triggers keeping each FTS table in step with its content table
+    TRIGGERS = (
+        ('ai', 'AFTER INSERT ON {table}', ('new',)),
+        ('ad', 'AFTER DELETE ON {table}', ('old',)),
+        ('au', 'AFTER UPDATE OF {columns} ON {table}', ('old', 'new')),
+    )
+
+    def fts_table(self, kind):
+        return f'{KINDS[kind].table}_search'
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            for kind, spec in KINDS.items():
+                columns = [column for column, _, _ in spec.columns]
+                if spec.parent:
+                    columns.append(f'{spec.parent} UNINDEXED')
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table(kind)} USING fts5('
+                    f"{', '.join(columns)}, content='{spec.table}', content_rowid='id', "
+                    f"tokenize='porter unicode61')"
+                )
+        self.rebuild()
+
+    def install_triggers(self):
+        """Create the missing triggers; returns True if any was missing"""
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            existing = {name for name, in cursor.fetchall()}
+            created = False
+            for kind, spec in KINDS.items():
+                fts_table = self.fts_table(kind)
+                columns = [column for column, _, _ in spec.columns]
+                for suffix, event, rows in self.TRIGGERS:
+                    name = f'{fts_table}_{suffix}'
+                    if name in existing:
+                        continue
+                    statements = ''.join(
+                        self._trigger_statement(fts_table, columns, row) for row in rows
+                    )
+                    event = event.format(table=spec.table, columns=', '.join(columns))
+                    cursor.execute(f'CREATE TRIGGER {name} {event} BEGIN {statements} END')
+                    created = True
+        return created
+
+    @staticmethod
+    def _trigger_statement(fts_table, columns, row):
+        values = ', '.join(f'{row}.{column}' for column in ['id'] + columns)
+        if row == 'old':
+            # External-content tables are told the old values to unindex
+            return (
+                f"INSERT INTO {fts_table}({fts_table}, rowid, {', '.join(columns)}) "
+                f"VALUES ('delete', {values});"
+            )
+        return f"INSERT INTO {fts_table}(rowid, {', '.join(columns)}) VALUES ({values});"
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            for kind in KINDS:
+                fts_table = self.fts_table(kind)
+                for suffix, _, _ in self.TRIGGERS:
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts_table}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts_table}')
+
+    def installed(self):
+        return self.fts_table('project') in self.connection.introspection.table_names()
+
+    def repair(self):
+        """Restore the triggers dropped by table rebuilds and reindex if needed"""
+        if not self.installed() or not self.install_triggers():
+            return False
+        self.rebuild()
+        return True
+
+    def rebuild(self):
+        """Restore missing triggers and reindex every row from the content tables"""
+        self.install_triggers()
+        with self.connection.cursor() as cursor:
+            for kind in KINDS:
+                fts_table = self.fts_table(kind)
+                cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+    def build_query(self, terms):
+        # Terms are \w+ words, so quoting them can't break the FTS5 syntax
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def search_sql(self, kind):
+        spec = KINDS[kind]
+        fts_table = self.fts_table(kind)
+        weights = ', '.join(str(weight) for _, _, weight in spec.columns)
+        parent = spec.parent or 'NULL'
+        # bm25() is lower for better matches
+        return (
+            f"SELECT '{kind}' AS kind, rowid AS id, {spec.title} AS title, {parent} AS project_id, "
+            f"-bm25({fts_table}, {weights}) AS score "
+            f"FROM {fts_table} WHERE {fts_table} MATCH %s"
+        )
+
+    def match_sql(self, kind):
+        fts_table = self.fts_table(kind)
+        return f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s'
+
+
+class SearchResults:
+    """
+    The ranked hits of one search across kinds. Counted and sliced in SQL,
+    so Django's Paginator fetches only the requested page.
+    """
+
+    def __init__(self, index, terms, kinds=KINDS):
+        self.index = index
+        self.kinds = list(kinds)
+        self.query = index.build_query(terms)
+
+    def union_sql(self):
+        sql = ' UNION ALL '.join(self.index.search_sql(kind) for kind in self.kinds)
+        return sql, [self.query] * len(self.kinds)
+
+    def count(self):
+        sql, params = self.union_sql()
+        with self.index.connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM ({sql}) AS hits', params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step is not None:
+            raise TypeError('Search results only support slicing')
+        start = item.start or 0
+        if item.stop is not None and item.stop <= start:
+            return []
+        sql, params = self.union_sql()
+        sql += ' ORDER BY score DESC, kind, id'
+        if item.stop is not None:
+            sql += ' LIMIT %s OFFSET %s'
+            params += [item.stop - start, start]
+        elif start:
+            sql += ' LIMIT -1 OFFSET %s' if self.index.connection.vendor == 'sqlite' else ' OFFSET %s'
+            params.append(start)
+        with self.index.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [self.to_representation(*row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def to_representation(kind, pk, title, project_id, score):
+        hit = {'type': kind, 'id': pk, 'title': title}
+        if kind == 'task':
+            hit['project'] = project_id
+        hit['score'] = score
+        return hit
+
@@ -0,0 +1,178 @@
+"""
+Synthetic data generation for load testing and benchmarks.
+
+Rows are built in memory with realistic distributions and inserted with
+batched bulk_create calls, one transaction per batch of projects.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import changelog, response_cache
+from .dashboard import invalidate_dashboard_stats
+from .models import Project, ProjectStats, Task
+from .signals import tasks_bulk_saved
+from .stats import rebuild_all_stats
+
+
+STATUS_WEIGHTS = {
+    'planning': 25,
+    'in_progress': 40,
+    'completed': 25,
+    'on_hold': 10,
+}
+PRIORITY_WEIGHTS = {
+    'low': 30,
+    'medium': 50,
+    'high': 20,
+}
+# Share of tasks already completed, by project status
+COMPLETION_RATES = {
+    'planning': 0.05,
+    'in_progress': 0.5,
+    'completed': 1.0,
+    'on_hold': 0.3,
+}
+
+CLIENT_PREFIXES = [
+    'TechMart', 'FitLife', 'GreenLeaf', 'Stellar', 'DataDrive', 'BlueWave',
+    'Summit', 'Nimbus', 'Everest', 'Quantum', 'Urban', 'Bright',
+]
+CLIENT_SUFFIXES = ['Inc', 'Solutions', 'Organics', 'Innovations', 'Corp', 'Labs', 'Group', 'Studio']
+PROJECT_KINDS = [
+    'Website Redesign', 'Mobile App Development', 'Social Media Campaign',
+    'Brand Identity Refresh', 'Analytics Dashboard', 'SEO Audit',
+    'Email Marketing Automation', 'E-commerce Integration', 'Video Production',
+    'Content Strategy',
+]
+TASK_NAMES = [
+    'Requirements gathering', 'Design mockups', 'Wireframes', 'Frontend development',
+    'Backend API setup', 'Database optimization', 'Content creation', 'QA testing',
+    'Client review', 'Analytics report', 'Deployment', 'Documentation',
+]
+
+
+def weighted_choice(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def build_project(rng, clients, now):
+    """Build an unsaved Project with dates consistent with its status"""
+    today = now.date()
+    status = weighted_choice(rng, STATUS_WEIGHTS)
+    duration = timedelta(days=rng.randint(14, 365))
+
+    if status == 'planning':
+        start_date = today + timedelta(days=rng.randint(0, 60))
+    elif status == 'completed':
+        start_date = today - duration - timedelta(days=rng.randint(1, 365))
+    else:
+        start_date = today - timedelta(days=rng.randint(0, duration.days))
+    end_date = start_date + duration
+    if status == 'planning' and rng.random() < 0.15:
+        end_date = None
+
+    # Projects are entered up to two months before they start
+    created_at = timezone.make_aware(datetime.combine(start_date, time.min)) - timedelta(
+        days=rng.randint(0, 60), minutes=rng.randint(0, 60 * 24)
+    )
+    if created_at > now:
+        created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+    # Budgets are roughly log-normal around 30k
+    budget = Decimal(min(rng.lognormvariate(10.3, 0.8), 5_000_000)).quantize(Decimal('0.01'))
+
+    return Project(
+        title=f'{rng.choice(PROJECT_KINDS)} #{rng.randint(1, 9999)}',
+        description=f'{rng.choice(PROJECT_KINDS)} for {rng.choice(clients)}.',
+        client_name=rng.choice(clients),
+        budget=max(budget, Decimal('500.00')),
+        status=status,
+        start_date=start_date,
+        end_date=end_date,
+        created_at=created_at,
+    )
+
+
+def build_tasks(rng, project, count, now):
+    """Build `count` unsaved tasks for a saved project"""
+    completion_rate = COMPLETION_RATES[project.status]
+    span = ((project.end_date or project.start_date + timedelta(days=90)) - project.start_date).days
+    tasks = []
+    for _ in range(count):
+        created_at = project.created_at + (now - project.created_at) * rng.random()
+        due_date = None
+        if rng.random() < 0.85:
+            due_date = project.start_date + timedelta(days=rng.randint(0, max(span, 1)))
+        tasks.append(Task(
+            project=project,
+            name=rng.choice(TASK_NAMES),
+            description=f'{rng.choice(TASK_NAMES)} for {project.title}',
+            priority=weighted_choice(rng, PRIORITY_WEIGHTS),
+            completed=rng.random() < completion_rate,
+            due_date=due_date,
+            created_at=created_at,
+        ))
+    return tasks
+
+
+def seed_data(projects, tasks_per_project, seed=None, batch_size=1000, progress=None):
+    """
+    Insert `projects` synthetic projects with on average `tasks_per_project`
+    tasks each. Every batch of projects and its tasks is written in one
+    transaction; `progress(projects_done, tasks_done)` is called after each.
+    Returns (projects_created, tasks_created).
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    clients = [
+        f'{prefix} {suffix}'
+        for prefix in CLIENT_PREFIXES
+        for suffix in CLIENT_SUFFIXES
+    ]
+    spread = max(tasks_per_project // 2, 0)
+
+    projects_done = tasks_done = 0
+    while projects_done < projects:
+        count = min(batch_size, projects - projects_done)
+        with transaction.atomic():
+            batch = Project.objects.bulk_create(
+                [build_project(rng, clients, now) for _ in range(count)]
+            )
+            tasks = []
+            for project in batch:
+                task_count = rng.randint(tasks_per_project - spread, tasks_per_project + spread)
+                tasks.extend(build_tasks(rng, project, task_count, now))
+            Task.objects.bulk_create(tasks, batch_size=batch_size)
+            tasks_bulk_saved.send(
+                sender=Task,
+                tasks=tasks,
+                created=True,
+                project_ids={project.pk for project in batch},
+            )
+
+        projects_done += count
+        tasks_done += len(tasks)
+        if progress is not None:
+            progress(projects_done, tasks_done)
+
+    return projects_done, tasks_done
+
+
+def clear_data():
+    """
+    Delete every project and task with plain DELETE statements. Model
+    signals are bypassed, so the change log gets the tombstones directly and
+    the statistics are rebuilt afterwards.
+    """
+    quote_name = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        changelog.log_table_deleted('task', Task)
+        changelog.log_table_deleted('project', Project)
+        for model in (Task, ProjectStats, Project):
+            cursor.execute(f'DELETE FROM {quote_name(model._meta.db_table)}')
+        rebuild_all_stats()
+    transaction.on_commit(invalidate_dashboard_stats)
+    transaction.on_commit(response_cache.invalidate_all)
@@ -1,20 +1,142 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Project, Task
+from .signals import tasks_bulk_saved
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    A ModelSerializer that takes an additional `fields` argument that
+    controls which fields should be displayed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            # Drop any fields that are not specified in the `fields` argument
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class TaskProjectField(serializers.PrimaryKeyRelatedField):
+    """
+    Project reference that resolves against the `project_cache` context
+    entry when present, so validating many tasks doesn't run a query per item.
+    """
+
+    def to_internal_value(self, data):
+        project_cache = self.context.get('project_cache')
+        if project_cache is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            project = project_cache.get(int(data))
+        except ValueError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if project is None:
+            self.fail('does_not_exist', pk_value=data)
+        return project
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    Writes a list of tasks with bulk_create / bulk_update in one transaction.
+    For updates, `instance` is a {pk: Task} mapping and every item must carry
+    the `id` of the task it changes.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            # Resolve every referenced project with a single query
+            project_ids = set()
+            for item in data:
+                if isinstance(item, dict):
+                    try:
+                        project_ids.add(int(item.get('project')))
+                    except (TypeError, ValueError):
+                        pass
+            self._context = dict(
+                self.context,
+                project_cache=Project.objects.only('pk').in_bulk(project_ids),
+            )
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+
+        pk = data.get('id') if isinstance(data, dict) else None
+        try:
+            instance = self.instance.get(int(pk))
+        except (TypeError, ValueError):
+            instance = None
+        if instance is None:
+            raise serializers.ValidationError({'id': [f'Task "{pk}" does not exist.']})
+        self.child.instance = instance
+        self.child.initial_data = data
+        attrs = super().run_child_validation(data)
+        attrs['id'] = instance.pk
+        return attrs
+
+    def create(self, validated_data):
+        tasks = [Task(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            Task.objects.bulk_create(tasks, batch_size=settings.TASK_BULK_BATCH_SIZE)
+            tasks_bulk_saved.send(
+                sender=Task,
+                tasks=tasks,
+                created=True,
+                project_ids={task.project_id for task in tasks},
+            )
+        return tasks
+
+    def update(self, instances, validated_data):
+        # bulk_update() doesn't apply auto_now
+        now = timezone.now()
+        tasks, fields = [], set()
+        project_ids = set()
+        for attrs in validated_data:
+            task = instances[attrs.pop('id')]
+            project_ids.add(task.project_id)
+            for name, value in attrs.items():
+                setattr(task, name, value)
+            task.updated_at = now
+            project_ids.add(task.project_id)
+            fields.update(attrs)
+            tasks.append(task)
+
+        with transaction.atomic():
+            if fields:
+                fields.add('updated_at')
+                Task.objects.bulk_update(
+                    tasks, sorted(fields), batch_size=settings.TASK_BULK_BATCH_SIZE
+                )
+            tasks_bulk_saved.send(
+                sender=Task, tasks=tasks, created=False, project_ids=project_ids
+            )
+        return tasks
+
+
+class TaskSerializer(DynamicFieldsModelSerializer):
     """Serializer for Task model"""
+    project = TaskProjectField(queryset=Project.objects.all())
     
     class Meta:
         model = Task
         fields = [
             'id', 'project', 'name', 'description', 
-            'priority', 'completed', 'due_date', 'created_at'
+            'priority', 'completed', 'due_date', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = TaskListSerializer
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(DynamicFieldsModelSerializer):
     """Serializer for Project model with nested tasks"""
     tasks = TaskSerializer(many=True, read_only=True)
     total_tasks = serializers.SerializerMethodField()
@@ -29,18 +151,52 @@ class ProjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        # The view may restrict the nested task fields, or read the tasks
+        # from a sliced prefetch stored under another attribute
+        tasks_fields = self.context.get('tasks_fields')
+        tasks_source = self.context.get('tasks_source')
+        if 'tasks' in self.fields and (tasks_fields is not None or tasks_source is not None):
+            kwargs = {'many': True, 'read_only': True, 'fields': tasks_fields}
+            if tasks_source is not None:
+                kwargs['source'] = tasks_source
+            self.fields['tasks'] = TaskSerializer(**kwargs)
+    
+    def _prefetched_tasks(self, obj):
+        """Returns the prefetched task list, or None if it wasn't prefetched"""
+        if 'tasks' in getattr(obj, '_prefetched_objects_cache', {}):
+            return obj.tasks.all()
+        return None
+    
     def get_total_tasks(self, obj):
         """Returns total number of tasks for this project"""
+        total = getattr(obj, 'total_tasks', None)
+        if total is not None:
+            return total
+        tasks = self._prefetched_tasks(obj)
+        if tasks is not None:
+            return len(tasks)
         return obj.tasks.count()
     
     def get_completed_tasks(self, obj):
         """Returns number of completed tasks for this project"""
+        completed = getattr(obj, 'completed_tasks', None)
+        if completed is not None:
+            return completed
+        tasks = self._prefetched_tasks(obj)
+        if tasks is not None:
+            return sum(1 for task in tasks if task.completed)
         return obj.tasks.filter(completed=True).count()
 
 
-class ProjectListSerializer(serializers.ModelSerializer):
+class ProjectListSerializer(DynamicFieldsModelSerializer):
     """Lightweight serializer for listing projects"""
     total_tasks = serializers.SerializerMethodField()
+    # Read straight from the with_task_counts() annotation by the fast
+    # list path (api.fast_serializers)
+    fast_annotation_fields = ('total_tasks',)
     
     class Meta:
         model = Project
@@ -50,4 +206,8 @@ class ProjectListSerializer(serializers.ModelSerializer):
         ]
     
     def get_total_tasks(self, obj):
+        # Prefer the value annotated by ProjectViewSet.get_queryset()
+        total = getattr(obj, 'total_tasks', None)
+        if total is not None:
+            return total
         return obj.tasks.count()
@@ -0,0 +1,239 @@
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import changelog, events, response_cache, search, stats
+from .dashboard import invalidate_dashboard_stats
+from .middleware import install_query_collector
+from .models import Project, ProjectStats, Task
+
+
+# Sent inside the transaction by bulk write paths that bypass post_save
+# (bulk_create / bulk_update). Arguments: tasks, created, project_ids
+# (every project whose tasks changed, including ones tasks moved away from).
+tasks_bulk_saved = Signal()
+
+# Sent inside the transaction by bulk inserts of projects that bypass
+# post_save. Arguments: projects.
+projects_bulk_created = Signal()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(tasks_bulk_saved, sender=Task)
+@receiver(projects_bulk_created, sender=Project)
+def invalidate_dashboard_cache(sender, **kwargs):
+    """Drop the cached dashboard once the change is committed"""
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+def deleted_with_project(origin):
+    """
+    Whether the deletion started at `origin` (the post_delete argument) is a
+    project delete, i.e. tasks it deletes go with their project
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is Project
+    return isinstance(origin, Project)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_responses(sender, instance, **kwargs):
+    """Retire the cached responses showing this project once the change is committed"""
+    response_cache.invalidate_projects_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_project_responses(sender, instance, **kwargs):
+    """
+    Retire the cached responses of the task's project, and of the project it
+    moved away from (the snapshot still describes the row before this save)
+    """
+    project_ids = [instance.project_id]
+    snapshot = getattr(instance, '_stats_snapshot', None)
+    if snapshot:
+        project_ids.append(snapshot[0])
+    response_cache.invalidate_projects_on_commit(project_ids)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def log_task_change(sender, instance, created=False, origin=None, **kwargs):
+    """
+    Log the task in the change log, and its project when the task count it
+    shows changed: the task was created, deleted, or moved (from the project
+    in the snapshot, which still describes the row before this save)
+    """
+    deleted = kwargs['signal'] is post_delete
+    if deleted and deleted_with_project(origin):
+        # Already logged by log_deleted_project_tasks, and the project gets
+        # its own tombstone
+        return
+    changes = [('task', instance.pk, deleted)]
+    project_ids = set()
+    if created or deleted:
+        project_ids.add(instance.project_id)
+    snapshot = getattr(instance, '_stats_snapshot', None)
+    if snapshot and snapshot[0] != instance.project_id:
+        project_ids.update((snapshot[0], instance.project_id))
+    changes.extend(('project', project_id, False) for project_id in project_ids)
+    changelog.log_changes(changes)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def log_project_change(sender, instance, **kwargs):
+    """Log the project in the change log (a tombstone once deleted)"""
+    changelog.log_changes([('project', instance.pk, kwargs['signal'] is post_delete)])
+
+
+@receiver(pre_delete, sender=Project)
+def log_deleted_project_tasks(sender, instance, **kwargs):
+    """Log the tombstones of all the tasks of a project being deleted at once"""
+    changelog.log_project_tasks_deleted(instance.pk)
+
+
+@receiver(tasks_bulk_saved, sender=Task)
+def log_bulk_saved_tasks(sender, tasks, project_ids, **kwargs):
+    """Log bulk-written tasks and the projects whose tasks changed"""
+    changelog.log_bulk_changes(
+        'task', (task.pk for task in tasks), (('project', project_id) for project_id in project_ids),
+    )
+
+
+@receiver(projects_bulk_created, sender=Project)
+def log_bulk_created_projects(sender, projects, **kwargs):
+    """Log bulk-created projects"""
+    changelog.log_bulk_changes('project', (project.pk for project in projects))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def publish_task_events(sender, instance, created=False, **kwargs):
+    """
+    Stream the task write to the event subscribers once it is committed
+    (the snapshot tells completions and moves apart, so this runs before
+    update_stats_on_task_save replaces it)
+    """
+    if events.broker.has_subscribers():
+        events.broker.publish_on_commit(events.task_events(
+            instance, created=created, deleted=kwargs['signal'] is post_delete,
+            previous=getattr(instance, '_stats_snapshot', None),
+        ))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def publish_project_events(sender, instance, created=False, **kwargs):
+    """Stream the project write to the event subscribers once it is committed"""
+    if events.broker.has_subscribers():
+        events.broker.publish_on_commit(events.project_events(
+            instance, created=created, deleted=kwargs['signal'] is post_delete,
+        ))
+    # The next save of this instance compares with the status it wrote
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(tasks_bulk_saved, sender=Task)
+def publish_bulk_saved_events(sender, project_ids, **kwargs):
+    """Tell the event subscribers of each project its tasks changed"""
+    if events.broker.has_subscribers():
+        events.broker.publish_on_commit(events.bulk_task_events(project_ids))
+
+
+@receiver(projects_bulk_created, sender=Project)
+def publish_bulk_created_events(sender, projects, **kwargs):
+    if events.broker.has_subscribers():
+        events.broker.publish_on_commit([
+            event for project in projects for event in events.project_events(project, created=True)
+        ])
+
+
+@receiver(tasks_bulk_saved, sender=Task)
+def invalidate_bulk_saved_responses(sender, project_ids, **kwargs):
+    """Retire the cached responses of the projects a bulk write touched"""
+    response_cache.invalidate_projects_on_commit(project_ids)
+
+
+@receiver(projects_bulk_created, sender=Project)
+def invalidate_bulk_created_responses(sender, projects, **kwargs):
+    """Retire the cached project lists once bulk-created projects are committed"""
+    response_cache.invalidate_projects_on_commit([project.pk for project in projects])
+
+
+@receiver(projects_bulk_created, sender=Project)
+def create_bulk_project_stats(sender, projects, **kwargs):
+    """Bulk-created projects get their (empty) statistics rows too"""
+    stats.refresh_project_stats(project.pk for project in projects)
+
+
+@receiver(post_save, sender=Project)
+def create_project_stats(sender, instance, created, raw=False, **kwargs):
+    """Every project gets an (empty) statistics row when it is created"""
+    if created and not raw:
+        ProjectStats.objects.get_or_create(project=instance)
+
+
+@receiver(post_save, sender=Task)
+def update_stats_on_task_save(sender, instance, created, raw=False, **kwargs):
+    """Apply the change in this task's contribution to the statistics"""
+    if raw:
+        return
+    new = instance.stats_contribution()
+    if new is None:
+        # Deferred counter fields were not written by this save
+        return
+    old = None if created else getattr(instance, '_stats_snapshot', None)
+    if old != new:
+        stats.apply_task_change(old, new)
+    instance._stats_snapshot = new
+
+
+@receiver(pre_delete, sender=Project)
+def remove_deleted_project_stats(sender, instance, **kwargs):
+    """Take all the tasks of a project being deleted out of the statistics at once"""
+    stats.remove_project_stats(instance.pk)
+
+
+@receiver(post_delete, sender=Task)
+def update_stats_on_task_delete(sender, instance, origin=None, **kwargs):
+    """Remove a deleted task's contribution from the statistics"""
+    if deleted_with_project(origin):
+        # Already subtracted by remove_deleted_project_stats
+        return
+    contribution = getattr(instance, '_stats_snapshot', None) or instance.stats_contribution()
+    if contribution is not None:
+        stats.apply_task_change(contribution, None)
+
+
+@receiver(tasks_bulk_saved, sender=Task)
+def update_stats_on_bulk_save(sender, tasks, project_ids, **kwargs):
+    """Recompute the statistics of the projects a bulk write touched"""
+    stats.refresh_project_stats(project_ids)
+    for task in tasks:
+        task._stats_snapshot = task.stats_contribution()
+
+
+@receiver(connection_created)
+def install_request_metrics(sender, connection, **kwargs):
+    """Let RequestMetricsMiddleware count the queries of new connections"""
+    install_query_collector(connection)
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    """
+    Restore the search index triggers that SQLite table rebuilds (run by
+    migrations altering a table) drop along with the old table
+    """
+    if sender.name != 'api':
+        return
+    index = search.get_index(connections[using])
+    if index is not None:
+        index.repair()
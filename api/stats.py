@@ -0,0 +1,212 @@
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import GlobalStats, Project, ProjectStats, Task, TaskCounters
+
+
+_deferred = threading.local()
+
+
+def counter_annotations():
+    """Aggregates computing every TaskCounters field over a Task queryset"""
+    annotations = {
+        'total_tasks': Count('id'),
+        'completed_tasks': Count('id', filter=Q(completed=True)),
+    }
+    for priority, _ in Task._meta.get_field('priority').choices:
+        annotations[TaskCounters.priority_field(priority)] = Count(
+            'id', filter=Q(priority=priority)
+        )
+    return annotations
+
+
+def count_tasks_by_project(project_ids):
+    """Return {project_id: {counter: value}} computed from the Task table"""
+    rows = (
+        Task.objects.filter(project_id__in=project_ids)
+        .order_by()
+        .values('project_id')
+        .annotate(**counter_annotations())
+    )
+    return {row.pop('project_id'): row for row in rows}
+
+
+def contribution_deltas(contribution, sign):
+    """
+    Return (project_id, deltas) for adding (sign=1) or removing (sign=-1)
+    a task described by Task.stats_contribution().
+    """
+    project_id, priority, completed = contribution
+    deltas = {'total_tasks': sign, TaskCounters.priority_field(priority): sign}
+    if completed:
+        deltas['completed_tasks'] = sign
+    return project_id, deltas
+
+
+@contextmanager
+def defer_stats_updates():
+    """
+    Within this block, task changes only record which projects they touch;
+    those projects are recomputed once on exit. Used by bulk deletes, which
+    would otherwise apply one pair of UPDATEs per deleted task. Projects
+    themselves must not be deleted inside the block.
+    """
+    if getattr(_deferred, 'project_ids', None) is not None:
+        # Nested use: the outermost block does the refresh
+        yield _deferred.project_ids
+        return
+
+    _deferred.project_ids = set()
+    try:
+        with transaction.atomic():
+            yield _deferred.project_ids
+            project_ids, _deferred.project_ids = _deferred.project_ids, None
+            refresh_project_stats(project_ids)
+    finally:
+        _deferred.project_ids = None
+
+
+def apply_task_change(old, new):
+    """
+    Move a task's contribution from `old` to `new` (either may be None,
+    for creates and deletes) in ProjectStats and GlobalStats.
+    """
+    pending = getattr(_deferred, 'project_ids', None)
+    if pending is not None:
+        pending.update(c[0] for c in (old, new) if c is not None)
+        return
+
+    changes = defaultdict(Counter)
+    if old is not None:
+        project_id, deltas = contribution_deltas(old, -1)
+        changes[project_id].update(deltas)
+    if new is not None:
+        project_id, deltas = contribution_deltas(new, 1)
+        changes[project_id].update(deltas)
+    apply_deltas(changes)
+
+
+def apply_deltas(changes):
+    """Apply {project_id: {counter: delta}} with atomic F() updates"""
+    totals = Counter()
+    for project_id, deltas in changes.items():
+        deltas = {name: value for name, value in deltas.items() if value}
+        if not deltas:
+            continue
+        # The ProjectStats row may already be gone when tasks are deleted by
+        # a project cascade; GlobalStats is updated regardless
+        ProjectStats.objects.filter(project_id=project_id).update(
+            updated_at=timezone.now(),
+            **{name: F(name) + value for name, value in deltas.items()}
+        )
+        totals.update(deltas)
+
+    totals = {name: value for name, value in totals.items() if value}
+    if totals:
+        GlobalStats.objects.filter(pk=GlobalStats.SINGLETON_ID).update(
+            **{name: F(name) + value for name, value in totals.items()}
+        )
+
+
+def remove_project_stats(project_id):
+    """
+    Subtract a project's counters from GlobalStats with one UPDATE, before
+    the project is deleted: the tasks its deletion cascades to then skip the
+    per-task updates (its ProjectStats row goes with it)
+    """
+    counters = ProjectStats.objects.filter(project_id=project_id)
+    GlobalStats.objects.filter(pk=GlobalStats.SINGLETON_ID).update(**{
+        name: F(name) - Coalesce(Subquery(counters.values(name)), 0)
+        for name in TaskCounters.COUNTER_FIELDS
+    })
+
+
+def refresh_project_stats(project_ids):
+    """
+    Recompute the statistics of the given projects from the Task table and
+    fold the difference into GlobalStats.
+
+    Bulk paths that bypass model signals (bulk_create, bulk_update,
+    QuerySet.update) must call this for the projects they touched. A project
+    without a ProjectStats row is assumed to have had none of its tasks
+    counted yet.
+    """
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        existing = ProjectStats.objects.select_for_update().in_bulk(project_ids)
+        counted = count_tasks_by_project(project_ids)
+        live_ids = Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True)
+
+        changes = {}
+        to_create, to_update = [], []
+        for project_id in live_ids:
+            values = counted.get(project_id, dict.fromkeys(TaskCounters.COUNTER_FIELDS, 0))
+            stats = existing.get(project_id)
+            if stats is None:
+                to_create.append(ProjectStats(project_id=project_id, **values))
+                changes[project_id] = values
+                continue
+            changes[project_id] = {
+                name: values[name] - getattr(stats, name)
+                for name in TaskCounters.COUNTER_FIELDS
+            }
+            if any(changes[project_id].values()):
+                for name, value in values.items():
+                    setattr(stats, name, value)
+                stats.updated_at = now
+                to_update.append(stats)
+
+        ProjectStats.objects.bulk_create(to_create)
+        ProjectStats.objects.bulk_update(to_update, TaskCounters.COUNTER_FIELDS + ('updated_at',))
+
+        totals = Counter()
+        for deltas in changes.values():
+            totals.update(deltas)
+        totals = {name: value for name, value in totals.items() if value}
+        if totals:
+            GlobalStats.objects.filter(pk=GlobalStats.SINGLETON_ID).update(
+                **{name: F(name) + value for name, value in totals.items()}
+            )
+
+
+def rebuild_all_stats(batch_size=1000):
+    """
+    Recompute every ProjectStats row and the GlobalStats rollup from scratch.
+    Returns the number of projects processed.
+    """
+    with transaction.atomic():
+        ProjectStats.objects.all().delete()
+
+        processed = 0
+        project_ids = Project.objects.order_by('pk').values_list('pk', flat=True)
+        batch = []
+        for project_id in project_ids.iterator(chunk_size=batch_size):
+            batch.append(project_id)
+            if len(batch) >= batch_size:
+                processed += _create_stats_batch(batch)
+                batch = []
+        if batch:
+            processed += _create_stats_batch(batch)
+
+        totals = Task.objects.aggregate(**counter_annotations())
+        GlobalStats.objects.update_or_create(pk=GlobalStats.SINGLETON_ID, defaults=totals)
+    return processed
+
+
+def _create_stats_batch(project_ids):
+    counted = count_tasks_by_project(project_ids)
+    ProjectStats.objects.bulk_create([
+        ProjectStats(project_id=project_id, **counted.get(project_id, {}))
+        for project_id in project_ids
+    ])
+    return len(project_ids)
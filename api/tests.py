@@ -1,3 +1,1953 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from . import benchmarks, changelog, compression, events, external, renderers, replicas, response_cache, search
+from .benchmarks import StubAPIServer
+from .fast_serializers import RowSerializer
+from .importing import Importer
+from .metrics import DB_READS, REGISTRY, RESPONSE_CACHE_REQUESTS
+from .middleware import fingerprint
+from .models import ChangeLogEntry, GlobalStats, ImportCheckpoint, Project, ProjectStats, Task
+from .renderers import FastJSONParser, FastJSONRenderer
+from .replicas import ReplicaRouter, RoutingState
+from .seeding import clear_data, seed_data
+from .serializers import ProjectListSerializer, ProjectSerializer
+from .stats import counter_annotations, refresh_project_stats
+
+
+def make_project(**kwargs):
+    """Create a project with sensible defaults for tests"""
+    data = {
+        'title': 'Website Redesign',
+        'description': 'Redesign the marketing website',
+        'client_name': 'TechMart Inc',
+        'budget': Decimal('1000.00'),
+        'status': 'planning',
+        'start_date': date(2025, 1, 1),
+    }
+    data.update(kwargs)
+    return Project.objects.create(**data)
+
+
+def make_task(project, **kwargs):
+    """Create a task with sensible defaults for tests"""
+    data = {'name': 'Design mockups', 'priority': 'medium'}
+    data.update(kwargs)
+    return Task.objects.create(project=project, **data)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class ProjectListQueryTests(TestCase):
+    """The project list must not issue a query per row"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _list_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/projects/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        for i in range(3):
+            project = make_project(title=f'Project {i}')
+            make_task(project, completed=True)
+            make_task(project)
+        small, _ = self._list_query_count()
+
+        for i in range(5):
+            project = make_project(title=f'Extra {i}')
+            make_task(project)
+        large, _ = self._list_query_count()
+
+        self.assertEqual(small, large)
+
+    def test_task_counts_are_annotated(self):
+        project = make_project()
+        make_task(project, completed=True)
+        make_task(project)
+        make_project(title='Empty')
+
+        _, response = self._list_query_count()
+        totals = {row['title']: row['total_tasks'] for row in response.data['results']}
+        self.assertEqual(totals, {'Website Redesign': 2, 'Empty': 0})
+
+    def test_detail_counts(self):
+        project = make_project()
+        make_task(project, completed=True)
+        make_task(project)
+
+        response = self.client.get(f'/api/projects/{project.pk}/')
+        self.assertEqual(response.data['total_tasks'], 2)
+        self.assertEqual(response.data['completed_tasks'], 1)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class PaginationTests(TestCase):
+    """List endpoints paginate by page number or by keyset cursor"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        # Identical timestamps exercise the id tie-breaker of the keyset
+        created_at = timezone.now()
+        for i in range(25):
+            make_task(self.project, name=f'Task {i}', created_at=created_at)
+
+    def test_page_number_pagination(self):
+        response = self.client.get('/api/tasks/', {'page': 3})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/tasks/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 25)
+
+    def test_cursor_pagination_walks_every_row_once(self):
+        seen = []
+        url, params = '/api/tasks/', {'pagination': 'cursor', 'page_size': 10}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_cursor_pagination_skips_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/tasks/', {'pagination': 'cursor'})
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/tasks/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class ProjectDetailPrefetchTests(TestCase):
+    """Detail responses load nested tasks with a single prefetch query"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        for i in range(6):
+            make_task(self.project, name=f'Task {i}', completed=i % 2 == 0)
+
+    def test_retrieve_uses_two_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(len(response.data['tasks']), 6)
+        self.assertEqual(response.data['total_tasks'], 6)
+        self.assertEqual(response.data['completed_tasks'], 3)
+
+    def test_tasks_limit_keeps_full_counts(self):
+        response = self.client.get(
+            f'/api/projects/{self.project.pk}/', {'tasks_limit': 2}
+        )
+        self.assertEqual(len(response.data['tasks']), 2)
+        self.assertEqual(response.data['total_tasks'], 6)
+        self.assertEqual(response.data['completed_tasks'], 3)
+
+    def test_tasks_fields(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                f'/api/projects/{self.project.pk}/', {'tasks_fields': 'id,name'}
+            )
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertEqual(set(response.data['tasks'][0]), {'id', 'name'})
+        self.assertNotIn('description', ctx.captured_queries[1]['sql'])
+
+    def test_invalid_task_options(self):
+        url = f'/api/projects/{self.project.pk}/'
+        self.assertEqual(self.client.get(url, {'tasks_limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'tasks_fields': 'bogus'}).status_code, 400)
+
+    def test_update_response_counts(self):
+        response = self.client.patch(
+            f'/api/projects/{self.project.pk}/', {'status': 'on_hold'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'on_hold')
+        self.assertEqual(response.data['total_tasks'], 6)
+
+
+@override_settings(DASHBOARD_CACHE_TTL=30)
+class DashboardStatsTests(TestCase):
+    """The dashboard is built from a few aggregates and cached"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        project = make_project(status='in_progress', budget=Decimal('100.00'))
+        make_project(title='Other', budget=Decimal('300.00'))
+        make_task(project, priority='high', completed=True)
+        make_task(project, priority='low')
+
+    def test_payload(self):
+        data = self.client.get('/api/dashboard/').data
+        self.assertEqual(data['overview']['total_projects'], 2)
+        self.assertEqual(data['overview']['total_budget'], 400.0)
+        self.assertEqual(data['overview']['average_budget'], 200.0)
+        self.assertEqual(data['overview']['recent_projects_30_days'], 2)
+        self.assertEqual(data['project_status'], {
+            'planning': 1, 'in_progress': 1, 'completed': 0, 'on_hold': 0,
+        })
+        self.assertEqual(data['tasks'], {
+            'total_tasks': 2, 'completed_tasks': 1,
+            'pending_tasks': 1, 'completion_rate': 50.0,
+        })
+        self.assertEqual(data['priority_distribution'], {'low': 1, 'medium': 0, 'high': 1})
+
+    def test_query_count_is_independent_of_choices(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/dashboard/')
+        self.assertLessEqual(len(ctx.captured_queries), 5)
+
+    def test_cached_until_data_changes(self):
+        self.client.get('/api/dashboard/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/dashboard/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_project(title='Third')
+        data = self.client.get('/api/dashboard/').data
+        self.assertEqual(data['overview']['total_projects'], 3)
+
+
+class ProjectStatsTests(TestCase):
+    """ProjectStats and GlobalStats follow every task change"""
+
+    def setUp(self):
+        self.project = make_project()
+        self.other = make_project(title='Other')
+
+    def assertStats(self, project, **expected):
+        stats = ProjectStats.objects.get(project=project)
+        for name, value in expected.items():
+            self.assertEqual(getattr(stats, name), value, name)
+
+    def assertGlobalMatchesTasks(self):
+        totals = Task.objects.aggregate(**counter_annotations())
+        stats = GlobalStats.load()
+        self.assertEqual({name: getattr(stats, name) for name in totals}, totals)
+
+    def test_create_update_delete(self):
+        task = make_task(self.project, priority='high')
+        self.assertStats(self.project, total_tasks=1, completed_tasks=0, high_priority_tasks=1)
+
+        task = Task.objects.get(pk=task.pk)
+        task.completed = True
+        task.priority = 'low'
+        task.save()
+        self.assertStats(
+            self.project, total_tasks=1, completed_tasks=1,
+            high_priority_tasks=0, low_priority_tasks=1,
+        )
+
+        task.project = self.other
+        task.save()
+        self.assertStats(self.project, total_tasks=0, completed_tasks=0, low_priority_tasks=0)
+        self.assertStats(self.other, total_tasks=1, completed_tasks=1, low_priority_tasks=1)
+
+        task.delete()
+        self.assertStats(self.other, total_tasks=0, completed_tasks=0)
+        self.assertGlobalMatchesTasks()
+
+    def test_stale_snapshots(self):
+        task = make_task(self.project)
+        # Two requests read the task before either saves
+        first, second = Task.objects.get(pk=task.pk), Task.objects.get(pk=task.pk)
+        first.completed = second.completed = True
+        first.save()
+        second.save()
+        self.assertStats(self.project, total_tasks=1, completed_tasks=1)
+        self.assertGlobalMatchesTasks()
+
+    def test_update_through_api(self):
+        task = make_task(self.project)
+        response = APIClient().patch(f'/api/tasks/{task.pk}/', {'completed': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertStats(self.project, completed_tasks=1)
+
+    def test_project_cascade(self):
+        make_task(self.project, completed=True)
+        make_task(self.other)
+        self.project.delete()
+        self.assertGlobalMatchesTasks()
+
+    def test_project_destroy_updates_stats_once(self):
+        for i in range(20):
+            make_task(self.project, completed=i % 2 == 0)
+        make_task(self.other, priority='high')
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().delete(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 204)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('api_globalstats', updates[0])
+        self.assertGlobalMatchesTasks()
+
+    def test_refresh_after_bulk_create(self):
+        Task.objects.bulk_create([
+            Task(project=self.project, name=f'Task {i}', priority='low') for i in range(3)
+        ])
+        refresh_project_stats([self.project.pk])
+        self.assertStats(self.project, total_tasks=3, low_priority_tasks=3)
+        self.assertGlobalMatchesTasks()
+
+    def test_rebuild_stats_command(self):
+        make_task(self.project, completed=True)
+        ProjectStats.objects.all().delete()
+        GlobalStats.objects.all().delete()
+
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertStats(self.project, total_tasks=1, completed_tasks=1)
+        self.assertStats(self.other, total_tasks=0)
+        self.assertGlobalMatchesTasks()
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """explain_queries compares plans and leaves the database untouched"""
+
+    def test_seeded_run_is_rolled_back(self):
+        out = StringIO()
+        call_command('explain_queries', seed_projects=5, tasks_per_project=2, repeat=1, stdout=out)
+        self.assertIn('Without indexes', out.getvalue())
+        self.assertFalse(Project.objects.exists())
+        # The dropped indexes are restored
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 'api_task')
+        self.assertIn('task_project_completed_idx', constraints)
+
+
+class TaskBulkTests(TestCase):
+    """Bulk task endpoints validate every item and write in one go"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.project = make_project()
+        self.other = make_project(title='Other')
+
+    def test_bulk_create(self):
+        payload = [
+            {'project': self.project.pk, 'name': f'Task {i}', 'priority': 'high'}
+            for i in range(50)
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 50)
+        self.assertTrue(all(row['id'] for row in response.data))
+        self.assertLess(len(ctx.captured_queries), 20)
+        self.assertEqual(ProjectStats.objects.get(project=self.project).high_priority_tasks, 50)
+
+    def test_bulk_create_reports_item_errors(self):
+        payload = [
+            {'project': self.project.pk, 'name': 'Valid'},
+            {'project': 9999, 'name': 'Unknown project'},
+            {'project': self.project.pk, 'priority': 'urgent'},
+        ]
+        response = self.client.post('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('project', response.data['errors'][0]['errors'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_bulk_update(self):
+        first = make_task(self.project)
+        second = make_task(self.project)
+        payload = [
+            {'id': first.pk, 'completed': True},
+            {'id': second.pk, 'project': self.other.pk, 'name': 'Moved'},
+        ]
+        response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.completed)
+        self.assertEqual((second.project_id, second.name), (self.other.pk, 'Moved'))
+        self.assertEqual(ProjectStats.objects.get(project=self.project).total_tasks, 1)
+        self.assertEqual(ProjectStats.objects.get(project=self.other).total_tasks, 1)
+        self.assertEqual(GlobalStats.load().completed_tasks, 1)
+
+    def test_bulk_update_unknown_id(self):
+        task = make_task(self.project)
+        payload = [{'id': task.pk, 'name': 'Renamed'}, {'id': 9999, 'name': 'Missing'}]
+        response = self.client.patch('/api/tasks/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'][0]['index'], 1)
+        task.refresh_from_db()
+        self.assertEqual(task.name, 'Design mockups')
+
+    def test_bulk_delete(self):
+        tasks = [make_task(self.project, completed=True) for _ in range(3)]
+        keep = make_task(self.project)
+        response = self.client.delete(
+            '/api/tasks/bulk/', {'ids': [task.pk for task in tasks]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['deleted'], 3)
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), [keep.pk])
+        stats = ProjectStats.objects.get(project=self.project)
+        self.assertEqual((stats.total_tasks, stats.completed_tasks), (1, 0))
+        self.assertEqual(GlobalStats.load().total_tasks, 1)
+
+    def test_bulk_delete_unknown_id(self):
+        task = make_task(self.project)
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [task.pk, 'x', 9999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+
+class PopulateDataCommandTests(TestCase):
+    """populate_data seeds sample or synthetic data with consistent stats"""
+
+    def assertStatsConsistent(self):
+        totals = Task.objects.aggregate(**counter_annotations())
+        stats = GlobalStats.load()
+        self.assertEqual({name: getattr(stats, name) for name in totals}, totals)
+        self.assertEqual(ProjectStats.objects.count(), Project.objects.count())
+
+    def test_sample_data(self):
+        call_command('populate_data', stdout=StringIO())
+        self.assertEqual(Project.objects.count(), 5)
+        self.assertEqual(Task.objects.count(), 17)
+        self.assertStatsConsistent()
+
+    def test_synthetic_data_is_reproducible(self):
+        make_project(title='Existing')
+        call_command('populate_data', projects=30, tasks_per_project=4, seed=7,
+                     batch_size=8, stdout=StringIO())
+        self.assertEqual(Project.objects.count(), 30)
+        self.assertFalse(Project.objects.filter(title='Existing').exists())
+        self.assertStatsConsistent()
+        first = list(Task.objects.order_by('pk').values_list('name', 'priority', 'completed'))
+
+        call_command('populate_data', projects=30, tasks_per_project=4, seed=7,
+                     batch_size=8, stdout=StringIO())
+        second = list(Task.objects.order_by('pk').values_list('name', 'priority', 'completed'))
+        self.assertEqual(first, second)
+
+    def test_append(self):
+        make_project(title='Existing')
+        call_command('populate_data', projects=3, tasks_per_project=2, append=True, stdout=StringIO())
+        self.assertEqual(Project.objects.count(), 4)
+        self.assertStatsConsistent()
+
+
+class BenchmarkSuiteTests(TestCase):
+    """The benchmark suite runs every scenario and detects regressions"""
+
+    def test_run_suite(self):
+        seed_data(5, 3, seed=1)
+        results = benchmarks.run_suite(iterations=1)
+        self.assertEqual(set(results), {scenario.name for scenario in benchmarks.SCENARIOS})
+        self.assertEqual(results['dashboard_stats_cached']['queries'], 0)
+
+    def test_compare(self):
+        baseline = {'results': {'tasks_list': {'median_ms': 10.0, 'queries': 2, 'peak_kb': 100.0}}}
+        ok = {'tasks_list': {'median_ms': 12.0, 'queries': 2, 'peak_kb': 110.0}}
+        self.assertEqual(benchmarks.compare(ok, baseline, 0.25), [])
+
+        slow = {'tasks_list': {'median_ms': 20.0, 'queries': 3, 'peak_kb': 100.0}}
+        regressions = benchmarks.compare(slow, baseline, 0.25)
+        self.assertEqual(len(regressions), 2)
+
+    def test_serializer_benchmark(self):
+        seed_data(5, 3, seed=1)
+        results = benchmarks.run_serializer_benchmark(rows=10, iterations=1)
+        self.assertEqual(set(results), {'tasks', 'projects'})
+        self.assertEqual(results['projects']['rows'], 5)
+        self.assertGreater(results['tasks']['fast_rows_per_s'], 0)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class RequestMetricsTests(TestCase):
+    """API requests report Server-Timing and feed the Prometheus histograms"""
+
+    def setUp(self):
+        REGISTRY.clear()
+        self.client = APIClient()
+        project = make_project()
+        make_task(project)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/projects/')
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'encode;dur=', 'app;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertIn('desc="2 queries"', timing)
+
+    def test_non_api_requests_are_not_instrumented(self):
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/projects/')
+        self.client.get('/api/projects/')
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE api_request_duration_seconds histogram', body)
+        self.assertIn(
+            'api_request_duration_seconds_count{view="project-list",method="GET",status="200"} 2',
+            body,
+        )
+        self.assertIn(
+            'api_request_db_queries_bucket{view="project-list",method="GET",status="200",le="2"} 2',
+            body,
+        )
+        self.assertIn('# TYPE api_request_encode_duration_seconds histogram', body)
+
+    @override_settings(API_QUERY_BUDGET=1)
+    def test_over_budget_requests_are_logged(self):
+        with self.assertLogs('api.performance', level='WARNING') as logs:
+            self.client.get('/api/projects/')
+        self.assertIn('GET /api/projects/ exceeded its budget', logs.output[0])
+        self.assertIn('FROM "api_project"', logs.output[0])
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'x\' LIMIT 21'),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+        self.assertEqual(
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            fingerprint('INSERT INTO t (a, b) VALUES (%s, %s)'),
+        )
+
+
+WEATHER_PAYLOAD = {'current_condition': [{
+    'temp_C': '12', 'weatherDesc': [{'value': 'Cloudy'}], 'humidity': '80',
+    'windspeedKmph': '10', 'FeelsLikeC': '10',
+}]}
+QUOTABLE_PAYLOAD = {'content': 'Stay hungry.', 'author': 'Someone', 'tags': ['life']}
+QUOTES_REST_PAYLOAD = {'contents': {'quotes': [{'quote': 'Carpe diem.', 'author': 'Horace', 'tags': []}]}}
+
+
+class ExternalAPITests(TestCase):
+    """Outbound calls are pooled, cached per key and coalesced"""
+
+    def setUp(self):
+        external.quote_cache.clear()
+        external.weather_cache.clear()
+        for breaker in external.breakers.values():
+            breaker.reset()
+        self.client = APIClient()
+
+    def stub_settings(self, stub):
+        return override_settings(
+            QUOTABLE_API_URL=f'{stub.url}/quotable',
+            QUOTES_REST_API_URL=f'{stub.url}/qod',
+            WEATHER_API_URL=stub.url + '/weather/{city}',
+        )
+
+    def test_weather_is_cached_per_city(self):
+        routes = {
+            '/weather/London': (200, WEATHER_PAYLOAD, 0),
+            '/weather/New%20York': (200, WEATHER_PAYLOAD, 0),
+        }
+        with StubAPIServer(routes) as stub, self.stub_settings(stub):
+            for city in ('London', 'london', 'New York'):
+                response = self.client.get('/api/external/weather/', {'city': city})
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['temperature'], '12°C')
+        self.assertEqual(stub.hits, {'/weather/London': 1, '/weather/New%20York': 1})
+
+    def test_weather_upstream_error(self):
+        with StubAPIServer({'/weather/London': (500, {}, 0)}) as stub, self.stub_settings(stub), \
+                self.assertLogs('api.external'):
+            response = self.client.get('/api/external/weather/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['error'], 'Failed to fetch weather data')
+
+    @override_settings(CIRCUIT_BREAKER_MIN_CALLS=3, CIRCUIT_BREAKER_FAILURE_RATE=0.5)
+    def test_unknown_cities_leave_the_circuit_closed(self):
+        routes = {'/weather/London': (200, WEATHER_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub):
+            for i in range(5):
+                response = self.client.get('/api/external/weather/', {'city': f'Nowhere {i}'})
+                self.assertEqual(response.status_code, 503)
+            response = self.client.get('/api/external/weather/', {'city': 'London'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(external.breakers['wttr'].state, 'closed')
+
+    def test_concurrent_misses_are_coalesced(self):
+        results = []
+        with StubAPIServer({'/weather/Paris': (200, WEATHER_PAYLOAD, 0.2)}) as stub, \
+                self.stub_settings(stub):
+            threads = [
+                threading.Thread(target=lambda: results.append(external.fetch_weather('Paris')))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(stub.hits, {'/weather/Paris': 1})
+
+    def test_quotes_fall_through_providers(self):
+        routes = {'/quotable': (503, {}, 0), '/qod': (200, QUOTES_REST_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub), self.assertLogs('api.external'):
+            response = self.client.get('/api/external/quotes/')
+            self.client.get('/api/external/quotes/')
+        self.assertEqual(response.data['source'], 'Quote of the Day API')
+        self.assertEqual(response.data['data']['quote'], 'Carpe diem.')
+        # Failures aren't cached; the working provider's answer is
+        self.assertEqual(stub.hits, {'/quotable': 2, '/qod': 1})
+
+    def test_quotes_fallback(self):
+        with StubAPIServer({}) as stub, self.stub_settings(stub), self.assertLogs('api.external'):
+            response = self.client.get('/api/external/quotes/')
+        self.assertEqual(response.data['source'], 'Fallback Quote Collection')
+
+    @override_settings(CIRCUIT_BREAKER_MIN_CALLS=3, CIRCUIT_BREAKER_FAILURE_RATE=0.5)
+    def test_dead_provider_is_skipped(self):
+        routes = {'/quotable': (500, {}, 0), '/qod': (200, QUOTES_REST_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub), self.assertLogs('api.external'):
+            for _ in range(5):
+                response = self.client.get('/api/external/quotes/')
+        self.assertEqual(response.data['source'], 'Quote of the Day API')
+        self.assertEqual(external.breakers['quotable'].state, 'open')
+        self.assertEqual(stub.hits['/quotable'], 3)
+
+    @override_settings(
+        CIRCUIT_BREAKER_MIN_CALLS=2, CIRCUIT_BREAKER_FAILURE_RATE=0.5,
+        CIRCUIT_BREAKER_WINDOW=60, CIRCUIT_BREAKER_RESET_TIMEOUT=30,
+    )
+    def test_circuit_breaker_states(self):
+        now = [0.0]
+        breaker = external.CircuitBreaker('test', clock=lambda: now[0])
+
+        def fail():
+            raise external.UnexpectedResponse('down')
+
+        with self.assertLogs('api.external'):
+            self.assertEqual(breaker.call(lambda: 'ok'), 'ok')
+            with self.assertRaises(external.UnexpectedResponse):
+                breaker.call(fail)
+            # One failure out of two calls reaches the failure rate
+            self.assertEqual(breaker.state, 'open')
+            with self.assertRaises(external.CircuitOpen):
+                breaker.call(lambda: 'ok')
+
+            # Half-open after the reset timeout: a failed trial reopens...
+            now[0] = 31
+            with self.assertRaises(external.UnexpectedResponse):
+                breaker.call(fail)
+            self.assertEqual(breaker.state, 'open')
+
+            # ...and a successful one closes the circuit
+            now[0] = 62
+            self.assertEqual(breaker.call(lambda: 'ok'), 'ok')
+            self.assertEqual(breaker.state, 'closed')
+
+    @override_settings(QUOTES_HEDGED=True)
+    def test_hedged_quotes(self):
+        routes = {'/quotable': (200, QUOTABLE_PAYLOAD, 1), '/qod': (200, QUOTES_REST_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub):
+            started = time.perf_counter()
+            response = self.client.get('/api/external/quotes/')
+            elapsed = time.perf_counter() - started
+            external.quote_cache.pending('quotable').result(timeout=5)
+        self.assertEqual(response.data['source'], 'Quote of the Day API')
+        self.assertLess(elapsed, 0.9)
+
+    def test_stale_while_revalidate(self):
+        now = [0.0]
+        cache_ = external.RefreshingCache(clock=lambda: now[0])
+        values = iter(['first', 'second'])
+        load = lambda: next(values)
+
+        self.assertEqual(cache_.get('key', load, ttl=10, stale_ttl=60), 'first')
+        now[0] = 30
+        # Expired: the stale value is returned while a refresh runs
+        self.assertEqual(cache_.get('key', load, ttl=10, stale_ttl=60), 'first')
+        cache_.pending('key').result(timeout=5)
+        self.assertEqual(cache_.get('key', load, ttl=10, stale_ttl=60), 'second')
+
+        # Too old to serve: callers wait for the load and see its failure
+        now[0] = 200
+
+        def fail():
+            raise ConnectionError('upstream down')
+
+        with self.assertRaises(ConnectionError):
+            cache_.get('key', fail, ttl=10, stale_ttl=60)
+
+
+class AsyncViewTests(TestCase):
+    """The async views answer like their sync counterparts"""
+
+    def setUp(self):
+        cache.clear()
+        external.quote_cache.clear()
+        external.weather_cache.clear()
+        for breaker in external.breakers.values():
+            breaker.reset()
+        project = make_project(budget=Decimal('1234.50'))
+        make_task(project, priority='high', completed=True)
+        make_task(project)
+
+    def stub_settings(self, stub):
+        return override_settings(
+            QUOTABLE_API_URL=f'{stub.url}/quotable',
+            QUOTES_REST_API_URL=f'{stub.url}/qod',
+            WEATHER_API_URL=stub.url + '/weather/{city}',
+        )
+
+    @override_settings(DASHBOARD_CACHE_TTL=30)
+    def test_dashboard(self):
+        expected = self.client.get('/api/dashboard/')
+        cache.clear()
+        response = async_to_sync(self.async_client.get)('/api/async/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        # The metrics middleware sees the queries run by the async ORM
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+
+        cached = async_to_sync(self.async_client.get)('/api/async/dashboard/')
+        self.assertIn('desc="0 queries"', cached['Server-Timing'])
+
+    def test_weather(self):
+        routes = {'/weather/Oslo': (200, WEATHER_PAYLOAD, 0.1)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub):
+            expected = self.client.get('/api/external/weather/', {'city': 'Oslo'})
+            external.weather_cache.clear()
+
+            async def fetch_concurrently():
+                return await asyncio.gather(*[
+                    self.async_client.get('/api/async/external/weather/', {'city': 'Oslo'})
+                    for _ in range(5)
+                ])
+
+            responses = async_to_sync(fetch_concurrently)()
+        for response in responses:
+            self.assertEqual(response.content, expected.content)
+        # One call for the sync request, one shared by the concurrent ones
+        self.assertEqual(stub.hits, {'/weather/Oslo': 2})
+
+    def test_weather_upstream_error(self):
+        with StubAPIServer({'/weather/London': (500, {}, 0)}) as stub, self.stub_settings(stub), \
+                self.assertLogs('api.external'):
+            response = async_to_sync(self.async_client.get)('/api/async/external/weather/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'Failed to fetch weather data')
+
+    def test_weather_invalid_json(self):
+        routes = {'/weather/London': (200, b'<html>Unknown location</html>', 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub), self.assertLogs('api.external'):
+            expected = self.client.get('/api/external/weather/')
+            external.weather_cache.clear()
+            response = async_to_sync(self.async_client.get)('/api/async/external/weather/')
+        self.assertEqual(expected.status_code, 503)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['error'], 'Failed to fetch weather data')
+
+    def test_quotes(self):
+        routes = {'/quotable': (503, {}, 0), '/qod': (200, QUOTES_REST_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub), self.assertLogs('api.external'):
+            response = async_to_sync(self.async_client.get)('/api/async/external/quotes/')
+        self.assertEqual(response.json()['source'], 'Quote of the Day API')
+
+    @override_settings(QUOTES_HEDGED=True)
+    def test_hedged_quotes(self):
+        routes = {'/quotable': (200, QUOTABLE_PAYLOAD, 1), '/qod': (200, QUOTES_REST_PAYLOAD, 0)}
+        with StubAPIServer(routes) as stub, self.stub_settings(stub):
+            started = time.perf_counter()
+            response = async_to_sync(self.async_client.get)('/api/async/external/quotes/')
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.json()['source'], 'Quote of the Day API')
+        self.assertLess(elapsed, 0.9)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class ConditionalRequestTests(TestCase):
+    """ETag / Last-Modified validators let clients revalidate cheaply"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        self.task = make_task(self.project)
+
+    def assertNotModified(self, path, headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        return ctx
+
+    def test_if_none_match(self):
+        paths = [
+            '/api/projects/', '/api/projects/?pagination=cursor', f'/api/projects/{self.project.pk}/',
+            f'/api/projects/{self.project.pk}/?tasks_limit=1', '/api/tasks/', f'/api/tasks/{self.task.pk}/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                with CaptureQueriesContext(connection) as ctx:
+                    self.client.get(path)
+                revalidation = self.assertNotModified(path, {'If-None-Match': response['ETag']})
+                # Validators come from the rows already loaded for the response
+                self.assertEqual(len(revalidation.captured_queries), len(ctx.captured_queries))
+
+    def test_if_modified_since(self):
+        response = self.client.get(f'/api/tasks/{self.task.pk}/')
+        self.assertIn('Last-Modified', response)
+        self.assertNotModified(f'/api/tasks/{self.task.pk}/', {'If-Modified-Since': response['Last-Modified']})
+
+    def test_lists_have_no_last_modified(self):
+        make_task(self.project, name='Second')
+        path = f'/api/tasks/?project={self.project.pk}'
+        response = self.client.get(path)
+        self.assertNotIn('Last-Modified', response)
+        since = http_date(time.time())
+        self.client.delete(f'/api/tasks/{self.task.pk}/')
+        # A date from before the delete doesn't make the list current
+        response = self.client.get(path, headers={'If-Modified-Since': since})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_etag_depends_on_query(self):
+        first = self.client.get('/api/tasks/')
+        second = self.client.get('/api/tasks/?priority=medium')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_task_changes_invalidate_project(self):
+        path = f'/api/projects/{self.project.pk}/'
+        etag = self.client.get(path)['ETag']
+        list_etag = self.client.get('/api/projects/')['ETag']
+
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'completed': True}, format='json')
+        response = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['completed_tasks'], 1)
+        # The list shows the counts, which changed too
+        self.assertNotEqual(self.client.get('/api/projects/')['ETag'], list_etag)
+
+        etag = response['ETag']
+        self.client.delete(f'/api/tasks/{self.task.pk}/')
+        response = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_tasks'], 0)
+
+    def test_bulk_update_touches_tasks(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        response = self.client.patch(
+            '/api/tasks/bulk/', [{'id': self.task.pk, 'priority': 'high'}], format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/tasks/', headers={'If-None-Match': etag}).status_code, 200)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=300)
+class ResponseCacheTests(TestCase):
+    """Project responses are cached until a change touches them"""
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        RESPONSE_CACHE_REQUESTS.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project = make_project()
+            self.other = make_project(title='Mobile App')
+            self.task = make_task(self.project)
+
+    def get(self, path, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path, headers=headers)
+        return response, len(ctx.captured_queries)
+
+    def assertCached(self, path):
+        first, _ = self.get(path)
+        second, queries = self.get(path)
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_hits_and_misses(self):
+        self.assertCached('/api/projects/')
+        self.assertCached(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(RESPONSE_CACHE_REQUESTS.value(view='project-list', result='miss'), 1)
+        self.assertEqual(RESPONSE_CACHE_REQUESTS.value(view='project-list', result='hit'), 1)
+        self.assertIn(
+            'api_response_cache_requests_total{view="project-detail",result="hit"} 1',
+            self.client.get('/api/metrics/').content.decode(),
+        )
+
+    def test_query_parameters_are_normalized(self):
+        first, _ = self.get('/api/projects/?status=planning&page_size=1')
+        second, queries = self.get('/api/projects/?page_size=1&status=planning')
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.content, first.content)
+        _, queries = self.get('/api/projects/?page_size=1&status=completed')
+        self.assertGreater(queries, 0)
+
+    def test_not_modified_from_cache(self):
+        path = f'/api/projects/{self.project.pk}/'
+        etag = self.get(path)[0]['ETag']
+        response, queries = self.get(path, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 0)
+
+    def test_task_change_invalidates_its_project_only(self):
+        detail = f'/api/projects/{self.project.pk}/'
+        other = f'/api/projects/{self.other.pk}/'
+        for path in ('/api/projects/', detail, other):
+            self.get(path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{self.task.pk}/', {'completed': True}, format='json')
+
+        response, queries = self.get(detail)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.json()['completed_tasks'], 1)
+        self.assertGreater(self.get('/api/projects/')[1], 0)
+        self.assertEqual(self.get(other)[1], 0)
+
+    def test_moved_task_invalidates_both_projects(self):
+        other = f'/api/projects/{self.other.pk}/'
+        self.get(f'/api/projects/{self.project.pk}/')
+        self.get(other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/tasks/{self.task.pk}/', {'project': self.other.pk}, format='json')
+
+        self.assertEqual(self.get(f'/api/projects/{self.project.pk}/')[0].json()['total_tasks'], 0)
+        self.assertEqual(self.get(other)[0].json()['total_tasks'], 1)
+
+    def test_bulk_writes_invalidate(self):
+        self.get(f'/api/projects/{self.project.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/api/tasks/bulk/', {'ids': [self.task.pk]}, format='json')
+        self.assertEqual(self.get(f'/api/projects/{self.project.pk}/')[0].json()['total_tasks'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk/', [{'project': self.project.pk, 'name': 'A'}], format='json')
+        self.assertEqual(self.get(f'/api/projects/{self.project.pk}/')[0].json()['total_tasks'], 1)
+
+    @override_settings(API_RESPONSE_CACHE_TTL=0)
+    def test_disabled(self):
+        self.get('/api/projects/')
+        self.assertGreater(self.get('/api/projects/')[1], 0)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?exclude= trim both the response and the loaded columns"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        make_task(self.project, completed=True, description='Long text')
+        make_task(self.project)
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in ctx.captured_queries]
+
+    def test_task_fields(self):
+        data, queries = self.get('/api/tasks/?fields=id,completed')
+        self.assertEqual([set(task) for task in data['results']], [{'id', 'completed'}] * 2)
+        self.assertNotIn('"description"', queries[-1])
+
+    def test_task_exclude(self):
+        data, queries = self.get('/api/tasks/?exclude=description,due_date')
+        self.assertNotIn('description', data['results'][0])
+        self.assertIn('name', data['results'][0])
+        self.assertNotIn('"description"', queries[-1])
+
+    def test_task_retrieve(self):
+        task = Task.objects.first()
+        data, queries = self.get(f'/api/tasks/{task.pk}/?fields=name')
+        self.assertEqual(data, {'name': task.name})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0])
+
+    def test_cursor_pagination(self):
+        data, queries = self.get('/api/tasks/?pagination=cursor&page_size=1&fields=id')
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(len(queries), 1)
+
+    def test_project_list_skips_description(self):
+        data, queries = self.get('/api/projects/')
+        self.assertEqual(data['results'][0]['total_tasks'], 2)
+        self.assertNotIn('"description"', queries[-1])
+
+    def test_project_detail_without_tasks(self):
+        data, queries = self.get(f'/api/projects/{self.project.pk}/?fields=id,status,total_tasks,completed_tasks')
+        self.assertEqual(data, {'id': self.project.pk, 'status': 'planning', 'total_tasks': 2, 'completed_tasks': 1})
+        # No task prefetch, no description column
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"description"', queries[0])
+
+    def test_project_detail_with_tasks(self):
+        data, _ = self.get(f'/api/projects/{self.project.pk}/?exclude=description&tasks_fields=id')
+        self.assertNotIn('description', data)
+        self.assertEqual([set(task) for task in data['tasks']], [{'id'}] * 2)
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/projects/?fields=id,description')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('description', response.json()['fields'])
+        response = self.client.get('/api/tasks/?exclude=nope')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class FastSerializationTests(TestCase):
+    """The values_list() read path renders exactly like the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for i in range(3):
+            project = make_project(
+                title=f'Project {i}', budget=Decimal('1234.5') * (i + 1), status='in_progress',
+                end_date=date(2025, 6, 30) if i else None,
+            )
+            make_task(project, priority='high', completed=True, due_date=date(2025, 3, 1))
+            make_task(project, description='')
+
+    def assertSameContent(self, path):
+        with override_settings(API_FAST_SERIALIZATION=False):
+            expected = self.client.get(path)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_byte_identical(self):
+        paths = [
+            '/api/tasks/', '/api/tasks/?pagination=cursor&page_size=2', '/api/tasks/?fields=id,due_date',
+            '/api/projects/', '/api/projects/?pagination=cursor&page_size=2', '/api/projects/?exclude=budget',
+        ]
+        for path in paths:
+            with self.subTest(path=path), mock.patch.object(
+                RowSerializer, 'serialize', autospec=True, side_effect=RowSerializer.serialize,
+            ) as serialize:
+                self.assertSameContent(path)
+                self.assertEqual(serialize.call_count, 1)
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_time_zone(self):
+        self.assertSameContent('/api/tasks/')
+
+    def test_cursor_follows(self):
+        first = self.client.get('/api/tasks/?pagination=cursor&page_size=4').json()
+        second = self.client.get(first['next']).json()
+        ids = [task['id'] for task in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted(Task.objects.values_list('pk', flat=True)))
+
+    def test_unsupported_serializer(self):
+        self.assertIsNone(RowSerializer.for_serializer(ProjectSerializer()))
+        rows = RowSerializer.for_serializer(ProjectListSerializer())
+        self.assertEqual(rows.columns[:2], ['id', 'title'])
+
+
+class ExportTests(TestCase):
+    """The export endpoints stream every matching row"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project(status='in_progress')
+        other = make_project(title='Mobile App')
+        for i in range(5):
+            make_task(self.project, name=f'Task {i}', completed=i % 2 == 0)
+        make_task(other)
+
+    def export(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    @override_settings(API_EXPORT_CHUNK_SIZE=2)
+    def test_json_array(self):
+        response, content = self.export('/api/tasks/export/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('filename="tasks.json"', response['Content-Disposition'])
+        tasks = json.loads(content)
+        self.assertEqual([task['id'] for task in tasks], sorted(Task.objects.values_list('pk', flat=True)))
+        # Rows render like the list endpoint
+        listed = self.client.get('/api/tasks/?page_size=100').json()['results']
+        self.assertEqual(sorted(tasks, key=lambda task: task['id']), sorted(listed, key=lambda task: task['id']))
+
+    @override_settings(API_EXPORT_CHUNK_SIZE=2)
+    def test_ndjson(self):
+        response, content = self.export(f'/api/tasks/export/?format=ndjson&project={self.project.pk}&completed=true')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = content.decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(json.loads(line)['completed'] for line in lines))
+
+        _, content = self.export('/api/projects/export/', Accept='application/x-ndjson')
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_projects(self):
+        _, content = self.export('/api/projects/export/?status=in_progress&fields=id,total_tasks')
+        self.assertEqual(json.loads(content), [{'id': self.project.pk, 'total_tasks': 5}])
+
+    def test_empty(self):
+        _, content = self.export('/api/projects/export/?status=completed')
+        self.assertEqual(content, b'[]')
+
+    @override_settings(API_FAST_SERIALIZATION=False)
+    def test_without_fast_path(self):
+        _, content = self.export('/api/projects/export/?fields=id,title')
+        self.assertEqual(len(json.loads(content)), 2)
+
+    @override_settings(API_EXPORT_CHUNK_SIZE=2)
+    async def test_asgi_streams_chunks(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await self.async_client.get('/api/tasks/export/?format=ndjson')
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        # Django warns when it has to buffer a synchronous iterator
+        self.assertFalse([warning for warning in caught if 'StreamingHttpResponse' in str(warning.message)])
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(len(b''.join(chunks).splitlines()), 6)
+
+    def test_invalid_fields(self):
+        response = self.client.get('/api/tasks/export/?format=ndjson&fields=nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', json.loads(response.content))
+
+
+class ImportDataTests(TestCase):
+    """CSV/NDJSON imports validate rows, insert in chunks and can resume"""
+
+    PROJECTS_CSV = (
+        'title,description,client_name,budget,status,start_date,end_date\n'
+        'Portal,Customer portal,Acme,1000.50,planning,2025-01-01,\n'
+        'Shop,Online shop,Acme,2000,in_progress,2025-02-01,2025-06-01\n'
+        'Broken,Bad status,Acme,10,unknown,2025-01-01,\n'
+    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def assertStatsConsistent(self):
+        totals = Task.objects.aggregate(**counter_annotations())
+        global_stats = GlobalStats.load()
+        for name, value in totals.items():
+            self.assertEqual(getattr(global_stats, name), value)
+        self.assertEqual(ProjectStats.objects.count(), Project.objects.count())
+
+    def test_projects_csv(self):
+        path = self.write('projects.csv', self.PROJECTS_CSV)
+        rejects = os.path.join(self.tmp.name, 'rejects.ndjson')
+        out, err = StringIO(), StringIO()
+        call_command('import_data', 'projects', path, rejects=rejects, stdout=out, stderr=err)
+
+        self.assertEqual(
+            list(Project.objects.order_by('title').values_list('title', 'budget', 'end_date')),
+            [('Portal', Decimal('1000.50'), None), ('Shop', Decimal('2000.00'), date(2025, 6, 1))],
+        )
+        self.assertIn('Imported 2 projects, rejected 1', out.getvalue())
+        self.assertIn('row 3', err.getvalue())
+        with open(rejects) as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([(row['row'], list(row['errors'])) for row in rejected], [(3, ['status'])])
+        self.assertStatsConsistent()
+
+    def test_tasks_ndjson(self):
+        portal = make_project(title='Portal')
+        make_project(title='Twin')
+        make_project(title='Twin')
+        rows = [
+            {'project': portal.pk, 'name': 'By id', 'priority': 'high', 'completed': True},
+            {'project_title': 'Portal', 'name': 'By title'},
+            {'project_title': 'Twin', 'name': 'Ambiguous'},
+            {'project_title': 'Missing', 'name': 'Unknown project'},
+            {'project': 999999, 'name': 'Unknown id'},
+            {'project': portal.pk},
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\n{not json\n\n'
+        path = self.write('tasks.ndjson', content)
+        call_command('import_data', 'tasks', path, chunk_size=4, stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(sorted(portal.tasks.values_list('name', flat=True)), ['By id', 'By title'])
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.position, checkpoint.inserted, checkpoint.rejected), (7, 2, 5))
+        self.assertEqual(ProjectStats.objects.get(project=portal).completed_tasks, 1)
+        self.assertStatsConsistent()
+
+    def test_resume_after_failure(self):
+        project = make_project()
+        path = self.write('tasks.csv', 'project,name\n' + ''.join(f'{project.pk},Task {i}\n' for i in range(5)))
+        save = Importer.save
+        calls = []
+
+        def failing_save(importer, instances):
+            calls.append(len(instances))
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            save(importer, instances)
+
+        with mock.patch.object(Importer, 'save', failing_save), self.assertRaises(RuntimeError):
+            call_command('import_data', 'tasks', path, chunk_size=2, stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 2)
+
+        out = StringIO()
+        call_command('import_data', 'tasks', path, chunk_size=2, stdout=out)
+        self.assertIn('Skipped 2 rows', out.getvalue())
+        self.assertEqual(sorted(Task.objects.values_list('name', flat=True)), [f'Task {i}' for i in range(5)])
+
+        # Everything is recorded: a rerun imports nothing, --restart everything
+        call_command('import_data', 'tasks', path, stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 5)
+        call_command('import_data', 'tasks', path, restart=True, stdout=StringIO())
+        self.assertEqual(Task.objects.count(), 10)
+        self.assertStatsConsistent()
+
+    def test_upload_endpoint(self):
+        upload = SimpleUploadedFile('projects.csv', self.PROJECTS_CSV.encode(), content_type='text/csv')
+        response = self.client.post('/api/projects/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 2)
+        self.assertEqual(response.json()['rejections'][0]['row'], 3)
+
+        project = Project.objects.get(title='Portal')
+        body = f'{{"project": {project.pk}, "name": "A"}}\n{{"project_title": "Shop", "name": "B"}}\n'
+        response = self.client.post(
+            '/api/tasks/import/?checkpoint=upload-1', body, content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.json(), {
+            'skipped': 0, 'processed': 2, 'inserted': 2, 'rejected': 0,
+            'rows_per_s': response.json()['rows_per_s'], 'rejections': [],
+        })
+        # Sending the same body with the same checkpoint imports nothing twice
+        response = self.client.post(
+            '/api/tasks/import/?checkpoint=upload-1', body, content_type='application/x-ndjson',
+        )
+        self.assertEqual(response.json()['skipped'], 2)
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertStatsConsistent()
+
+    def test_unsupported_upload(self):
+        response = self.client.post('/api/tasks/import/', 'x', content_type='application/xml')
+        self.assertEqual(response.status_code, 415)
+
+
+class SearchTests(TestCase):
+    """/api/search/ ranks hits from the full-text index, kept in sync by the database"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.redesign = make_project(title='Website redesign', description='Marketing pages', client_name='Acme')
+        self.app = make_project(title='Mobile app', description='Screens for the website', client_name='Globex')
+        self.mockups = make_task(self.app, name='Website mockups', description='Landing page')
+
+    def search(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def hits(self, **params):
+        return [(hit['type'], hit['id']) for hit in self.search(**params)['results']]
+
+    def test_ranked_hits_across_models(self):
+        data = self.search(q='website')
+        self.assertEqual(data['count'], 3)
+        # Title matches outrank description matches
+        first, second, last = data['results']
+        self.assertEqual(
+            {(first['type'], first['id']), (second['type'], second['id'])},
+            {('project', self.redesign.pk), ('task', self.mockups.pk)},
+        )
+        self.assertEqual(last, {'type': 'project', 'id': self.app.pk, 'title': 'Mobile app', 'score': last['score']})
+        task_hit = first if first['type'] == 'task' else second
+        self.assertEqual((task_hit['title'], task_hit['project']), ('Website mockups', self.app.pk))
+        self.assertGreater(data['results'][0]['score'], data['results'][-1]['score'])
+
+    def test_every_word_matches_as_a_prefix(self):
+        self.assertEqual(self.hits(q='web acm'), [('project', self.redesign.pk)])
+        self.assertEqual(self.hits(q='landing, "website"'), [('task', self.mockups.pk)])
+        self.assertEqual(self.hits(q='website nothing'), [])
+
+    def test_type_filter_and_pagination(self):
+        self.assertEqual(self.hits(q='website', type='task'), [('task', self.mockups.pk)])
+        data = self.search(q='website', page_size=2, page=2)
+        self.assertEqual((data['count'], len(data['results'])), (3, 1))
+        self.assertIsNone(data['next'])
+
+        response = self.client.get('/api/search/', {'q': 'website', 'type': 'client'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/search/', {'q': ' ?! '})
+        self.assertEqual(response.json(), {'q': 'Enter at least one word to search for.'})
+
+    def test_index_follows_writes(self):
+        self.redesign.title = 'Brand refresh'
+        self.redesign.save()
+        self.assertEqual(self.hits(q='refresh'), [('project', self.redesign.pk)])
+        self.assertEqual(self.hits(q='redesign'), [])
+
+        # Bulk inserts and updates bypass model signals
+        response = self.client.post(
+            '/api/tasks/bulk/', [{'project': self.redesign.pk, 'name': 'Refresh logo'}], format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.hits(q='refresh')), 2)
+        Task.objects.filter(project=self.redesign).update(name='Logo')
+        self.assertEqual(self.hits(q='refresh'), [('project', self.redesign.pk)])
+
+        self.app.delete()
+        self.assertEqual(self.hits(q='website'), [])
+
+    def test_admin_search_uses_index(self):
+        from .admin import TaskAdmin
+        from django.contrib.admin.sites import site
+
+        admin = TaskAdmin(Task, site)
+        with CaptureQueriesContext(connection) as queries:
+            results, may_have_duplicates = admin.get_search_results(None, Task.objects.all(), 'mock')
+            self.assertEqual(list(results), [self.mockups])
+        self.assertFalse(may_have_duplicates)
+        self.assertIn('MATCH', queries[0]['sql'])
+
+    def test_repair_restores_dropped_triggers(self):
+        index = search.get_index(connection)
+        if not isinstance(index, search.SQLiteIndex):
+            self.skipTest('SQLite triggers only')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER api_task_search_ai')
+        make_task(self.redesign, name='Unindexed chart')
+        self.assertEqual(self.hits(q='chart'), [])
+
+        self.assertTrue(index.repair())
+        self.assertEqual(len(self.hits(q='chart')), 1)
+        self.assertFalse(index.repair())
+
+
+class RendererTests(TestCase):
+    """The orjson renderer and parser are drop-in replacements for DRF's JSON ones"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        make_task(self.project, name='Café\u2028mockups')
+
+    def test_output_matches_json_renderer(self):
+        when = timezone.make_aware(datetime(2025, 3, 4, 5, 6, 7, 891234), dt_timezone.utc)
+        data = ReturnDict({
+            'text': 'naïve\u2028"quoted"\u2029',
+            'lazy': gettext_lazy('Not found.'),
+            'error': ErrorDetail('Invalid.', code='invalid'),
+            'decimal': Decimal('12.50'),
+            'datetime': when,
+            'date': date(2025, 3, 4),
+            'time': when.time(),
+            'uuid': uuid.UUID(int=1),
+            'keys': {1: 'int key'},
+            'items': ({'nested': [1, 2.5, None, True]},),
+            'huge': 2 ** 70,
+        }, serializer=None)
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        self.assertEqual(renderers.dumps(data), expected)
+
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(data, indented), JSONRenderer().render(data, indented),
+        )
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_floats(self):
+        data = [1e16, 1.5e-7, 1.23e17, 0.1, 2.5]
+        self.assertEqual(renderers.dumps(data), b'[1e16,1.5e-7,1.23e17,0.1,2.5]')
+        self.assertEqual(json.loads(renderers.dumps(data)), json.loads(JSONRenderer().render(data)))
+        # Written as null, where JSONRenderer refuses them
+        self.assertEqual(renderers.dumps([math.nan, math.inf, -math.inf]), b'[null,null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([math.nan])
+
+    def test_api_responses_match_json_renderer(self):
+        for url in ('/api/projects/', f'/api/projects/{self.project.pk}/', '/api/tasks/'):
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_parser(self):
+        parse = lambda body: FastJSONParser().parse(BytesIO(body), parser_context={})  # noqa: E731
+        self.assertEqual(parse('{"a": [1, "é", 2e3], "b": 123456789012345678901234}'.encode()), {
+            'a': [1, 'é', 2000.0], 'b': 123456789012345678901234,
+        })
+        for body in (b'{"a": }', b'[NaN]'):
+            with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                parse(body)
+
+        response = self.client.post(
+            '/api/tasks/', '{"project": %d, "name": "Naïve"}' % self.project.pk, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/tasks/', '{"project": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', response.json()['detail'])
+
+    @skipUnless(renderers.msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        response = self.client.get('/api/tasks/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            renderers.msgpack.unpackb(response.content),
+            json.loads(self.client.get('/api/tasks/').content),
+        )
+
+        body = renderers.msgpack.packb({'project': self.project.pk, 'name': 'Packed'})
+        response = self.client.post('/api/tasks/', body, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post('/api/tasks/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+    @skipIf(renderers.msgpack, 'msgpack is installed')
+    def test_msgpack_needs_package(self):
+        response = self.client.get('/api/tasks/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 406)
+
+    def test_renderer_benchmark(self):
+        results = benchmarks.run_renderer_benchmark(rows=5, iterations=1)
+        self.assertEqual(set(results), {'tasks_list', 'project_details'})
+        self.assertEqual(results['tasks_list']['json']['bytes'], len(
+            JSONRenderer().render(benchmarks.RENDERER_TARGETS['tasks_list'](5))
+        ))
+
+
+@override_settings(API_RESPONSE_CACHE_TTL=0)
+class CompressionTests(TestCase):
+    """API responses are compressed with the best encoding the client accepts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        for i in range(30):
+            make_task(self.project, name=f'Task {i}', description='Write the copy for the landing page')
+
+    def test_choose_encoding(self):
+        self.assertEqual(compression.choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(compression.choose_encoding('deflate, GZIP;q=0.5'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0, identity'))
+        self.assertIsNone(compression.choose_encoding(''))
+        self.assertEqual(compression.choose_encoding('*'), next(iter(compression.CODECS)))
+        self.assertEqual(compression.choose_encoding('unknown, *;q=0.1, gzip;q=0'), next(
+            (name for name in compression.CODECS if name != 'gzip'), None,
+        ))
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get('/api/tasks/?page_size=30')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get('/api/tasks/?page_size=30', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        # The ETag is weakened but still validates the client's copy
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        not_modified = self.client.get(
+            '/api/tasks/?page_size=30', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.client.get('/api/tasks/?page_size=1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        with override_settings(API_COMPRESSION_ENABLED=False):
+            response = self.client.get('/api/tasks/?page_size=30', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_responses(self):
+        plain = b''.join(self.client.get('/api/tasks/export/?format=ndjson').streaming_content)
+        response = self.client.get('/api/tasks/export/?format=ndjson', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    @skipUnless(compression.brotli, 'Brotli is not installed')
+    def test_brotli(self):
+        plain = self.client.get('/api/tasks/?page_size=30')
+        response = self.client.get('/api/tasks/?page_size=30', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    @override_settings(API_RESPONSE_CACHE_TTL=300)
+    def test_compressed_bodies_are_cached_with_the_response(self):
+        cache.clear()
+        codec = compression.CODECS['gzip']
+        with mock.patch.object(codec, 'compress', wraps=codec.compress) as compress:
+            first = self.client.get(f'/api/projects/{self.project.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+            second = self.client.get(f'/api/projects/{self.project.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second.content, first.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.title = 'Renamed ' * 10
+            self.project.save()
+        with mock.patch.object(codec, 'compress', wraps=codec.compress) as compress:
+            third = self.client.get(f'/api/projects/{self.project.pk}/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compress.call_count, 1)
+        self.assertIn(b'Renamed', gzip.decompress(third.content))
+
+
+# The default database stands in for the replica; DB_READS tells which role
+# served each read. Not a TestCase: its transaction would pin every read to
+# the primary.
+@override_settings(API_DB_REPLICAS=['default'], API_RESPONSE_CACHE_TTL=0)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Opted-in reads go to a replica unless the client or request wrote"""
+
+    def setUp(self):
+        DB_READS.clear()
+        self.client = APIClient()
+        self.project = make_project()
+        make_task(self.project)
+        GlobalStats.load()
+
+    def reads(self):
+        return DB_READS.value(target='replica'), DB_READS.value(target='primary')
+
+    @override_settings(DASHBOARD_CACHE_TTL=0)
+    def test_reads_use_replicas(self):
+        for url in ('/api/tasks/', f'/api/projects/{self.project.pk}/', '/api/dashboard/'):
+            DB_READS.clear()
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            replica, primary = self.reads()
+            self.assertGreater(replica, 0, url)
+            self.assertEqual(primary, 0, url)
+            self.assertNotIn(settings.API_REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_exports_read_from_replicas(self):
+        for url in ('/api/tasks/export/', '/api/projects/export/'):
+            DB_READS.clear()
+            response = self.client.get(url)
+            replica, primary = self.reads()
+            # The rows are read as the body streams, without the request's
+            # routing: the queryset must already be bound to the replica
+            with mock.patch.object(ReplicaRouter, 'db_for_read', return_value=None) as db_for_read:
+                rows = json.loads(b''.join(response.streaming_content))
+            db_for_read.assert_not_called()
+            self.assertEqual(len(rows), 1, url)
+            self.assertGreater(replica, 0, url)
+            self.assertEqual(primary, 0, url)
+
+    def test_other_views_use_primary(self):
+        self.client.get('/api/search/?q=website')
+        self.client.get('/api/tasks/bulk/')
+        self.assertEqual(self.reads(), (0, 0))
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.client.post('/api/tasks/', {'project': self.project.pk, 'name': 'New'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        cookie = response.cookies[settings.API_REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.API_REPLICA_PIN_SECONDS)
+
+        # APIClient sends the cookie back
+        DB_READS.clear()
+        self.assertEqual(self.client.get('/api/tasks/').json()['count'], 2)
+        replica, primary = self.reads()
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    def test_response_cache_misses_read_from_primary(self):
+        with override_settings(API_RESPONSE_CACHE_TTL=300):
+            cache.clear()
+            self.client.get('/api/projects/')
+            replica, primary = self.reads()
+            self.assertEqual(replica, 0)
+            self.assertGreater(primary, 0)
+
+            DB_READS.clear()
+            self.client.get('/api/projects/')
+            self.assertEqual(self.reads(), (0, 0))
+
+    @override_settings(DASHBOARD_CACHE_TTL=30)
+    def test_dashboard_cache_misses_read_from_primary(self):
+        cache.clear()
+        for url in ('/api/dashboard/', '/api/async/dashboard/'):
+            DB_READS.clear()
+            self.client.get(url)
+            replica, primary = self.reads()
+            self.assertEqual(replica, 0, url)
+            self.assertGreater(primary, 0, url)
+
+            DB_READS.clear()
+            self.client.get(url)
+            self.assertEqual(self.reads(), (0, 0), url)
+            cache.clear()
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Task))
+        state = RoutingState()
+        token = replicas._state.set(state)
+        try:
+            self.assertIsNone(router.db_for_read(Task))
+            replicas.allow_replica_reads()
+            with override_settings(API_DB_REPLICAS=['replica_1', 'replica_2']):
+                first = router.db_for_read(Task)
+                self.assertIn(first, ['replica_1', 'replica_2'])
+                self.assertEqual({router.db_for_read(Project) for _ in range(10)}, {first})
+                with transaction.atomic():
+                    self.assertEqual(router.db_for_read(Task), 'default')
+                self.assertEqual(router.db_for_write(Task), 'default')
+                self.assertEqual(router.db_for_read(Task), 'default')
+            with override_settings(API_DB_REPLICAS=[]):
+                self.assertIsNone(router.db_for_read(Task))
+        finally:
+            replicas._state.reset(token)
+
+    @override_settings(API_DB_REPLICAS=[])
+    def test_no_pinning_without_replicas(self):
+        response = self.client.post('/api/tasks/', {'project': self.project.pk, 'name': 'New'}, format='json')
+        self.assertNotIn(settings.API_REPLICA_PIN_COOKIE, response.cookies)
+
+
+@override_settings(API_SYNC_SETTLE_SECONDS=0)
+class ChangeLogTests(TestCase):
+    """?updated_since= returns the changes past a change log cursor"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = make_project()
+        self.other = make_project(title='Mobile App')
+        self.tasks = [make_task(self.project, name=f'Task {i}') for i in range(3)]
+
+    def sync(self, path, cursor, **params):
+        response = self.client.get(path, {'updated_since': cursor, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_sync_from_zero_then_from_cursor(self):
+        data = self.sync('/api/tasks/', 0)
+        self.assertEqual([task['id'] for task in data['changed']], [task.pk for task in self.tasks])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+        # Rows render like the list
+        listed = self.client.get('/api/tasks/').json()['results']
+        self.assertEqual(data['changed'], sorted(listed, key=lambda task: task['id']))
+
+        data = self.sync('/api/tasks/', data['cursor'])
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(data['deleted'], [])
+
+    def test_changes_since_cursor(self):
+        cursor = self.sync('/api/tasks/', 0)['cursor']
+        project_cursor = self.sync('/api/projects/', 0)['cursor']
+        task = self.tasks[1]
+        task.completed = True
+        task.save()
+
+        with self.assertNumQueries(2):
+            data = self.sync('/api/tasks/', cursor, fields='id,completed')
+        self.assertEqual(data['changed'], [{'id': task.pk, 'completed': True}])
+        self.assertGreater(data['cursor'], cursor)
+        # The project's task count didn't change
+        self.assertEqual(self.sync('/api/projects/', project_cursor)['changed'], [])
+
+        task.project = self.other
+        task.save()
+        data = self.sync('/api/projects/', project_cursor, fields='id,total_tasks')
+        self.assertEqual(data['changed'], [
+            {'id': self.project.pk, 'total_tasks': 2},
+            {'id': self.other.pk, 'total_tasks': 1},
+        ])
+
+    def test_deletes_are_tombstones(self):
+        task_cursor = self.sync('/api/tasks/', 0)['cursor']
+        project_cursor = self.sync('/api/projects/', 0)['cursor']
+        self.tasks[0].save()
+        response = self.client.delete(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+        data = self.sync('/api/tasks/', task_cursor)
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(sorted(data['deleted']), [task.pk for task in self.tasks])
+        data = self.sync('/api/projects/', project_cursor)
+        self.assertEqual(data['deleted'], [self.project.pk])
+        self.assertEqual(data['changed'], [])
+
+    def test_project_delete_logs_tasks_at_once(self):
+        tasks = [*self.tasks, *(make_task(self.project, name=f'More {i}') for i in range(20))]
+        task_cursor = self.sync('/api/tasks/', 0)['cursor']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 204)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "api_changelogentry"')]
+        # The tasks' tombstones, then the project's
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(sorted(self.sync('/api/tasks/', task_cursor)['deleted']), sorted(task.pk for task in tasks))
+
+    def test_bulk_writes_are_logged(self):
+        cursor = self.sync('/api/tasks/', 0)['cursor']
+        response = self.client.post('/api/tasks/bulk/', [
+            {'project': self.other.pk, 'name': 'Bulk 1'},
+            {'project': self.other.pk, 'name': 'Bulk 2'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        created = [task['id'] for task in response.json()]
+        response = self.client.delete('/api/tasks/bulk/', {'ids': [self.tasks[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        data = self.sync('/api/tasks/', cursor)
+        self.assertEqual([task['id'] for task in data['changed']], created)
+        self.assertEqual(data['deleted'], [self.tasks[0].pk])
+
+    def test_cleared_data_is_deleted(self):
+        cursor = self.sync('/api/projects/', 0)['cursor']
+        clear_data()
+        data = self.sync('/api/projects/', cursor)
+        self.assertEqual(sorted(data['deleted']), sorted([self.project.pk, self.other.pk]))
+
+    @override_settings(API_SYNC_BATCH_SIZE=5)
+    def test_bulk_loads_log_resync_markers(self):
+        task_cursor = self.sync('/api/tasks/', 0)['cursor']
+        project_cursor = self.sync('/api/projects/', 0)['cursor']
+        logged = ChangeLogEntry.objects.count()
+        seed_data(2, 4, seed=1)
+        # One marker per list instead of an entry per row
+        self.assertEqual(ChangeLogEntry.objects.count(), logged + 2)
+        self.tasks[0].save()
+
+        data = self.sync('/api/tasks/', task_cursor)
+        self.assertTrue(data['resync'])
+        # Only the changes logged after the marker
+        self.assertEqual([task['id'] for task in data['changed']], [self.tasks[0].pk])
+        self.assertFalse(self.sync('/api/tasks/', data['cursor'])['resync'])
+        self.assertTrue(self.sync('/api/projects/', project_cursor)['resync'])
+
+    @override_settings(API_SYNC_BATCH_SIZE=2)
+    def test_batches(self):
+        data = self.sync('/api/tasks/', 0)
+        self.assertTrue(data['has_more'])
+        self.assertEqual(len(data['changed']), 2)
+        data = self.sync('/api/tasks/', data['cursor'])
+        self.assertEqual([task['id'] for task in data['changed']], [self.tasks[2].pk])
+        self.assertFalse(data['has_more'])
+
+    @override_settings(API_SYNC_SETTLE_SECONDS=60, API_SYNC_BATCH_SIZE=2)
+    def test_cursor_waits_for_recent_entries(self):
+        data = self.sync('/api/tasks/', 0)
+        self.assertEqual(len(data['changed']), 2)
+        self.assertEqual(data['cursor'], 0)
+        self.assertFalse(data['has_more'])
+
+        ChangeLogEntry.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        data = self.sync('/api/tasks/', 0)
+        self.assertGreater(data['cursor'], 0)
+        self.assertTrue(data['has_more'])
+
+    def test_compaction_keeps_latest_entries(self):
+        cursor = self.sync('/api/tasks/', 0)['cursor']
+        for task in self.tasks:
+            task.save()
+        deleted_pk = self.tasks[0].pk
+        self.tasks[0].delete()
+        before = self.sync('/api/tasks/', cursor)
+
+        deleted = changelog.compact_change_log()
+        self.assertGreater(deleted, 0)
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(kind='task').count(), len(self.tasks),
+        )
+        self.assertEqual(self.sync('/api/tasks/', cursor), before)
+        self.assertEqual(self.sync('/api/tasks/', 0)['deleted'], [deleted_pk])
+
+    def test_invalid_cursor(self):
+        for value in ('-1', 'abc'):
+            response = self.client.get('/api/projects/', {'updated_since': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('updated_since', response.json())
+
+
+@override_settings(API_EVENTS_DASHBOARD_INTERVAL=0)
+class EventStreamTests(TestCase):
+    """/api/events/ streams the committed writes to its subscribers"""
+
+    def setUp(self):
+        self.project = make_project()
+        self.other = make_project(title='Mobile App')
+        self.task = make_task(self.project)
+        self.other_task = make_task(self.other)
+
+    def tearDown(self):
+        events.broker._subscriptions.clear()
+
+    async def open_stream(self, path='/api/events/', **headers):
+        response = await self.async_client.get(path, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return response.streaming_content
+
+    async def read_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if line)
+        return fields['event'], json.loads(fields['data'])
+
+    def commit(self, write):
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+
+    def complete_task(self, task):
+        task.completed = True
+        task.save()
+
+    async def test_project_subscription(self):
+        stream = await self.open_stream(f'/api/events/?project={self.project.pk}&dashboard=false')
+        await sync_to_async(self.commit)(lambda: self.complete_task(self.other_task))
+        await sync_to_async(self.commit)(lambda: self.complete_task(self.task))
+        event, data = await self.read_event(stream)
+        self.assertEqual(event, 'task.completed')
+        self.assertEqual((data['id'], data['project'], data['completed']), (self.task.pk, self.project.pk, True))
+
+        def change_status():
+            project = Project.objects.get(pk=self.project.pk)
+            project.status = 'in_progress'
+            project.save()
+            project.title = 'Renamed'
+            project.save()
+        await sync_to_async(self.commit)(change_status)
+        event, data = await self.read_event(stream)
+        self.assertEqual(event, 'project.status_changed')
+        self.assertEqual((data['status'], data['previous_status']), ('in_progress', 'planning'))
+        event, _ = await self.read_event(stream)
+        self.assertEqual(event, 'project.updated')
+
+        # A task moving in from another project
+        def move_task():
+            self.other_task.project = self.project
+            self.other_task.save()
+        await sync_to_async(self.commit)(move_task)
+        event, data = await self.read_event(stream)
+        self.assertEqual((event, data['id']), ('task.updated', self.other_task.pk))
+
+        task_pk = self.task.pk
+        await sync_to_async(self.commit)(self.task.delete)
+        event, data = await self.read_event(stream)
+        self.assertEqual((event, data), ('task.deleted', {'id': task_pk, 'project': self.project.pk}))
+        await stream.aclose()
+
+    @override_settings(API_EVENTS_DASHBOARD_INTERVAL=0.3)
+    async def test_dashboard_updates_are_coalesced(self):
+        calls = []
+
+        def dashboard():
+            calls.append(1)
+            return {'tasks': {'total_tasks': len(calls)}}
+
+        stream = await self.open_stream()
+        with mock.patch.object(events, 'get_dashboard_stats', dashboard):
+            def create_tasks():
+                for i in range(3):
+                    with self.captureOnCommitCallbacks(execute=True):
+                        make_task(self.other, name=f'New {i}')
+            await sync_to_async(create_tasks)()
+            received = [await self.read_event(stream) for _ in range(4)]
+        self.assertEqual([event for event, _ in received], ['task.created'] * 3 + ['dashboard'])
+        self.assertEqual(received[-1][1], {'tasks': {'total_tasks': 1}})
+        self.assertEqual(len(calls), 1)
+        await stream.aclose()
+
+    async def test_bulk_writes(self):
+        stream = await self.open_stream(f'/api/events/?project={self.other.pk}&dashboard=false')
+
+        def bulk_create():
+            response = APIClient().post('/api/tasks/bulk/', [{'project': self.other.pk, 'name': 'Bulk'}], format='json')
+            self.assertEqual(response.status_code, 201)
+        await sync_to_async(self.commit)(bulk_create)
+        self.assertEqual(await self.read_event(stream), ('tasks.changed', {'project': self.other.pk}))
+        await stream.aclose()
+
+    @override_settings(API_EVENTS_QUEUE_SIZE=2)
+    async def test_slow_clients_are_told_to_resync(self):
+        stream = await self.open_stream('/api/events/?dashboard=false')
+        events.broker.publish([events.Event('task.updated', {'id': i}) for i in range(5)])
+        self.assertEqual(await self.read_event(stream), ('resync', {}))
+        events.broker.publish([events.Event('task.updated', {'id': 5})])
+        self.assertEqual(await self.read_event(stream), ('task.updated', {'id': 5}))
+        await stream.aclose()
+
+    async def test_reconnecting_clients_resync(self):
+        stream = await self.open_stream(**{'Last-Event-ID': '41'})
+        self.assertEqual(await self.read_event(stream), ('resync', {}))
+        await stream.aclose()
+
+    @override_settings(API_EVENTS_HEARTBEAT_SECONDS=0)
+    async def test_heartbeat(self):
+        stream = await self.open_stream()
+        self.assertEqual(await asyncio.wait_for(anext(stream), 1), b': keep-alive\n\n')
+        await stream.aclose()
+
+    @override_settings(API_EVENTS_MAX_SUBSCRIBERS=1)
+    async def test_subscriber_limit(self):
+        stream = await self.open_stream()
+        response = await self.async_client.get('/api/events/')
+        self.assertEqual(response.status_code, 503)
+        await stream.aclose()
+
+    async def test_unread_stream_unsubscribes_when_closed(self):
+        response = await self.async_client.get('/api/events/')
+        self.assertTrue(events.broker.has_subscribers())
+        await sync_to_async(response.close)()
+        self.assertFalse(events.broker.has_subscribers())
+
+    async def test_invalid_project(self):
+        response = await self.async_client.get('/api/events/?project=abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_needs_asgi(self):
+        response = self.client.get('/api/events/')
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(events.broker.has_subscribers())
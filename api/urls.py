@@ -13,6 +13,14 @@ urlpatterns = [
     
     # Custom endpoints
     path('dashboard/', views.dashboard_stats, name='dashboard-stats'),
+    path('search/', views.search, name='search'),
+    path('metrics/', views.metrics, name='metrics'),
     path('external/quotes/', views.fetch_external_data, name='external-quotes'),
     path('external/weather/', views.weather_data, name='weather-data'),
+    
+    # Async counterparts, for ASGI deployments
+    path('async/dashboard/', views.dashboard_stats_async, name='dashboard-stats-async'),
+    path('async/external/quotes/', views.fetch_external_data_async, name='external-quotes-async'),
+    path('async/external/weather/', views.weather_data_async, name='weather-data-async'),
+    path('events/', views.events, name='events'),
 ]
@@ -1,9 +1,14 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Avg, Q
-from django.utils import timezone
-from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.db.models import Prefetch, prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+import httpx
 import requests
 import random
 import urllib3
@@ -11,57 +16,200 @@ import urllib3
 # Suppress SSL warnings for demo purposes (not recommended for production)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+from .changelog import ChangeSyncMixin
+from .conditional import ConditionalGetMixin, latest
+from .dashboard import aget_dashboard_stats, get_dashboard_stats
+from .events import EventStream, TooManySubscribers, broker as event_broker
+from .external import UnexpectedResponse, afetch_quote, afetch_weather, fetch_quote, fetch_weather
+from .export import ExportMixin
+from .fast_serializers import FastListMixin
+from .fieldsets import SparseFieldsetMixin
+from .importing import ImportMixin
+from .metrics import REGISTRY
 from .models import Project, Task
+from .pagination import PaginationModeMixin, StandardPagination
+from .renderers import FastJSONRenderer
+from .replicas import ReplicaReadsMixin, replica_reads
+from .response_cache import ResponseCacheMixin
+from .search import KINDS as SEARCH_KINDS, get_index, parse_terms
 from .serializers import ProjectSerializer, ProjectListSerializer, TaskSerializer
+from .stats import defer_stats_updates
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ReplicaReadsMixin, ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetMixin,
+                     ExportMixin, ImportMixin, ChangeSyncMixin, FastListMixin, PaginationModeMixin,
+                     viewsets.ModelViewSet):
     """
     A viewset for viewing and editing project instances.
     Provides CRUD operations: list, create, retrieve, update, delete
     """
     queryset = Project.objects.all()
+    import_kind = 'projects'
+    change_kind = 'project'
+    
+    # Actions rendering projects with ProjectListSerializer
+    list_actions = ('list', 'export')
+    # Actions whose response embeds the project's tasks
+    detail_actions = ('retrieve', 'update', 'partial_update')
+    # Attribute holding the tasks prefetched under ?tasks_limit=
+    limited_tasks_attr = 'limited_tasks'
+    # The list's validators also read the annotated task counts
+    row_extra_columns = FastListMixin.row_extra_columns + (
+        'total_tasks', 'completed_tasks', 'stats_updated_at',
+    )
+    
+    def get_queryset(self):
+        """
+        Lists carry task counts annotated from ProjectStats; detail responses
+        also fetch the tasks with a single prefetch query, unless the client
+        left them out of ?fields=.
+        """
+        queryset = super().get_queryset()
+        if self.action in self.list_actions:
+            return queryset.with_task_counts()
+        if self.action in self.detail_actions:
+            # The counts come from ProjectStats even though the full task list
+            # is prefetched, so their timestamp feeds Last-Modified
+            queryset = queryset.with_task_counts()
+            if self.embeds_tasks():
+                queryset = queryset.prefetch_related(self.get_tasks_prefetch())
+        return queryset
+    
+    def embeds_tasks(self):
+        """True unless ?fields= / ?exclude= leave the tasks out"""
+        fields = self.get_sparse_fields()
+        return fields is None or 'tasks' in fields
+    
+    def get_tasks_limit(self):
+        """Parse the optional ?tasks_limit= parameter"""
+        value = self.request.query_params.get('tasks_limit')
+        if value in (None, ''):
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise ValidationError({'tasks_limit': 'Must be a non-negative integer.'})
+        return limit
+    
+    def get_tasks_fields(self):
+        """Parse the optional ?tasks_fields= parameter (comma separated)"""
+        value = self.request.query_params.get('tasks_fields')
+        if value is None:
+            return None
+        fields = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(fields) - set(TaskSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({
+                'tasks_fields': f'Unknown task fields: {", ".join(sorted(unknown))}'
+            })
+        return fields
+    
+    def get_tasks_prefetch(self):
+        """Build the Prefetch used to load the tasks nested in detail responses"""
+        tasks = Task.objects.all()
+        fields = self.get_tasks_fields()
+        if fields is not None:
+            # The foreign key is needed to attach tasks to their project,
+            # updated_at for the response validators
+            tasks = tasks.only('project', 'updated_at', *fields)
+        limit = self.get_tasks_limit()
+        if limit is not None:
+            # Django only supports sliced prefetches stored with to_attr
+            return Prefetch('tasks', queryset=tasks[:limit], to_attr=self.limited_tasks_attr)
+        return Prefetch('tasks', queryset=tasks)
+    
+    def get_object_version(self, project):
+        """
+        A project's representation changes with the project, its task counts
+        and, for detail responses, the embedded tasks
+        """
+        tasks = []
+        if self.action in self.detail_actions and self.embeds_tasks():
+            if self.get_tasks_limit() is not None:
+                tasks = getattr(project, self.limited_tasks_attr)
+            else:
+                tasks = project.tasks.all()
+        version = (
+            project.pk, project.updated_at, project.total_tasks, project.completed_tasks,
+            [(task.pk, task.updated_at) for task in tasks],
+        )
+        last_modified = latest(
+            project.updated_at, project.stats_updated_at, *(task.updated_at for task in tasks)
+        )
+        return version, last_modified
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.detail_actions:
+            context['tasks_fields'] = self.get_tasks_fields()
+            if self.get_tasks_limit() is not None:
+                context['tasks_source'] = self.limited_tasks_attr
+        return context
     
     def get_serializer_class(self):
         """Use different serializers for list and detail views"""
-        if self.action == 'list':
+        if self.action in self.list_actions:
             return ProjectListSerializer
         return ProjectSerializer
     
-    def list(self, request):
-        """List all projects with optional filtering"""
-        queryset = self.get_queryset()
-        
+    def filter_queryset(self, queryset):
+        """Apply the optional status and client filters"""
         # Filter by status if provided
-        status_filter = request.query_params.get('status', None)
+        status_filter = self.request.query_params.get('status', None)
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         
         # Filter by client name if provided
-        client_filter = request.query_params.get('client', None)
+        client_filter = self.request.query_params.get('client', None)
         if client_filter:
             queryset = queryset.filter(client_name__icontains=client_filter)
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'count': queryset.count(),
-            'results': serializer.data
-        })
+        return queryset
+    
+    def list(self, request):
+        """List projects with optional filtering, one page at a time"""
+        cursor = self.get_sync_cursor()
+        if cursor is not None:
+            return self.sync_list(cursor)
+        
+        cached = self.get_cached_response()
+        if cached is not None:
+            return cached
+        
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            not_modified = self.check_list_preconditions(page)
+            if not_modified:
+                return not_modified
+            return self.cache_response(self.get_paginated_response(self.serialize_list(page)))
+        
+        return Response(self.serialize_list(queryset))
     
     def create(self, request):
         """Create a new project"""
         serializer = ProjectSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            project = serializer.save()
+            prefetch_related_objects([project], 'tasks')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def retrieve(self, request, pk=None):
         """Retrieve a specific project with all its tasks"""
+        cached = self.get_cached_response()
+        if cached is not None:
+            return cached
+        
         try:
             project = self.get_queryset().get(pk=pk)
-            serializer = ProjectSerializer(project)
-            return Response(serializer.data)
+            not_modified = self.check_preconditions(*self.get_object_version(project))
+            if not_modified:
+                return not_modified
+            serializer = self.get_serializer(project)
+            return self.cache_response(Response(serializer.data))
         except Project.DoesNotExist:
             return Response(
                 {'error': 'Project not found'}, 
@@ -72,7 +220,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """Update a project (supports both PUT and PATCH)"""
         try:
             project = self.get_queryset().get(pk=pk)
-            serializer = ProjectSerializer(project, data=request.data, partial=partial)
+            serializer = self.get_serializer(project, data=request.data, partial=partial)
             if serializer.is_valid():
                 serializer.save()
                 return Response(serializer.data)
@@ -99,90 +247,267 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ReplicaReadsMixin, ConditionalGetMixin, SparseFieldsetMixin, ExportMixin, ImportMixin,
+                  ChangeSyncMixin, FastListMixin, PaginationModeMixin, viewsets.ModelViewSet):
     """
     A viewset for viewing and editing task instances.
-    Provides CRUD operations for tasks
+    Provides CRUD operations for tasks, plus bulk create/update/delete
     """
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
+    import_kind = 'tasks'
+    change_kind = 'task'
     
-    def list(self, request):
-        """List all tasks with optional filtering"""
-        queryset = self.get_queryset()
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create (POST), update (PATCH) or delete (DELETE) many tasks at once.
+        POST and PATCH take a list of tasks (PATCH items need an "id"),
+        DELETE takes {"ids": [...]}. Everything is written in one transaction,
+        and nothing is written if any item is invalid.
+        """
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+        
+        max_items = settings.TASK_BULK_MAX_ITEMS
+        if request.method == 'PATCH':
+            ids = []
+            if isinstance(request.data, list):
+                for item in request.data:
+                    try:
+                        ids.append(int(item.get('id')))
+                    except (AttributeError, TypeError, ValueError):
+                        pass
+            instances = Task.objects.in_bulk(ids[:max_items + 1])
+            serializer = self.get_serializer(
+                instances, data=request.data, many=True, partial=True, max_length=max_items
+            )
+        else:
+            serializer = self.get_serializer(data=request.data, many=True, max_length=max_items)
+        
+        if not serializer.is_valid():
+            return Response(
+                {'errors': self.format_bulk_errors(serializer.errors)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer.save()
+        response_status = status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+        return Response(serializer.data, status=response_status)
+    
+    def bulk_destroy(self, request):
+        """Delete the tasks listed in {"ids": [...]}"""
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            return Response(
+                {'errors': {'ids': ['Expected a list of task ids.']}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > settings.TASK_BULK_MAX_ITEMS:
+            return Response(
+                {'errors': {'ids': [f'Ensure this field has no more than {settings.TASK_BULK_MAX_ITEMS} elements.']}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
+        pks, errors = {}, []
+        for index, value in enumerate(ids):
+            try:
+                pks[index] = int(value)
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'errors': ['A valid integer is required.']})
+        existing = set(Task.objects.filter(pk__in=pks.values()).values_list('pk', flat=True))
+        errors.extend(
+            {'index': index, 'errors': [f'Task "{pk}" does not exist.']}
+            for index, pk in pks.items()
+            if pk not in existing
+        )
+        if errors:
+            errors.sort(key=lambda error: error['index'])
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Statistics are recomputed once per project instead of once per task
+        with defer_stats_updates():
+            deleted, _ = Task.objects.filter(pk__in=pks.values()).delete()
+        return Response({
+            'deleted': deleted,
+            'message': f'{deleted} tasks deleted successfully'
+        })
+    
+    @staticmethod
+    def format_bulk_errors(errors):
+        """Report list errors per item index, skipping the valid items"""
+        if isinstance(errors, dict):
+            return errors
+        return [
+            {'index': index, 'errors': item_errors}
+            for index, item_errors in enumerate(errors)
+            if item_errors
+        ]
+    
+    def filter_queryset(self, queryset):
+        """Apply the optional project and completion filters"""
         # Filter by project if provided
-        project_id = request.query_params.get('project', None)
+        project_id = self.request.query_params.get('project', None)
         if project_id:
             queryset = queryset.filter(project_id=project_id)
         
         # Filter by completion status
-        completed = request.query_params.get('completed', None)
+        completed = self.request.query_params.get('completed', None)
         if completed is not None:
             queryset = queryset.filter(completed=completed.lower() == 'true')
         
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            'count': queryset.count(),
-            'results': serializer.data
-        })
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a task, or 304 if the client's copy is current"""
+        task = self.get_object()
+        not_modified = self.check_preconditions(*self.get_object_version(task))
+        if not_modified:
+            return not_modified
+        serializer = self.get_serializer(task)
+        return Response(serializer.data)
+    
+    def list(self, request):
+        """List tasks with optional filtering, one page at a time"""
+        cursor = self.get_sync_cursor()
+        if cursor is not None:
+            return self.sync_list(cursor)
+        
+        queryset = self.get_list_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            not_modified = self.check_list_preconditions(page)
+            if not_modified:
+                return not_modified
+            return self.get_paginated_response(self.serialize_list(page))
+        
+        return Response(self.serialize_list(queryset))
 
 
 @api_view(['GET'])
+@replica_reads
 def dashboard_stats(request):
     """
     Data visualization endpoint showing project statistics and insights.
     This demonstrates the reporting/visualization requirement.
+    Results are cached (see api.dashboard) and refreshed when data changes.
     """
-    # Calculate overall statistics
-    total_projects = Project.objects.count()
-    total_budget = Project.objects.aggregate(Sum('budget'))['budget__sum'] or 0
-    avg_budget = Project.objects.aggregate(Avg('budget'))['budget__avg'] or 0
-    
-    # Status breakdown
-    status_breakdown = {}
-    for status_choice, _ in Project._meta.get_field('status').choices:
-        count = Project.objects.filter(status=status_choice).count()
-        status_breakdown[status_choice] = count
-    
-    # Tasks statistics
-    total_tasks = Task.objects.count()
-    completed_tasks = Task.objects.filter(completed=True).count()
-    completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-    
-    # Recent projects (last 30 days)
-    thirty_days_ago = timezone.now().date() - timedelta(days=30)
-    recent_projects = Project.objects.filter(created_at__gte=thirty_days_ago).count()
-    
-    # Projects by client
-    projects_by_client = Project.objects.values('client_name').annotate(
-        project_count=Count('id'),
-        total_budget=Sum('budget')
-    ).order_by('-project_count')[:5]
+    return Response(get_dashboard_stats())
+
+
+@api_view(['GET'])
+def search(request):
+    """
+    Ranked full-text search over projects (title, client, description) and
+    tasks (name, description). Every word of ?q= must match, as a prefix;
+    ?type=project or ?type=task keeps one kind of hit. Paginated like the
+    list endpoints.
+    """
+    index = get_index(connection)
+    if index is None:
+        return Response(
+            {'error': f'Full-text search is not supported on {connection.vendor}'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    terms = parse_terms(request.query_params.get('q'))
+    if not terms:
+        raise ValidationError({'q': 'Enter at least one word to search for.'})
+    kinds = list(SEARCH_KINDS)
+    kind = request.query_params.get('type')
+    if kind:
+        if kind not in SEARCH_KINDS:
+            raise ValidationError({'type': f'Must be one of: {", ".join(SEARCH_KINDS)}'})
+        kinds = [kind]
     
-    # Task priority breakdown
-    priority_breakdown = {}
-    for priority_choice, _ in Task._meta.get_field('priority').choices:
-        count = Task.objects.filter(priority=priority_choice).count()
-        priority_breakdown[priority_choice] = count
+    paginator = StandardPagination()
+    page = paginator.paginate_queryset(index.search(terms, kinds), request)
+    return paginator.get_paginated_response(page)
+
+
+@require_GET
+def metrics(request):
+    """
+    Request metrics of this process in the Prometheus text format.
+    A plain Django view, since DRF's content negotiation doesn't apply.
+    """
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Fallback quotes in case API fails
+FALLBACK_QUOTES = [
+    {
+        'content': 'The only way to do great work is to love what you do.',
+        'author': 'Steve Jobs',
+        'tags': ['inspiration', 'work', 'passion']
+    },
+    {
+        'content': 'Innovation distinguishes between a leader and a follower.',
+        'author': 'Steve Jobs',
+        'tags': ['innovation', 'leadership']
+    },
+    {
+        'content': 'Success is not final, failure is not fatal: it is the courage to continue that counts.',
+        'author': 'Winston Churchill',
+        'tags': ['success', 'courage', 'perseverance']
+    },
+    {
+        'content': 'The future belongs to those who believe in the beauty of their dreams.',
+        'author': 'Eleanor Roosevelt',
+        'tags': ['dreams', 'future', 'inspiration']
+    },
+    {
+        'content': 'Code is like humor. When you have to explain it, it\'s bad.',
+        'author': 'Cory House',
+        'tags': ['programming', 'humor', 'code']
+    }
+]
+
+
+def quote_payload(result):
+    """The quotes response for a (source, data) result, or a fallback quote"""
+    if result is not None:
+        source, data = result
+        return {
+            'success': True,
+            'source': source,
+            'data': data,
+            'message': 'Successfully fetched data from external API'
+        }
     
-    return Response({
-        'overview': {
-            'total_projects': total_projects,
-            'total_budget': float(total_budget),
-            'average_budget': float(avg_budget),
-            'recent_projects_30_days': recent_projects,
-        },
-        'project_status': status_breakdown,
-        'tasks': {
-            'total_tasks': total_tasks,
-            'completed_tasks': completed_tasks,
-            'pending_tasks': total_tasks - completed_tasks,
-            'completion_rate': round(completion_rate, 2),
+    # If all APIs fail, use fallback quotes
+    quote = random.choice(FALLBACK_QUOTES)
+    return {
+        'success': True,
+        'source': 'Fallback Quote Collection',
+        'data': {
+            'quote': quote['content'],
+            'author': quote['author'],
+            'tags': quote['tags'],
         },
-        'priority_distribution': priority_breakdown,
-        'top_clients': list(projects_by_client),
-    })
+        'message': 'Using local quote (external APIs unavailable)'
+    }
+
+
+def weather_payload(city, data):
+    return {
+        'success': True,
+        'source': 'wttr.in Weather API',
+        'location': city,
+        'data': data,
+        'message': 'Successfully fetched weather data'
+    }
+
+
+WEATHER_UNAVAILABLE = {
+    'success': False,
+    'error': 'Failed to fetch weather data'
+}
+
+
+def weather_request_failed(error):
+    return {
+        'success': False,
+        'error': f'Weather API request failed: {str(error)}'
+    }
 
 
 @api_view(['GET'])
@@ -191,105 +516,9 @@ def fetch_external_data(request):
     Third-party API integration example.
     Fetches random quotes from a public API to demonstrate external API integration.
     Falls back to local quotes if external API fails.
+    Upstream answers are cached and shared (see api.external).
     """
-    # Fallback quotes in case API fails
-    fallback_quotes = [
-        {
-            'content': 'The only way to do great work is to love what you do.',
-            'author': 'Steve Jobs',
-            'tags': ['inspiration', 'work', 'passion']
-        },
-        {
-            'content': 'Innovation distinguishes between a leader and a follower.',
-            'author': 'Steve Jobs',
-            'tags': ['innovation', 'leadership']
-        },
-        {
-            'content': 'Success is not final, failure is not fatal: it is the courage to continue that counts.',
-            'author': 'Winston Churchill',
-            'tags': ['success', 'courage', 'perseverance']
-        },
-        {
-            'content': 'The future belongs to those who believe in the beauty of their dreams.',
-            'author': 'Eleanor Roosevelt',
-            'tags': ['dreams', 'future', 'inspiration']
-        },
-        {
-            'content': 'Code is like humor. When you have to explain it, it\'s bad.',
-            'author': 'Cory House',
-            'tags': ['programming', 'humor', 'code']
-        }
-    ]
-    
-    try:
-        # Try multiple quote APIs
-        apis = [
-            'https://api.quotable.io/random',
-            'https://quotes.rest/qod',  # Quote of the Day API
-        ]
-        
-        for api_url in apis:
-            try:
-                response = requests.get(api_url, timeout=5, verify=False)  # Skip SSL verification for demo
-                
-                if response.status_code == 200:
-                    quote_data = response.json()
-                    
-                    # Handle different API response formats
-                    if 'content' in quote_data:  # Quotable API format
-                        return Response({
-                            'success': True,
-                            'source': 'Quotable API',
-                            'data': {
-                                'quote': quote_data.get('content'),
-                                'author': quote_data.get('author'),
-                                'tags': quote_data.get('tags', []),
-                            },
-                            'message': 'Successfully fetched data from external API'
-                        })
-                    elif 'contents' in quote_data:  # Quote of the Day API format
-                        quote = quote_data['contents']['quotes'][0]
-                        return Response({
-                            'success': True,
-                            'source': 'Quote of the Day API',
-                            'data': {
-                                'quote': quote.get('quote'),
-                                'author': quote.get('author'),
-                                'tags': quote.get('tags', []),
-                            },
-                            'message': 'Successfully fetched data from external API'
-                        })
-            except:
-                continue  # Try next API
-        
-        # If all APIs fail, use fallback quotes
-        import random
-        quote = random.choice(fallback_quotes)
-        return Response({
-            'success': True,
-            'source': 'Fallback Quote Collection',
-            'data': {
-                'quote': quote['content'],
-                'author': quote['author'],
-                'tags': quote['tags'],
-            },
-            'message': 'Using local quote (external APIs unavailable)'
-        })
-            
-    except Exception as e:
-        # Final fallback
-        import random
-        quote = random.choice(fallback_quotes)
-        return Response({
-            'success': True,
-            'source': 'Fallback Quote Collection',
-            'data': {
-                'quote': quote['content'],
-                'author': quote['author'],
-                'tags': quote['tags'],
-            },
-            'message': 'Using local quote due to error'
-        })
+    return Response(quote_payload(fetch_quote()))
 
 
 @api_view(['GET'])
@@ -298,42 +527,93 @@ def weather_data(request):
     Another third-party API integration example.
     Fetches weather data for a given city (optional).
     Uses wttr.in free weather API (no key required)
+    Results are cached per city (see api.external).
     """
     city = request.query_params.get('city', 'London')
     
     try:
-        # Using wttr.in API which doesn't require API key
-        response = requests.get(
-            f'https://wttr.in/{city}?format=j1',
-            timeout=5
-        )
-        
-        if response.status_code == 200:
-            weather_data = response.json()
-            current = weather_data.get('current_condition', [{}])[0]
-            
-            return Response({
-                'success': True,
-                'source': 'wttr.in Weather API',
-                'location': city,
-                'data': {
-                    'temperature': current.get('temp_C', 'N/A') + '°C',
-                    'condition': current.get('weatherDesc', [{}])[0].get('value', 'N/A'),
-                    'humidity': current.get('humidity', 'N/A') + '%',
-                    'wind_speed': current.get('windspeedKmph', 'N/A') + ' km/h',
-                    'feels_like': current.get('FeelsLikeC', 'N/A') + '°C',
-                },
-                'message': 'Successfully fetched weather data'
-            })
-        else:
-            return Response({
-                'success': False,
-                'error': 'Failed to fetch weather data'
-            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-            
+        data = fetch_weather(city)
+    except UnexpectedResponse:
+        return Response(WEATHER_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except requests.exceptions.RequestException as e:
-        return Response({
-            'success': False,
-            'error': f'Weather API request failed: {str(e)}'
-        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response(weather_request_failed(e), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    return Response(weather_payload(city, data))
+
+
+# Async views, for deployments served through ASGI (see Procfile). DRF views
+# are synchronous, so these are plain Django views producing the same JSON
+# bodies as their DRF counterparts above.
+
+def json_response(data, status=status.HTTP_200_OK):
+    """An HttpResponse with the body DRF's JSONRenderer would produce"""
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+@require_GET
+@replica_reads
+async def dashboard_stats_async(request):
+    """dashboard_stats through the async ORM and cache API"""
+    return json_response(await aget_dashboard_stats())
+
 
+@require_GET
+async def fetch_external_data_async(request):
+    """fetch_external_data without blocking a worker on the quote APIs"""
+    return json_response(quote_payload(await afetch_quote()))
+
+
+@require_GET
+async def weather_data_async(request):
+    """weather_data without blocking a worker on wttr.in"""
+    city = request.GET.get('city', 'London')
+    
+    try:
+        data = await afetch_weather(city)
+    except UnexpectedResponse:
+        return json_response(WEATHER_UNAVAILABLE, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except httpx.HTTPError as e:
+        return json_response(weather_request_failed(e), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    return json_response(weather_payload(city, data))
+
+
+@require_GET
+async def events(request):
+    """
+    Server-sent events about project, task and dashboard changes (see
+    api.events). ?project=1,2 keeps the task and project events of these
+    projects; ?dashboard=false leaves out the dashboard events.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held by the stream for good
+        return json_response(
+            {'error': 'Server-sent events are only served through ASGI'},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    project_ids = None
+    value = request.GET.get('project')
+    if value:
+        try:
+            project_ids = {int(project_id) for project_id in value.split(',') if project_id.strip()}
+        except ValueError:
+            return json_response(
+                {'project': ['Expected comma-separated project ids.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    dashboard = request.GET.get('dashboard', 'true').lower() != 'false'
+    
+    try:
+        subscription = event_broker.subscribe(project_ids, dashboard)
+    except TooManySubscribers:
+        return json_response(
+            {'error': 'Too many event streams are open, retry later'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    # EventSource sends Last-Event-ID when it reconnects
+    resync = 'HTTP_LAST_EVENT_ID' in request.META
+    response = StreamingHttpResponse(EventStream(subscription, resync), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -10,8 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,8 +49,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'api.middleware.RequestMetricsMiddleware',
+    # Compresses the final response; only Server-Timing is added after it
+    'api.compression.CompressionMiddleware',
+    'api.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise, async-capable so ASGI requests stay on the event loop
+    'api.middleware.StaticFilesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -91,8 +98,37 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default=''),
         'HOST': config('DB_HOST', default=''),
         'PORT': config('DB_PORT', default=''),
+        # Persistent connections, checked before each request reuses them.
+        # Under ASGI every request may run on a new thread: prefer DB_POOL
+        # (PostgreSQL with psycopg[pool]) there.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
+if config('DB_POOL', default=False, cast=bool):
+    # psycopg's connection pool; Django requires CONN_MAX_AGE = 0 with it
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replicas (api.replicas): a comma-separated list, each entry replacing
+# the HOST of the default database (its NAME on SQLite, e.g. a copy of the
+# database file for local testing). They become the aliases replica_1,
+# replica_2... Tests read them through the default database.
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=Csv())
+for number, location in enumerate(DB_REPLICAS, start=1):
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    replica['NAME' if 'sqlite' in replica['ENGINE'] else 'HOST'] = location
+    DATABASES[f'replica_{number}'] = replica
+API_DB_REPLICAS = [f'replica_{number}' for number in range(1, len(DB_REPLICAS) + 1)]
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# Seconds a client that wrote reads from the primary (longer than the
+# replication lag), tracked with a cookie
+API_REPLICA_PIN_SECONDS = config('API_REPLICA_PIN_SECONDS', default=5, cast=int)
+API_REPLICA_PIN_COOKIE = 'api_read_primary'
 
 
 # Password validation
@@ -132,6 +168,85 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='social-booster'),
+    }
+}
+
+# A write only invalidates the cached dashboard and responses in the cache it
+# can reach: with a per-process backend (the default local-memory one) the
+# other workers would keep serving stale data until it expires, so caching
+# them is off unless CACHE_BACKEND is shared between processes
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHE = CACHES['default']['BACKEND'] not in PER_PROCESS_CACHE_BACKENDS
+
+# Seconds the dashboard statistics stay cached (0 disables caching)
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=30 if SHARED_CACHE else 0, cast=int)
+
+# Server-side cache of the project list/detail responses (api.response_cache):
+# seconds entries live (0 disables it) and the CACHES alias holding them
+API_RESPONSE_CACHE_TTL = config('API_RESPONSE_CACHE_TTL', default=300 if SHARED_CACHE else 0, cast=int)
+API_RESPONSE_CACHE_ALIAS = config('API_RESPONSE_CACHE_ALIAS', default='default')
+
+# Serialize project and task list pages from values_list() rows instead of
+# model instances (api.fast_serializers); the output is the same
+API_FAST_SERIALIZATION = config('API_FAST_SERIALIZATION', default=True, cast=bool)
+
+# Rows fetched per database round trip (and per streamed chunk) by the
+# /api/tasks/export/ and /api/projects/export/ endpoints
+API_EXPORT_CHUNK_SIZE = config('API_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Rows validated and inserted per transaction by imports (import_data and
+# /api/<projects|tasks>/import/)
+API_IMPORT_CHUNK_SIZE = config('API_IMPORT_CHUNK_SIZE', default=1000, cast=int)
+
+# Incremental sync (?updated_since= on /api/projects/ and /api/tasks/, see
+# api.changelog): change log entries read per response, and seconds before
+# an entry is old enough for the cursor to move past it (longer than any
+# write transaction)
+API_SYNC_BATCH_SIZE = config('API_SYNC_BATCH_SIZE', default=1000, cast=int)
+API_SYNC_SETTLE_SECONDS = config('API_SYNC_SETTLE_SECONDS', default=2, cast=int)
+
+# Server-sent events (/api/events/ under ASGI, see api.events): events
+# buffered per stream before a slow client is told to resync, open streams
+# per process, seconds between keep-alive comments, and seconds of writes
+# gathered into one dashboard event
+API_EVENTS_QUEUE_SIZE = config('API_EVENTS_QUEUE_SIZE', default=100, cast=int)
+API_EVENTS_MAX_SUBSCRIBERS = config('API_EVENTS_MAX_SUBSCRIBERS', default=1000, cast=int)
+API_EVENTS_HEARTBEAT_SECONDS = config('API_EVENTS_HEARTBEAT_SECONDS', default=15, cast=int)
+API_EVENTS_DASHBOARD_INTERVAL = config('API_EVENTS_DASHBOARD_INTERVAL', default=1.0, cast=float)
+
+# Bulk task endpoints (/api/tasks/bulk/): maximum items per request and
+# rows per INSERT/UPDATE statement
+TASK_BULK_MAX_ITEMS = config('TASK_BULK_MAX_ITEMS', default=10000, cast=int)
+TASK_BULK_BATCH_SIZE = config('TASK_BULK_BATCH_SIZE', default=1000, cast=int)
+
+# Request metrics (api.middleware.RequestMetricsMiddleware): requests under
+# API_METRICS_PATH_PREFIX get a Server-Timing header and are recorded in the
+# histograms served at /api/metrics/. Requests running more queries or
+# taking longer than the budgets are logged to "api.performance" with their
+# SQL fingerprints (0 disables a budget).
+API_METRICS_ENABLED = config('API_METRICS_ENABLED', default=True, cast=bool)
+API_METRICS_PATH_PREFIX = config('API_METRICS_PATH_PREFIX', default='/api/')
+API_QUERY_BUDGET = config('API_QUERY_BUDGET', default=50, cast=int)
+API_LATENCY_BUDGET_MS = config('API_LATENCY_BUDGET_MS', default=500, cast=int)
+
+# Compression of responses under API_COMPRESSION_PATH_PREFIX
+# (api.compression): gzip, plus brotli and zstd when the Brotli / zstandard
+# packages are installed. Bodies under API_COMPRESSION_MIN_SIZE bytes are
+# sent uncompressed.
+API_COMPRESSION_ENABLED = config('API_COMPRESSION_ENABLED', default=True, cast=bool)
+API_COMPRESSION_PATH_PREFIX = config('API_COMPRESSION_PATH_PREFIX', default='/api/')
+API_COMPRESSION_MIN_SIZE = config('API_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -142,8 +257,66 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.StandardPagination',
     'PAGE_SIZE': 10,
+    # JSON through orjson (same output as DRF's JSONRenderer), plus
+    # MessagePack for clients sending Accept: application/msgpack when the
+    # msgpack package is installed (api.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        *(['api.renderers.MessagePackParser'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Third-party APIs behind /api/external/ (api.external): request timeout in
+# seconds, pooled keep-alive connections per host, seconds answers stay
+# fresh, and seconds expired answers may still be served while a background
+# refresh runs
+EXTERNAL_API_TIMEOUT = config('EXTERNAL_API_TIMEOUT', default=5, cast=float)
+EXTERNAL_API_POOL_SIZE = config('EXTERNAL_API_POOL_SIZE', default=10, cast=int)
+QUOTES_CACHE_TTL = config('QUOTES_CACHE_TTL', default=60, cast=int)
+WEATHER_CACHE_TTL = config('WEATHER_CACHE_TTL', default=600, cast=int)
+EXTERNAL_API_STALE_TTL = config('EXTERNAL_API_STALE_TTL', default=3600, cast=int)
+QUOTABLE_API_URL = config('QUOTABLE_API_URL', default='https://api.quotable.io/random')
+QUOTES_REST_API_URL = config('QUOTES_REST_API_URL', default='https://quotes.rest/qod')
+WEATHER_API_URL = config('WEATHER_API_URL', default='https://wttr.in/{city}?format=j1')
+
+# Per-provider circuit breakers: a provider failing at least
+# CIRCUIT_BREAKER_FAILURE_RATE of its calls (and at least
+# CIRCUIT_BREAKER_MIN_CALLS) within CIRCUIT_BREAKER_WINDOW seconds is skipped
+# for CIRCUIT_BREAKER_RESET_TIMEOUT seconds, then probed with a single call
+CIRCUIT_BREAKER_WINDOW = config('CIRCUIT_BREAKER_WINDOW', default=60, cast=int)
+CIRCUIT_BREAKER_MIN_CALLS = config('CIRCUIT_BREAKER_MIN_CALLS', default=5, cast=int)
+CIRCUIT_BREAKER_FAILURE_RATE = config('CIRCUIT_BREAKER_FAILURE_RATE', default=0.5, cast=float)
+CIRCUIT_BREAKER_RESET_TIMEOUT = config('CIRCUIT_BREAKER_RESET_TIMEOUT', default=30, cast=int)
+# Ask both quote providers concurrently and answer with the first valid quote
+QUOTES_HEDGED = config('QUOTES_HEDGED', default=False, cast=bool)
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api': {
+            'handlers': ['console'],
+            'level': config('API_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
 }
 
 # CORS settings